@@ -0,0 +1,16 @@
+"""
+Maximum SQL queries per request for the accounts URLs (see
+e_hospital.query_budget). None: not rendered by the budget suite.
+"""
+
+QUERY_BUDGETS = {
+    "accounts:register": 2,
+    "accounts:login": 2,
+    "accounts:logout": 2,
+    "accounts:profile": 4,
+    "accounts:admin_login": 2,
+    "accounts:password_reset": 2,
+    "accounts:password_reset_done": 2,
+    "accounts:password_reset_confirm": None,    # needs a one-time token
+    "accounts:password_reset_complete": 2,
+}
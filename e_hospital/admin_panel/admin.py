@@ -1,3 +1,22 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DashboardCounter, DailyAppointmentStat, DailyRevenueStat
+
+
+@admin.register(DashboardCounter)
+class DashboardCounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'updated_at')
+    search_fields = ('name',)
+
+
+@admin.register(DailyAppointmentStat)
+class DailyAppointmentStatAdmin(admin.ModelAdmin):
+    list_display = ('date', 'doctor', 'status', 'count')
+    list_filter = ('status',)
+    date_hierarchy = 'date'
+
+
+@admin.register(DailyRevenueStat)
+class DailyRevenueStatAdmin(admin.ModelAdmin):
+    list_display = ('date', 'billed', 'insured', 'collected')
+    date_hierarchy = 'date'
@@ -0,0 +1,52 @@
+"""
+Maximum SQL queries per request for the admin panel URLs (see
+e_hospital.query_budget). Session, user and profile lookups account for
+3 of every logged-in request.
+"""
+
+QUERY_BUDGETS = {
+    "admin_panel:dashboard": 4,
+    "admin_panel:schedule_cache_stats": 3,
+    "admin_panel:analytics": 7,                 # three report queries + the pending-days count
+    "admin_panel:doctor_list": 4,
+    "admin_panel:patient_list": 4,
+    "admin_panel:appointment_list": 6,
+    "admin_panel:approve_appointment": 4,
+    "admin_panel:payments": 4,
+    "admin_panel:billing_list": 4,
+    "admin_panel:billing_create": 4,
+    "admin_panel:billing_edit": 5,
+    "admin_panel:billing_delete": 4,
+    "admin_panel:payment_create_for_bill": 5,
+    "admin_panel:payment_create": 3,
+    "admin_panel:insurance_list": 4,
+    "admin_panel:insurance_add": 4,
+    "admin_panel:insurance_edit": 5,
+    "admin_panel:insurance_delete": 4,
+    "admin_panel:get_insurance": 4,
+    "admin_panel:doctor_add": 3,
+    "admin_panel:doctor_edit": 5,
+    "admin_panel:doctor_delete": 4,
+    "admin_panel:schedule_template_list": 4,
+    "admin_panel:schedule_template_add": 3,
+    "admin_panel:schedule_template_apply": 6,
+    "admin_panel:schedule_exception_list": 4,
+    "admin_panel:schedule_exception_add": 4,
+    "admin_panel:schedule_exception_delete": 4,
+    "admin_panel:patient_add": 3,
+    "admin_panel:patient_edit": 5,
+    "admin_panel:patient_deactivate": 4,
+    "admin_panel:patient_view": 9,
+    "admin_panel:patient_section": 6,            # page + prescriptions prefetch
+    "admin_panel:patient_export": 4,             # the export itself runs while streaming
+    "admin_panel:patient_activate": 10,
+    "admin_panel:record_import": 3,
+    "admin_panel:appointment_detail": 4,
+    "admin_panel:admin_health_categories": 4,
+    "admin_panel:health_resource_list": 4,
+    "admin_panel:admin_health_resource_add": 4,
+    "admin_panel:admin_health_resource_edit": 6,
+    "admin_panel:admin_health_resource_delete": 4,
+    "admin_panel:admin_health_category_add": 3,
+    "admin_panel:admin_health_category_toggle": 5,
+}
@@ -0,0 +1,121 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from accounts.models import Profile
+from patient.models import Appointment, Billing, Payment
+from .models import DashboardCounter
+
+
+PATIENTS = "patients"
+DOCTORS = "doctors"
+PENDING_APPOINTMENTS = "pending_appointments"
+UNPAID_BILLS = "unpaid_bills"
+
+ROLE_COUNTERS = {"patient": PATIENTS, "doctor": DOCTORS}
+
+
+def revenue_counter(date):
+    return f"revenue:{date.isoformat()}"
+
+
+# ======================================================
+# INCREMENTAL UPDATES
+# ======================================================
+
+def bump(name, delta):
+    """
+    Add `delta` to a counter with a single UPDATE ... SET value = value + delta,
+    so concurrent writers never lose an increment. Runs inside the
+    caller's transaction when there is one.
+    """
+    if not delta:
+        return
+
+    if DashboardCounter.objects.filter(name=name).update(value=F("value") + delta):
+        return
+
+    try:
+        with transaction.atomic():
+            DashboardCounter.objects.create(name=name, value=delta)
+    except IntegrityError:
+        # Created concurrently
+        DashboardCounter.objects.filter(name=name).update(value=F("value") + delta)
+
+
+# ======================================================
+# READ
+# ======================================================
+
+def dashboard_counters(today=None):
+    """
+    The admin dashboard numbers from one primary-key-sized lookup
+    """
+    today = today or timezone.localdate()
+    names = [PATIENTS, DOCTORS, PENDING_APPOINTMENTS, UNPAID_BILLS, revenue_counter(today)]
+
+    values = dict(
+        DashboardCounter.objects.filter(name__in=names).values_list("name", "value")
+    )
+
+    return {
+        PATIENTS: int(values.get(PATIENTS, 0)),
+        DOCTORS: int(values.get(DOCTORS, 0)),
+        PENDING_APPOINTMENTS: int(values.get(PENDING_APPOINTMENTS, 0)),
+        UNPAID_BILLS: int(values.get(UNPAID_BILLS, 0)),
+        "revenue_today": values.get(revenue_counter(today), Decimal("0.00")),
+    }
+
+
+# ======================================================
+# FULL REBUILD
+# ======================================================
+
+def compute_counters():
+    """
+    Every counter recomputed from the source tables (the slow path)
+    """
+    roles = Profile.objects.aggregate(
+        patients=Count("id", filter=Q(role="patient")),
+        doctors=Count("id", filter=Q(role="doctor")),
+    )
+
+    counters = {
+        PATIENTS: roles["patients"],
+        DOCTORS: roles["doctors"],
+        PENDING_APPOINTMENTS: Appointment.objects.filter(status="pending").count(),
+        UNPAID_BILLS: Billing.objects.filter(status="unpaid").count(),
+    }
+
+    revenue = (
+        Payment.objects.filter(status="paid")
+        .annotate(day=TruncDate("paid_at"))
+        .order_by()
+        .values("day")
+        .annotate(total=Sum("amount"))
+    )
+    for row in revenue:
+        counters[revenue_counter(row["day"])] = row["total"]
+
+    return counters
+
+
+def rebuild_counters():
+    """
+    Replace all counters with freshly computed values (corrects drift from
+    bulk writes that skip signals); returns them. Runs in one transaction
+    so the dashboard never reads a half-rebuilt table.
+    """
+    with transaction.atomic():
+        counters = compute_counters()
+
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(
+            DashboardCounter(name=name, value=value)
+            for name, value in counters.items()
+        )
+
+    return counters
@@ -3,6 +3,7 @@ from django import forms
 from django.contrib.auth.models import User
 from patient.models import Billing, Payment
 from patient.models import Insurance
+from patient.importer import check_file, format_for
 
 
 class PaymentForm(forms.ModelForm):
@@ -34,3 +35,23 @@ class BillingForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
         self.fields['patient'].queryset = User.objects.filter(profile__role='patient')
+
+
+class RecordImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV, NDJSON (.ndjson / .jsonl) or JSON")
+    batch_size = forms.IntegerField(min_value=1, max_value=10000, initial=1000)
+    restart = forms.BooleanField(required=False, help_text="Ignore an earlier upload of this file and start over")
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        fmt = format_for(upload.name)
+        if not fmt:
+            raise forms.ValidationError("Upload a .csv, .ndjson, .jsonl or .json file.")
+
+        # Checked whole before anything is imported
+        try:
+            self.cleaned_data["checksum"] = check_file(upload.chunks(), fmt)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+        upload.seek(0)
+        return upload
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from admin_panel.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the admin dashboard counters from scratch (corrects drift)"
+
+    def handle(self, *args, **options):
+        counters = rebuild_counters()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(counters)} dashboard counters."
+        ))
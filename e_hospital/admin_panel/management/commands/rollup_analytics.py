@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from admin_panel.rollups import rebuild_rollups, run_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily analytics rollups of changed days (run every few minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Recompute every day instead of only the changed ones",
+        )
+        parser.add_argument(
+            "--since", type=datetime.date.fromisoformat,
+            help="With --rebuild, only recompute from this date (YYYY-MM-DD)",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            done = rebuild_rollups(since=options["since"])
+        else:
+            done = run_rollups()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {done.get('appointments', 0)} appointment days "
+            f"and {done.get('revenue', 0)} revenue days."
+        ))
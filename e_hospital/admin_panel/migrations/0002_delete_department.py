@@ -7,6 +7,8 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ('admin_panel', '0001_initial'),
+        ('doctor', '0004_alter_doctorprofile_department'),
+        ('patient', '0006_remove_appointment_department'),
     ]
 
     operations = [
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.db import models
+
+
+class DashboardCounter(models.Model):
+    """
+    A running total shown on the admin dashboard, kept current by signals
+    (admin_panel.signals) and rebuilt by `manage.py rebuild_counters`.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+# ======================================================
+# DAILY ROLLUPS (see admin_panel.rollups)
+# ======================================================
+
+ROLLUP_KINDS = (
+    ('appointments', 'Appointments'),
+    ('revenue', 'Revenue'),
+)
+
+
+class DailyAppointmentStat(models.Model):
+    date = models.DateField()
+    doctor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'doctor', 'status')
+
+    def __str__(self):
+        return f"{self.date} {self.doctor_id} {self.status}: {self.count}"
+
+
+class DailyRevenueStat(models.Model):
+    date = models.DateField(unique=True)
+    billed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    insured = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.date}: billed {self.billed}, collected {self.collected}"
+
+
+class RollupDirtyDay(models.Model):
+    """
+    A day whose source rows changed since its rollup was last computed
+    """
+    kind = models.CharField(max_length=20, choices=ROLLUP_KINDS)
+    date = models.DateField()
+
+    class Meta:
+        unique_together = ('kind', 'date')
+
+    def __str__(self):
+        return f"{self.kind} {self.date}"
@@ -0,0 +1,135 @@
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from patient.models import APPOINTMENT_STATUS, Appointment, Billing, MedicalRecord, Payment
+
+
+SECTION_PAGE_SIZE = 20
+
+ZERO = Decimal("0.00")
+
+
+def _doctor_name(doctor):
+    return (doctor.get_full_name() or doctor.username) if doctor else None
+
+
+# ======================================================
+# SUMMARY (first paint)
+# ======================================================
+
+def patient_summary(patient_id, today=None):
+    """
+    The patient overview header: one aggregate query per table, so its
+    cost does not depend on how many rows the patient has
+    """
+    today = today or timezone.localdate()
+
+    appointments = Appointment.objects.filter(patient_id=patient_id).aggregate(
+        total=Count("id"),
+        **{status: Count("id", filter=Q(status=status)) for status, _ in APPOINTMENT_STATUS},
+        next_visit=Min("date", filter=Q(date__gte=today, status__in=["pending", "confirmed"])),
+        last_visit=Max("date", filter=Q(status="completed")),
+    )
+
+    records = MedicalRecord.objects.filter(patient_id=patient_id).aggregate(
+        total=Count("id"),
+        last=Max("created_at"),
+    )
+
+    bills = Billing.objects.filter(patient_id=patient_id).aggregate(
+        total=Count("id"),
+        billed=Sum("amount", default=ZERO),
+        unpaid=Count("id", filter=Q(status="unpaid")),
+        due=Sum("amount_due", filter=Q(status="unpaid"), default=ZERO),
+    )
+
+    payments = Payment.objects.filter(patient_id=patient_id).aggregate(
+        total=Count("id"),
+        collected=Sum("amount", filter=Q(status="paid"), default=ZERO),
+        last=Max("paid_at"),
+    )
+
+    return {
+        "appointments": appointments,
+        "records": records,
+        "bills": bills,
+        "payments": payments,
+    }
+
+
+# ======================================================
+# SECTIONS (loaded page by page)
+# ======================================================
+
+def _appointment_row(appt):
+    profile = getattr(appt.doctor, "doctor_profile", None) if appt.doctor else None
+    return {
+        "date": appt.date,
+        "time": appt.time,
+        "doctor": _doctor_name(appt.doctor) or "Unassigned",
+        "department": profile.department if profile else "",
+        "status": appt.get_status_display(),
+    }
+
+
+def _record_row(record):
+    return {
+        "date": timezone.localtime(record.created_at).date(),
+        "doctor": _doctor_name(record.doctor) or "N/A",
+        "diagnosis": record.diagnosis,
+        "medications": record.medications,
+        "notes": record.notes,
+        "prescriptions": [p.medication for p in record.prescriptions.all()],
+    }
+
+
+def _bill_row(bill):
+    return {
+        "date": timezone.localtime(bill.created_at).date(),
+        "description": bill.description,
+        "amount": bill.amount,
+        "covered": bill.insurance_covered_amount,
+        "due": bill.amount_due,
+        "status": bill.get_status_display(),
+    }
+
+
+def _payment_row(payment):
+    return {
+        "date": timezone.localtime(payment.paid_at).date(),
+        "bill": payment.billing.description if payment.billing else "",
+        "amount": payment.amount,
+        "method": payment.get_method_display(),
+        "status": payment.get_status_display(),
+    }
+
+
+# name: (queryset for a patient, keyset ordering, row serializer)
+SECTIONS = {
+    "appointments": (
+        lambda patient_id: Appointment.objects.filter(patient_id=patient_id)
+        .select_related("doctor", "doctor__doctor_profile"),
+        ("-date", "-time", "-id"),
+        _appointment_row,
+    ),
+    "records": (
+        lambda patient_id: MedicalRecord.objects.filter(patient_id=patient_id)
+        .select_related("doctor")
+        .prefetch_related("prescriptions"),
+        ("-created_at", "-id"),
+        _record_row,
+    ),
+    "bills": (
+        lambda patient_id: Billing.objects.filter(patient_id=patient_id),
+        ("-created_at", "-id"),
+        _bill_row,
+    ),
+    "payments": (
+        lambda patient_id: Payment.objects.filter(patient_id=patient_id)
+        .select_related("billing"),
+        ("-paid_at", "-id"),
+        _payment_row,
+    ),
+}
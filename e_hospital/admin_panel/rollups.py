@@ -0,0 +1,230 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from patient.models import Appointment, Billing, Payment
+from .models import DailyAppointmentStat, DailyRevenueStat, RollupDirtyDay
+
+
+ANALYTICS_MONTHS = 12
+
+
+# ======================================================
+# CHANGE TRACKING
+# ======================================================
+
+def mark_dirty(kind, *dates):
+    """
+    Queue days for recomputation; one INSERT, already-queued days ignored
+    """
+    dates = {d for d in dates if d is not None}
+    if dates:
+        RollupDirtyDay.objects.bulk_create(
+            [RollupDirtyDay(kind=kind, date=d) for d in dates],
+            ignore_conflicts=True,
+        )
+
+
+def local_date(moment):
+    return timezone.localdate(moment) if moment else None
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def in_days(field, days):
+    """
+    Q matching `field` (a datetime) within the local `days`, as plain
+    [start, end) ranges so an index on the column can be used; runs of
+    consecutive days become one range
+    """
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + datetime.timedelta(days=1)
+        else:
+            ranges.append([day, day + datetime.timedelta(days=1)])
+
+    query = Q()
+    for first, end in ranges:
+        query |= Q(**{f"{field}__gte": _start_of(first), f"{field}__lt": _start_of(end)})
+    return query
+
+
+# ======================================================
+# RECOMPUTE
+# ======================================================
+
+def _rollup_appointments(days):
+    rows = (
+        Appointment.objects.filter(date__in=days)
+        .order_by()
+        .values("date", "doctor_id", "status")
+        .annotate(count=Count("id"))
+    )
+
+    DailyAppointmentStat.objects.filter(date__in=days).delete()
+    DailyAppointmentStat.objects.bulk_create(
+        DailyAppointmentStat(**row) for row in rows
+    )
+
+
+def _rollup_revenue(days):
+    billed = (
+        Billing.objects.filter(in_days("created_at", days))
+        .annotate(day=TruncDate("created_at"))
+        .order_by()
+        .values("day")
+        .annotate(billed=Sum("amount"), insured=Sum("insurance_covered_amount"))
+    )
+    collected = (
+        Payment.objects.filter(in_days("paid_at", days), status="paid")
+        .annotate(day=TruncDate("paid_at"))
+        .order_by()
+        .values("day")
+        .annotate(collected=Sum("amount"))
+    )
+
+    stats = {}
+    for row in billed:
+        stats[row["day"]] = DailyRevenueStat(date=row["day"], billed=row["billed"], insured=row["insured"])
+    for row in collected:
+        stats.setdefault(row["day"], DailyRevenueStat(date=row["day"])).collected = row["collected"]
+
+    DailyRevenueStat.objects.filter(date__in=days).delete()
+    DailyRevenueStat.objects.bulk_create(stats.values())
+
+
+ROLLUPS = {
+    "appointments": _rollup_appointments,
+    "revenue": _rollup_revenue,
+}
+
+
+def pending_days():
+    """
+    Queued days not rolled up yet (the rollup_analytics command drains them)
+    """
+    return RollupDirtyDay.objects.count()
+
+
+def run_rollups():
+    """
+    Recompute the rollup rows of every queued day, and only those.
+
+    The queue entries are deleted before the source tables are read, so a
+    change committed meanwhile queues its day again rather than being lost.
+    Returns {kind: number of days recomputed}.
+    """
+    done = {}
+
+    with transaction.atomic():
+        queued = list(RollupDirtyDay.objects.values_list("pk", "kind", "date"))
+        if not queued:
+            return done
+
+        RollupDirtyDay.objects.filter(pk__in=[pk for pk, _, _ in queued]).delete()
+
+        for kind, rollup in ROLLUPS.items():
+            days = sorted({date for _, k, date in queued if k == kind})
+            if days:
+                rollup(days)
+                done[kind] = len(days)
+
+    return done
+
+
+def rebuild_rollups(since=None):
+    """
+    Queue every day that has source rows (from `since` on) and recompute
+    """
+    appointments = Appointment.objects.order_by().values_list("date", flat=True).distinct()
+    bills = Billing.objects.annotate(day=TruncDate("created_at")).order_by().values_list("day", flat=True).distinct()
+    payments = Payment.objects.annotate(day=TruncDate("paid_at")).order_by().values_list("day", flat=True).distinct()
+
+    if since:
+        appointments = appointments.filter(date__gte=since)
+        bills = bills.filter(day__gte=since)
+        payments = payments.filter(day__gte=since)
+
+        DailyAppointmentStat.objects.filter(date__gte=since).delete()
+        DailyRevenueStat.objects.filter(date__gte=since).delete()
+    else:
+        DailyAppointmentStat.objects.all().delete()
+        DailyRevenueStat.objects.all().delete()
+
+    mark_dirty("appointments", *appointments)
+    mark_dirty("revenue", *bills, *payments)
+
+    return run_rollups()
+
+
+# ======================================================
+# REPORTS
+# ======================================================
+
+def _month_starts(today, months):
+    first = today.replace(day=1)
+    starts = []
+    for _ in range(months):
+        starts.append(first)
+        first = (first - datetime.timedelta(days=1)).replace(day=1)
+    return starts[::-1]
+
+
+def monthly_report(today=None, months=ANALYTICS_MONTHS):
+    """
+    Per-month appointment status counts and revenue, plus the busiest
+    doctors, for the last `months` months. Reads only the rollup tables.
+    """
+    today = today or timezone.localdate()
+    starts = _month_starts(today, months)
+
+    report = {
+        start: {"total": 0, "statuses": {}, "billed": 0, "insured": 0, "collected": 0}
+        for start in starts
+    }
+
+    appointment_rows = (
+        DailyAppointmentStat.objects.filter(date__gte=starts[0], date__lte=today)
+        .annotate(month=TruncMonth("date"))
+        .order_by()
+        .values("month", "status")
+        .annotate(count=Sum("count"))
+    )
+    for row in appointment_rows:
+        month = report[row["month"]]
+        month["statuses"][row["status"]] = row["count"]
+        month["total"] += row["count"]
+
+    revenue_rows = (
+        DailyRevenueStat.objects.filter(date__gte=starts[0], date__lte=today)
+        .annotate(month=TruncMonth("date"))
+        .order_by()
+        .values("month")
+        .annotate(billed=Sum("billed"), insured=Sum("insured"), collected=Sum("collected"))
+    )
+    for row in revenue_rows:
+        report[row["month"]].update(
+            billed=row["billed"], insured=row["insured"], collected=row["collected"]
+        )
+
+    top_doctors = (
+        DailyAppointmentStat.objects.filter(
+            date__gte=starts[0], date__lte=today, doctor__isnull=False
+        )
+        .exclude(status="cancelled")
+        .order_by()
+        .values("doctor_id", "doctor__username", "doctor__first_name", "doctor__last_name")
+        .annotate(count=Sum("count"))
+        .order_by("-count")[:10]
+    )
+
+    return {
+        "months": [{"month": start, **report[start]} for start in starts],
+        "top_doctors": list(top_doctors),
+    }
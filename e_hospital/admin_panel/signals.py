@@ -0,0 +1,131 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import Profile
+from patient.models import Appointment, Billing, Payment
+from .counters import (
+    PENDING_APPOINTMENTS, ROLE_COUNTERS, UNPAID_BILLS, bump, revenue_counter,
+)
+from .rollups import local_date, mark_dirty
+
+
+def _previous(instance, *fields):
+    if not instance.pk:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def _revenue(payment_state):
+    """
+    (counter, amount) a payment contributes to, or None if it is not paid
+    """
+    if not payment_state:
+        return None
+
+    status, amount, paid_at = payment_state
+    if status != "paid" or paid_at is None:
+        return None
+
+    return revenue_counter(timezone.localdate(paid_at)), amount
+
+
+# Remember the counted fields before an edit
+@receiver(pre_save, sender=Profile)
+def remember_profile_role(sender, instance, **kwargs):
+    row = _previous(instance, "role")
+    instance._previous_role = row[0] if row else None
+
+
+@receiver(pre_save, sender=Billing)
+def remember_billing_status(sender, instance, **kwargs):
+    row = _previous(instance, "status")
+    instance._previous_billing_status = row[0] if row else None
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_state(sender, instance, **kwargs):
+    instance._previous_payment = _previous(instance, "status", "amount", "paid_at")
+
+
+# Saves → move each counter by the difference
+@receiver(post_save, sender=Profile)
+def count_profile(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_role", None)
+    if previous == instance.role:
+        return
+
+    if previous in ROLE_COUNTERS:
+        bump(ROLE_COUNTERS[previous], -1)
+    if instance.role in ROLE_COUNTERS:
+        bump(ROLE_COUNTERS[instance.role], 1)
+
+
+@receiver(post_save, sender=Appointment)
+def count_appointment(sender, instance, created, **kwargs):
+    # _previous_status is recorded by patient.signals, which owns Appointment
+    previous = None if created else getattr(instance, "_previous_status", None)
+    bump(PENDING_APPOINTMENTS, (instance.status == "pending") - (previous == "pending"))
+
+
+@receiver(post_save, sender=Billing)
+def count_billing(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_billing_status", None)
+    bump(UNPAID_BILLS, (instance.status == "unpaid") - (previous == "unpaid"))
+
+
+@receiver(post_save, sender=Payment)
+def count_payment(sender, instance, **kwargs):
+    before = _revenue(getattr(instance, "_previous_payment", None))
+    after = _revenue((instance.status, instance.amount, instance.paid_at))
+
+    if before != after:
+        if before:
+            bump(before[0], -before[1])
+        if after:
+            bump(after[0], after[1])
+
+
+# Deletes → take the row's contribution back out
+@receiver(post_delete, sender=Profile)
+def uncount_profile(sender, instance, **kwargs):
+    if instance.role in ROLE_COUNTERS:
+        bump(ROLE_COUNTERS[instance.role], -1)
+
+
+@receiver(post_delete, sender=Appointment)
+def uncount_appointment(sender, instance, **kwargs):
+    bump(PENDING_APPOINTMENTS, -(instance.status == "pending"))
+
+
+@receiver(post_delete, sender=Billing)
+def uncount_billing(sender, instance, **kwargs):
+    bump(UNPAID_BILLS, -(instance.status == "unpaid"))
+
+
+@receiver(post_delete, sender=Payment)
+def uncount_payment(sender, instance, **kwargs):
+    contribution = _revenue((instance.status, instance.amount, instance.paid_at))
+    if contribution:
+        bump(contribution[0], -contribution[1])
+
+
+# Any change → queue the affected days for the analytics rollups
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def queue_appointment_rollup(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_slot", None)
+    mark_dirty("appointments", instance.date, previous[1] if previous else None)
+
+
+@receiver(post_save, sender=Billing)
+@receiver(post_delete, sender=Billing)
+def queue_billing_rollup(sender, instance, **kwargs):
+    mark_dirty("revenue", local_date(instance.created_at))
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def queue_payment_rollup(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_payment", None)
+    mark_dirty("revenue", local_date(instance.paid_at), local_date(previous[2]) if previous else None)
@@ -1,3 +1,256 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from patient.models import Appointment, Billing, MedicalRecord, Payment, Prescription
+from .counters import compute_counters, dashboard_counters, rebuild_counters
+from .overview import patient_summary
+from .models import DailyAppointmentStat, DailyRevenueStat, RollupDirtyDay
+from .rollups import mark_dirty, monthly_report, rebuild_rollups, run_rollups
+
+
+def make_user(username, role):
+    user = User.objects.create_user(username=username)
+    user.profile.role = role
+    user.profile.save()
+    return user
+
+
+class DashboardCounterTests(TestCase):
+
+    def setUp(self):
+        self.admin = make_user("admin", "admin")
+        self.doctor = make_user("doc", "doctor")
+        self.patient = make_user("pat", "patient")
+
+        self.appointment = Appointment.objects.create(
+            patient=self.patient,
+            doctor=self.doctor,
+            date=timezone.localdate() + datetime.timedelta(days=1),
+            time=datetime.time(9, 0),
+        )
+        self.bill = Billing.objects.create(
+            patient=self.patient, description="Consultation", amount=Decimal("500.00")
+        )
+
+    def assert_in_sync(self):
+        counters = dashboard_counters()
+        computed = compute_counters()
+
+        for name in ("patients", "doctors", "pending_appointments", "unpaid_bills"):
+            self.assertEqual(counters[name], computed[name], name)
+
+    def test_signals_keep_counters_in_sync(self):
+        self.assert_in_sync()
+        self.assertEqual(dashboard_counters()["pending_appointments"], 1)
+
+        self.appointment.status = "confirmed"
+        self.appointment.save()
+        make_user("pat2", "patient").delete()
+
+        Payment.objects.create(
+            billing=self.bill, patient=self.patient, amount=self.bill.amount,
+            method="card", status="paid",
+        )
+        self.bill.status = "paid"
+        self.bill.save()
+
+        self.assert_in_sync()
+        self.assertEqual(dashboard_counters()["revenue_today"], Decimal("500.00"))
+
+    def test_rebuild_corrects_drift(self):
+        # Bulk writes skip signals
+        Appointment.objects.filter(pk=self.appointment.pk).update(status="cancelled")
+        self.assertEqual(dashboard_counters()["pending_appointments"], 1)
+
+        rebuild_counters()
+        self.assertEqual(dashboard_counters()["pending_appointments"], 0)
+        self.assert_in_sync()
+
+    def test_dashboard_reads_counters_only(self):
+        self.client.force_login(self.admin)
+
+        # session + user + profile, then the counters
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("admin_panel:dashboard"))
+
+        self.assertEqual(response.context["total_patients"], 1)
+        self.assertEqual(response.context["unpaid_bills"], 1)
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_user("doc", "doctor")
+        self.patient = make_user("pat", "patient")
+        self.today = timezone.localdate()
+
+        for hour, status in [(9, "completed"), (10, "completed"), (11, "cancelled")]:
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor,
+                date=self.today, time=datetime.time(hour, 0), status=status,
+            )
+
+        bill = Billing.objects.create(
+            patient=self.patient, description="Consultation", amount=Decimal("800.00")
+        )
+        Payment.objects.create(
+            billing=bill, patient=self.patient, amount=Decimal("800.00"),
+            method="cash", status="paid",
+        )
+
+    def test_only_changed_days_are_recomputed(self):
+        self.assertEqual(run_rollups(), {"appointments": 1, "revenue": 1})
+        self.assertEqual(run_rollups(), {})
+
+        stat = DailyAppointmentStat.objects.get(date=self.today, status="completed")
+        self.assertEqual(stat.count, 2)
+        self.assertEqual(DailyRevenueStat.objects.get(date=self.today).collected, Decimal("800.00"))
+
+        # Moving an appointment dirties both its old and new day
+        appt = Appointment.objects.filter(status="cancelled").get()
+        appt.date = self.today + datetime.timedelta(days=3)
+        appt.save()
+        self.assertEqual(RollupDirtyDay.objects.count(), 2)
+
+        run_rollups()
+        self.assertFalse(
+            DailyAppointmentStat.objects.filter(date=self.today, status="cancelled").exists()
+        )
+
+    @override_settings(TIME_ZONE="Asia/Kolkata")
+    def test_revenue_is_counted_on_the_local_day(self):
+        run_rollups()
+        day = datetime.date(2025, 3, 10)
+        start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        next_day = start + datetime.timedelta(days=1)
+        for moment in (start, next_day - datetime.timedelta(microseconds=1), next_day):
+            bill = Billing.objects.create(patient=self.patient, description="Visit", amount=Decimal("100.00"))
+            Billing.objects.filter(pk=bill.pk).update(created_at=moment)
+
+        mark_dirty("revenue", day, day + datetime.timedelta(days=1), day + datetime.timedelta(days=5))
+        run_rollups()
+
+        self.assertEqual(DailyRevenueStat.objects.get(date=day).billed, Decimal("200.00"))
+        self.assertEqual(
+            DailyRevenueStat.objects.get(date=day + datetime.timedelta(days=1)).billed, Decimal("100.00")
+        )
+
+    def test_analytics_page_only_reads(self):
+        admin = make_user("admin", "admin")
+        self.client.force_login(admin)
+        queued = RollupDirtyDay.objects.count()
+
+        response = self.client.get(reverse("admin_panel:analytics"))
+
+        self.assertEqual(response.context["pending_days"], queued)
+        self.assertEqual(RollupDirtyDay.objects.count(), queued)
+        self.assertFalse(DailyAppointmentStat.objects.exists())
+
+    def test_report_reads_rollups_only(self):
+        rebuild_rollups()
+
+        with self.assertNumQueries(3):
+            report = monthly_report(self.today)
+
+        this_month = report["months"][-1]
+        self.assertEqual(len(report["months"]), 12)
+        self.assertEqual(this_month["total"], 3)
+        self.assertEqual(this_month["statuses"]["completed"], 2)
+        self.assertEqual(this_month["billed"], Decimal("800.00"))
+        self.assertEqual(report["top_doctors"][0]["count"], 2)
+
+
+class AppointmentApprovalTests(TestCase):
+
+    def setUp(self):
+        self.admin = make_user("admin", "admin")
+        self.doctor = make_user("doc", "doctor")
+        self.patient = make_user("pat", "patient")
+        self.other = make_user("other", "patient")
+        self.client.force_login(self.admin)
+
+        slot = dict(
+            doctor=self.doctor,
+            date=timezone.localdate() + datetime.timedelta(days=1),
+            time=datetime.time(9, 0),
+        )
+        self.cancelled = Appointment.objects.create(patient=self.patient, status="cancelled", **slot)
+        Appointment.objects.create(patient=self.other, status="confirmed", **slot)
+
+    def test_rebooked_slot_cannot_be_reconfirmed(self):
+        for name in ("admin_panel:approve_appointment", "admin_panel:appointment_detail"):
+            response = self.client.post(
+                reverse(name, args=[self.cancelled.pk]), {"action": "approve"}, follow=True
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(
+                "This slot has since been booked by another patient.",
+                [str(message) for message in response.context["messages"]],
+            )
+            self.cancelled.refresh_from_db()
+            self.assertEqual(self.cancelled.status, "cancelled")
+
+
+class PatientOverviewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user("admin", "admin")
+        cls.doctor = make_user("doc", "doctor")
+        cls.patient = make_user("pat", "patient")
+        day = datetime.date(2025, 1, 1)
+
+        for n in range(25):
+            appointment = Appointment.objects.create(
+                patient=cls.patient, doctor=cls.doctor,
+                date=day + datetime.timedelta(days=n), time=datetime.time(9, 0),
+                status="completed",
+            )
+            record = MedicalRecord.objects.create(
+                patient=cls.patient, doctor=cls.doctor, appointment=appointment, diagnosis=f"Visit {n}",
+            )
+            Prescription.objects.create(record=record, medication="Rest")
+
+        Billing.objects.create(patient=cls.patient, description="Visit", amount=Decimal("300.00"))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_summary_is_aggregated(self):
+        summary = patient_summary(self.patient.id, today=datetime.date(2025, 6, 1))
+
+        self.assertEqual(summary["appointments"]["total"], 25)
+        self.assertEqual(summary["appointments"]["completed"], 25)
+        self.assertEqual(summary["appointments"]["last_visit"], datetime.date(2025, 1, 25))
+        self.assertIsNone(summary["appointments"]["next_visit"])
+        self.assertEqual(summary["records"]["total"], 25)
+        self.assertEqual(summary["bills"]["due"], Decimal("300.00"))
+        self.assertEqual(summary["payments"]["collected"], Decimal("0.00"))
+
+    def test_sections_page_through_json(self):
+        url = reverse("admin_panel:patient_section", args=[self.patient.id, "records"])
+
+        first = self.client.get(url).json()
+        self.assertEqual(len(first["items"]), 20)
+        self.assertEqual(first["items"][0]["diagnosis"], "Visit 24")
+        self.assertEqual(first["items"][0]["prescriptions"], ["Rest"])
+
+        second = self.client.get(url, {"cursor": first["next"]}).json()
+        self.assertEqual([r["diagnosis"] for r in second["items"]], [f"Visit {n}" for n in range(4, -1, -1)])
+        self.assertIsNone(second["next"])
+
+        bad = self.client.get(reverse("admin_panel:patient_section", args=[self.patient.id, "nope"]))
+        self.assertEqual(bad.status_code, 404)
+
+    def test_section_queries_do_not_grow_with_rows(self):
+        url = reverse("admin_panel:patient_section", args=[self.patient.id, "appointments"])
+        self.client.get(url)
+
+        # session, user, profile (auth) + patient check + one page
+        with self.assertNumQueries(5):
+            self.client.get(url)
@@ -6,6 +6,8 @@ app_name = "admin_panel"
 urlpatterns = [
     path("", views.admin_panel_home, name="dashboard"),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/schedule-cache/', views.schedule_cache_stats_view, name='schedule_cache_stats'),
+    path('analytics/', views.analytics, name='analytics'),
     path('doctors/', views.doctor_list, name='doctor_list'),
     path('patients/', views.patient_list, name='patient_list'),
     path('appointments/', views.appointment_list, name='appointment_list'),
@@ -37,11 +39,24 @@ path("doctors/add/", views.doctor_add, name="doctor_add"),
 path("doctors/<int:doctor_id>/edit/", views.doctor_edit, name="doctor_edit"),
 path("doctors/<int:doctor_id>/delete/", views.doctor_delete, name="doctor_delete"),
 
+# Schedule Templates
+path("schedule-templates/", views.schedule_template_list, name="schedule_template_list"),
+path("schedule-templates/add/", views.schedule_template_add, name="schedule_template_add"),
+path("schedule-templates/<int:pk>/apply/", views.schedule_template_apply, name="schedule_template_apply"),
+
+# Holidays / Leave / Breaks
+path("schedule-exceptions/", views.schedule_exception_list, name="schedule_exception_list"),
+path("schedule-exceptions/add/", views.schedule_exception_add, name="schedule_exception_add"),
+path("schedule-exceptions/<int:pk>/delete/", views.schedule_exception_delete, name="schedule_exception_delete"),
+
 # Patient Management
 path("patients/add/", views.patient_add, name="patient_add"),
 path("patients/<int:patient_id>/edit/", views.patient_edit, name="patient_edit"),
 path("patients/<int:patient_id>/deactivate/", views.patient_deactivate, name="patient_deactivate"),
 path("patients/<int:patient_id>/view/", views.patient_view, name="patient_view"),
+path("patients/<int:patient_id>/view/<slug:section>/", views.patient_section, name="patient_section"),
+path("patients/<int:patient_id>/export/", views.patient_export, name="patient_export"),
+path("records/import/", views.record_import, name="record_import"),
 path("patients/<int:user_id>/activate/", views.patient_activate, name="patient_activate"),
 
 path("appointments/<int:pk>/", views.appointment_detail,name="appointment_detail"),
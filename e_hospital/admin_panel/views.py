@@ -2,19 +2,32 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from functools import wraps
 
 # MODELS
 from accounts.models import Profile
 from patient.models import Appointment, MedicalRecord, Payment, Billing, Insurance,  HealthCategory, HealthResource
-from doctor.models import DoctorProfile, Availability
+from doctor.models import DoctorProfile, Availability, ScheduleException, ScheduleTemplate
+from doctor.bulk import apply_schedule_template
+from doctor.slots import schedule_cache_stats
+from patient.export import FORMATS as EXPORT_FORMATS, buffered, export_chunks, export_filename
+from patient.booking import SlotUnavailable
+from patient.importer import format_for, import_records, read_rows
 
 # FORMS
-from .forms import BillingForm, PaymentForm
-from doctor.forms import DoctorCreateForm, DoctorProfileForm
+from .counters import dashboard_counters
+from .rollups import monthly_report, pending_days
+from .overview import SECTION_PAGE_SIZE, SECTIONS, patient_summary
+from e_hospital.pagination import paginate
+from .forms import BillingForm, PaymentForm, RecordImportForm
+from doctor.forms import (
+    DoctorCreateForm, DoctorProfileForm,
+    ScheduleTemplateForm, ScheduleTemplateEntryFormSet, ScheduleExceptionForm,
+)
 
 
 # =====================================================
@@ -48,17 +61,42 @@ def admin_required(view_func):
 # =====================================================
 @admin_required
 def dashboard(request):
-    total_doctors = Profile.objects.filter(role='doctor').count()
-    total_patients = Profile.objects.filter(role='patient').count()
-    pending_appts = Appointment.objects.filter(status='pending').count()
+    counters = dashboard_counters()
 
     return render(request, "admin_panel/dashboard.html", {
-        "total_doctors": total_doctors,
-        "total_patients": total_patients,
-        "pending_appts": pending_appts,
+        "total_doctors": counters["doctors"],
+        "total_patients": counters["patients"],
+        "pending_appts": counters["pending_appointments"],
+        "unpaid_bills": counters["unpaid_bills"],
+        "revenue_today": counters["revenue_today"],
     })
 
 
+@admin_required
+def analytics(request):
+    """
+    12-month appointment and revenue report, read from the daily rollups.
+    Only reads: the rollups are brought up to date by the rollup_analytics
+    command, and days still waiting for it are counted on the page.
+    """
+    report = monthly_report()
+    report["pending_days"] = pending_days()
+
+    busiest = max((m["total"] for m in report["months"]), default=0) or 1
+    for month in report["months"]:
+        month["percent"] = month["total"] * 100 // busiest
+
+    return render(request, "admin_panel/analytics.html", report)
+
+
+@admin_required
+def schedule_cache_stats_view(request):
+    """
+    Hit/miss counters of the doctor schedule cache
+    """
+    return JsonResponse(schedule_cache_stats())
+
+
 # =====================================================
 # DOCTOR MANAGEMENT
 # =====================================================
@@ -150,13 +188,119 @@ def doctor_delete(request, doctor_id):
     })
 
 
+# =====================================================
+# SCHEDULE TEMPLATES
+# =====================================================
+
+@admin_required
+def schedule_template_list(request):
+    templates = ScheduleTemplate.objects.annotate(entry_count=Count("entries"))
+    return render(request, "admin_panel/schedule_template_list.html", {"templates": templates})
+
+
+@admin_required
+def schedule_template_add(request):
+    template = ScheduleTemplate()
+    form = ScheduleTemplateForm(request.POST or None, instance=template)
+    formset = ScheduleTemplateEntryFormSet(request.POST or None, instance=template)
+
+    if request.method == "POST" and form.is_valid() and formset.is_valid():
+        with transaction.atomic():
+            template = form.save()
+            formset.instance = template
+            formset.save()
+
+        messages.success(request, "Schedule template created.")
+        return redirect("admin_panel:schedule_template_apply", template.pk)
+
+    return render(request, "admin_panel/schedule_template_form.html", {
+        "form": form,
+        "formset": formset,
+    })
+
+
+@admin_required
+def schedule_template_apply(request, pk):
+    template = get_object_or_404(ScheduleTemplate, pk=pk)
+    doctors = DoctorProfile.objects.select_related("user").order_by("department", "user__username")
+
+    department = request.GET.get("department", "")
+    if department:
+        doctors = doctors.filter(department__iexact=department)
+
+    applied = conflicts = None
+
+    if request.method == "POST":
+        applied, conflicts = apply_schedule_template(template, request.POST.getlist("doctors"))
+
+        names = {d.user_id: d.user.get_full_name() or d.user.username for d in doctors}
+        applied = [names.get(d, d) for d in applied]
+        conflicts = {names.get(d, d): msgs for d, msgs in conflicts.items()}
+
+        if applied:
+            messages.success(request, f"Template applied to {len(applied)} doctor(s).")
+        if conflicts:
+            messages.warning(request, f"{len(conflicts)} doctor(s) skipped because of overlaps.")
+
+    return render(request, "admin_panel/schedule_template_apply.html", {
+        "template": template,
+        "entries": template.entries.all(),
+        "doctors": doctors,
+        "department": department,
+        "applied": applied,
+        "conflicts": conflicts,
+    })
+
+
+# =====================================================
+# HOLIDAYS / LEAVE / BREAKS
+# =====================================================
+
+@admin_required
+def schedule_exception_list(request):
+    today = timezone.now().date()
+    exceptions = (
+        ScheduleException.objects.select_related("doctor")
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=today))
+    )
+    return render(request, "admin_panel/schedule_exception_list.html", {"exceptions": exceptions})
+
+
+@admin_required
+def schedule_exception_add(request):
+    form = ScheduleExceptionForm(request.POST or None)
+
+    if request.method == "POST" and form.is_valid():
+        form.save()
+        messages.success(request, "Schedule exception added.")
+        return redirect("admin_panel:schedule_exception_list")
+
+    return render(request, "admin_panel/schedule_exception_form.html", {"form": form})
+
+
+@admin_required
+def schedule_exception_delete(request, pk):
+    exception = get_object_or_404(ScheduleException, pk=pk)
+
+    if request.method == "POST":
+        exception.delete()
+        messages.success(request, "Schedule exception deleted.")
+        return redirect("admin_panel:schedule_exception_list")
+
+    return render(request, "admin_panel/confirm_delete.html", {
+        "object": exception,
+        "type": "Schedule Exception"
+    })
+
+
 # =====================================================
 # PATIENT MANAGEMENT
 # =====================================================
 
 @admin_required
 def patient_list(request):
-    patients = Profile.objects.filter(role='patient')
+    patients = Profile.objects.filter(role='patient').select_related("user")
+    patients = paginate(request, patients, ("-id",))
     return render(request, "admin_panel/patients.html", {"patients": patients})
 
 
@@ -247,26 +391,85 @@ def patient_activate(request, user_id):
 
 @admin_required
 def patient_view(request, patient_id):
-    profile = get_object_or_404(Profile, user__id=patient_id)
-
-    appointments = Appointment.objects.filter(patient=profile.user)
-    medical_records = MedicalRecord.objects.filter(patient=profile.user)
-    bills = Billing.objects.filter(patient=profile.user)
-    payments = Payment.objects.filter(patient=profile.user)
+    profile = get_object_or_404(Profile.objects.select_related("user"), user__id=patient_id)
     insurance = Insurance.objects.filter(patient=profile.user).first()
 
+    # Only aggregates here; the page loads each section from patient_section
     context = {
         "profile": profile,
-        "appointments": appointments,
-        "medical_records": medical_records,
-        "bills": bills,
-        "payments": payments,
         "insurance": insurance,
+        "summary": patient_summary(profile.user_id),
+        "sections": list(SECTIONS),
     }
 
     return render(request, "admin_panel/patient_view.html", context)
 
 
+@admin_required
+def patient_export(request, patient_id):
+    """
+    The patient's full record as a streamed FHIR-style bundle
+    (?format=ndjson for one resource per line)
+    """
+    profile = get_object_or_404(Profile.objects.select_related("user"), user__id=patient_id)
+    fmt = request.GET.get("format", "json")
+    if fmt not in EXPORT_FORMATS:
+        fmt = "json"
+
+    response = StreamingHttpResponse(
+        buffered(export_chunks(profile.user, fmt)),
+        content_type="application/x-ndjson" if fmt == "ndjson" else "application/fhir+json",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{export_filename(profile.user, fmt)}"'
+    return response
+
+
+@admin_required
+def record_import(request):
+    """
+    Upload historical medical records; the rows go in batched bulk inserts.
+    Uploading the same file again resumes where an interrupted upload
+    stopped (import_medical_records does the same for files on disk); a
+    different file under the same name starts over.
+    """
+    form = RecordImportForm(request.POST or None, request.FILES or None)
+    result = None
+
+    if request.method == "POST" and form.is_valid():
+        upload = form.cleaned_data["file"]
+        lines = (line.decode("utf-8-sig") for line in upload)
+
+        result = import_records(
+            read_rows(lines, format_for(upload.name)),
+            f"upload:{upload.name}",
+            batch_size=form.cleaned_data["batch_size"],
+            restart=form.cleaned_data["restart"],
+            checksum=form.cleaned_data["checksum"],
+        )
+
+    return render(request, "admin_panel/record_import.html", {"form": form, "result": result})
+
+
+@admin_required
+def patient_section(request, patient_id, section):
+    """
+    One page of a patient overview section as JSON; pass "next" back as
+    ?cursor= for the following page
+    """
+    if section not in SECTIONS:
+        return JsonResponse({"error": "Unknown section."}, status=404)
+
+    get_object_or_404(Profile, user__id=patient_id)
+    queryset, ordering, row = SECTIONS[section]
+
+    page = paginate(request, queryset(patient_id), ordering, per_page=SECTION_PAGE_SIZE)
+
+    return JsonResponse({
+        "items": [row(obj) for obj in page],
+        "next": page.next_cursor,
+    })
+
+
 
 
 # =====================================================
@@ -275,9 +478,17 @@ def patient_view(request, patient_id):
 
 @admin_required
 def appointment_list(request):
-    pending = Appointment.objects.filter(status="pending").order_by("date", "time")
-    confirmed = Appointment.objects.filter(status="confirmed").order_by("date", "time")
-    completed = Appointment.objects.filter(status="completed").order_by("-date")
+    appointments = Appointment.objects.select_related("patient", "doctor")
+
+    pending = paginate(
+        request, appointments.filter(status="pending"), ("date", "time", "id"), param="pending"
+    )
+    confirmed = paginate(
+        request, appointments.filter(status="confirmed"), ("date", "time", "id"), param="confirmed"
+    )
+    completed = paginate(
+        request, appointments.filter(status="completed"), ("-date", "-time", "-id"), param="completed"
+    )
 
     return render(request, "admin_panel/appointments.html", {
         "pending": pending,
@@ -287,22 +498,36 @@ def appointment_list(request):
 
 
 
+def _save_status(appt, status):
+    """
+    Save a status change. Reactivating a cancelled appointment whose slot
+    has since been booked by someone else raises SlotUnavailable.
+    """
+    appt.status = status
+    try:
+        with transaction.atomic():
+            appt.save()
+    except IntegrityError:
+        raise SlotUnavailable("This slot has since been booked by another patient.")
+
+
 @admin_required
 def approve_appointment(request, pk):
-    appt = get_object_or_404(Appointment, pk=pk)
+    appt = get_object_or_404(Appointment.objects.select_related("patient", "doctor"), pk=pk)
 
     if request.method == "POST":
         action = request.POST.get("action")
 
-        if action == "approve":
-            appt.status = "confirmed"
-            appt.doctor = appt.doctor 
-            messages.success(request, "Appointment Approved!")
-        elif action == "reject":
-            appt.status = "cancelled"
-            messages.error(request, "Appointment Rejected!")
+        try:
+            if action == "approve":
+                _save_status(appt, "confirmed")
+                messages.success(request, "Appointment Approved!")
+            elif action == "reject":
+                _save_status(appt, "cancelled")
+                messages.error(request, "Appointment Rejected!")
+        except SlotUnavailable as e:
+            messages.error(request, str(e))
 
-        appt.save()
         return redirect("admin_panel:appointment_list")
 
     return render(request, "admin_panel/approve_appointment.html", {"appointment": appt})
@@ -311,25 +536,25 @@ def approve_appointment(request, pk):
 
 @admin_required
 def appointment_detail(request, pk):
-    appt = get_object_or_404(Appointment, pk=pk)
+    appt = get_object_or_404(Appointment.objects.select_related("patient", "doctor"), pk=pk)
 
     if request.method == "POST":
         action = request.POST.get("action")
 
-        if action == "approve":
-            appt.status = "confirmed"
-            appt.save()
-            messages.success(request, "Appointment approved")
+        try:
+            if action == "approve":
+                _save_status(appt, "confirmed")
+                messages.success(request, "Appointment approved")
 
-        elif action == "reject":
-            appt.status = "cancelled"
-            appt.save()
-            messages.warning(request, "Appointment rejected")
+            elif action == "reject":
+                _save_status(appt, "cancelled")
+                messages.warning(request, "Appointment rejected")
 
-        elif action == "complete":
-            appt.status = "completed"
-            appt.save()
-            messages.success(request, "Appointment marked completed")
+            elif action == "complete":
+                _save_status(appt, "completed")
+                messages.success(request, "Appointment marked completed")
+        except SlotUnavailable as e:
+            messages.error(request, str(e))
 
         return redirect("admin_panel:appointment_list")
 
@@ -347,7 +572,7 @@ def billing_list(request):
     q = request.GET.get('q', '')
     status = request.GET.get('status', '')
 
-    bills = Billing.objects.select_related('patient').order_by('-created_at')
+    bills = Billing.objects.select_related('patient')
 
     if q:
         bills = bills.filter(
@@ -359,6 +584,8 @@ def billing_list(request):
     if status:
         bills = bills.filter(status=status)
 
+    bills = paginate(request, bills, ("-created_at", "-id"))
+
     return render(request, "admin_panel/billing_list.html", {
         "bills": bills,
         "q": q,
@@ -456,7 +683,8 @@ def billing_delete(request, pk):
 
 @admin_required
 def payments(request):
-    pays = Payment.objects.all().order_by('-paid_at')
+    pays = Payment.objects.select_related("billing", "patient")
+    pays = paginate(request, pays, ("-paid_at", "-id"))
     return render(request, "admin_panel/payments.html", {"payments": pays})
 
 
@@ -480,6 +708,7 @@ def payment_create(request, billing_pk=None):
                 payment.billing = bill
                 payment.patient = bill.patient
                 payment.amount = bill.amount_due
+                payment.status = 'paid'
                 payment.save()
 
                 bill.status = 'paid'
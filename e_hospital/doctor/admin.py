@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DoctorProfile, Availability
+from .models import DoctorProfile, Availability, Slot, ScheduleException
 
 @admin.register(DoctorProfile)
 class DoctorProfileAdmin(admin.ModelAdmin):
@@ -10,3 +10,15 @@ class AvailabilityAdmin(admin.ModelAdmin):
     list_display = ('doctor', 'day_of_week', 'start_time', 'end_time', 'slot_duration_minutes')
     list_filter = ('doctor', 'day_of_week')
 
+
+
+@admin.register(Slot)
+class SlotAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'date', 'time', 'is_booked')
+    list_filter = ('is_booked', 'date')
+
+
+@admin.register(ScheduleException)
+class ScheduleExceptionAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'kind', 'start_date', 'end_date', 'start_time', 'end_time', 'reason')
+    list_filter = ('kind',)
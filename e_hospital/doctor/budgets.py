@@ -0,0 +1,29 @@
+"""
+Maximum SQL queries per request for the doctor URLs (see
+e_hospital.query_budget). Session, user and profile lookups account for
+3 of every logged-in request.
+"""
+
+QUERY_BUDGETS = {
+    "doctor:login": 2,
+    "doctor:dashboard": 5,
+    "doctor:appointment_list": 7,
+    "doctor:appointment_detail": 6,
+    "doctor:add_record": 4,
+    "doctor:view_prescription": 4,
+    "doctor:create_prescription": 8,
+    "doctor:start_consultation": 10,
+    "doctor:complete_appointment": 10,
+    "doctor:consultation": 5,
+    "doctor:edit_medical_record": 5,
+    "doctor:patient_medical_history": 6,
+    "doctor:search_records": 5,
+    "doctor:patient_timeline": 9,                # access check + one query per source
+    "doctor:manage_availability": 4,
+    "doctor:add_availability": 3,
+    "doctor:edit_availability": 4,
+    "doctor:delete_availability": 4,
+    "doctor:patient_list": 3,
+    "doctor:profile": 5,
+    "doctor:profile_edit": 4,
+}
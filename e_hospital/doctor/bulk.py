@@ -0,0 +1,98 @@
+from django.db import transaction
+
+from .intervals import WeekSchedule
+from .models import Availability, DoctorProfile
+from .slots import invalidate_weekly_template, refresh_doctor_slots, schedule_changed_on_commit
+
+
+def schedule_changed(doctor_ids):
+    """
+    What the Availability signals do per row, once per doctor, for
+    writes that bypass signals (bulk_create).
+    """
+    for doctor_id in doctor_ids:
+        invalidate_weekly_template(doctor_id)
+        refresh_doctor_slots(doctor_id)
+        schedule_changed_on_commit(doctor_id, template=True)
+
+
+def _requested_ids(doctor_ids):
+    """
+    Distinct integer ids in the given order; anything else (tampered form
+    values) is dropped
+    """
+    ids = []
+    for value in doctor_ids:
+        value = str(value).strip()
+        if value.isdigit() and int(value) not in ids:
+            ids.append(int(value))
+    return ids
+
+
+def apply_schedule_template(template, doctor_ids):
+    """
+    Add every entry of `template` to each doctor's availability.
+
+    Existing availability of all doctors is loaded in one query and
+    checked in memory; a doctor with any overlap is skipped as a whole
+    and reported, as is an id that is not a doctor. Everything else goes
+    in with one bulk_create. The check and the insert share a single
+    transaction, with the doctors' profile rows locked, so concurrent
+    applies to the same doctor cannot both pass the overlap check.
+
+    Returns (applied_doctor_ids, {doctor_id: [conflict messages]}).
+    """
+    requested = _requested_ids(doctor_ids)
+    entries = list(template.entries.all())
+
+    rows = []
+    applied = []
+    conflicts = {}
+
+    with transaction.atomic():
+        doctors = set(
+            DoctorProfile.objects.select_for_update()
+            .filter(user_id__in=requested)
+            .values_list("user_id", flat=True)
+        )
+        doctor_ids = [d for d in requested if d in doctors]
+        for doctor_id in requested:
+            if doctor_id not in doctors:
+                conflicts[doctor_id] = ["Not a doctor."]
+
+        existing = {doctor_id: [] for doctor_id in doctor_ids}
+        for av in Availability.objects.filter(doctor_id__in=doctor_ids):
+            existing[av.doctor_id].append(av)
+
+        for doctor_id in doctor_ids:
+            week = WeekSchedule(existing[doctor_id])
+            clashes = []
+
+            for entry in entries:
+                clash = week.add(entry.day_of_week, entry.start_time, entry.end_time)
+                if clash:
+                    clashes.append(
+                        f"{entry.get_day_of_week_display()} {entry.start_time:%H:%M}–{entry.end_time:%H:%M} "
+                        f"overlaps {clash[0]:%H:%M}–{clash[1]:%H:%M}"
+                    )
+
+            if clashes:
+                conflicts[doctor_id] = clashes
+                continue
+
+            applied.append(doctor_id)
+            rows.extend(
+                Availability(
+                    doctor_id=doctor_id,
+                    day_of_week=entry.day_of_week,
+                    start_time=entry.start_time,
+                    end_time=entry.end_time,
+                    slot_duration_minutes=entry.slot_duration_minutes,
+                )
+                for entry in entries
+            )
+
+        Availability.objects.bulk_create(rows)
+        schedule_changed(applied)
+
+    return applied, conflicts
@@ -0,0 +1,73 @@
+"""
+A consultation written as one unit: the medical record, its
+prescriptions and (optionally) the appointment's completion.
+
+Everything happens in one transaction, so a failure part way leaves
+nothing behind. The record started by start_consultation is filled in
+rather than duplicated. Prescriptions go in one bulk insert, and the
+status change is a single UPDATE through save(), so the appointment
+signals (counters, rollups, slots) still see it.
+"""
+from django.db import transaction
+
+from patient.models import Appointment, MedicalRecord, Prescription
+from patient.search import get_backend
+
+
+RECORD_FIELDS = ("diagnosis", "notes", "allergies", "medications")
+
+
+class ConsultationError(Exception):
+    """
+    The appointment cannot take this consultation
+    """
+
+
+def commit_consultation(doctor, appointment_id, record_fields, prescriptions=(), complete=True):
+    """
+    Save the consultation of one of `doctor`'s appointments and return
+    the record. `prescriptions` is [(medication, instructions)]; rows
+    without a medication are ignored. With `complete`, the appointment
+    must be confirmed and is marked completed in the same transaction.
+    """
+    prescriptions = [
+        (medication.strip(), (instructions or "").strip())
+        for medication, instructions in prescriptions
+        if medication and medication.strip()
+    ]
+
+    with transaction.atomic():
+        appointment = (
+            Appointment.objects.select_for_update()
+            .filter(pk=appointment_id, doctor=doctor)
+            .first()
+        )
+        if appointment is None:
+            raise ConsultationError("Appointment not found.")
+
+        if complete and appointment.status != "confirmed":
+            raise ConsultationError("Only a confirmed appointment can be completed.")
+
+        record = MedicalRecord.objects.filter(appointment=appointment).first() or MedicalRecord(
+            appointment=appointment, patient_id=appointment.patient_id, doctor=doctor,
+        )
+        for name in RECORD_FIELDS:
+            setattr(record, name, record_fields.get(name) or "")
+        record.save()
+
+        if prescriptions:
+            Prescription.objects.bulk_create(
+                Prescription(
+                    record=record, patient_id=record.patient_id,
+                    medication=medication, instructions=instructions,
+                )
+                for medication, instructions in prescriptions
+            )
+            # bulk_create skips the Prescription signals that reindex the record
+            get_backend().update([record.pk])
+
+        if complete:
+            appointment.status = "completed"
+            appointment.save(update_fields=["status"])
+
+    return record
@@ -6,7 +6,8 @@ from django.contrib.auth.models import User
 from accounts.models import Profile
 from doctor.models import DoctorProfile
 from datetime import datetime, timedelta, time
-from .models import Availability
+from .models import Availability, ScheduleException, ScheduleTemplate, ScheduleTemplateEntry, WEEK_DAYS
+from .intervals import overlapping_availabilities, WeekSchedule
 from patient.models import MedicalRecord
 
 
@@ -33,6 +34,24 @@ class DoctorCreateForm(forms.ModelForm):
 
 
 
+def check_slot_range(start, end, duration):
+    if start >= end:
+        raise forms.ValidationError("End time must be later than start time.")
+
+    
+    total_minutes = (datetime.combine(datetime.today(), end) - 
+                     datetime.combine(datetime.today(), start)).total_seconds() / 60
+
+    if duration > total_minutes:
+        raise forms.ValidationError("Slot duration cannot be larger than the time range.")
+
+    if total_minutes % duration != 0:
+        raise forms.ValidationError(
+            f"The selected time range ({int(total_minutes)} min) "
+            f"must be divisible by slot duration ({duration} min)."
+        )
+
+
 class AvailabilityForm(forms.ModelForm):
     class Meta:
         model = Availability
@@ -50,46 +69,132 @@ class AvailabilityForm(forms.ModelForm):
         end = cleaned_data.get("end_time")
         duration = cleaned_data.get("slot_duration_minutes")
 
-        if not day or not start or not end:
+        if day is None or not start or not end:
             return cleaned_data
 
         
-        if start >= end:
-            raise forms.ValidationError("End time must be later than start time.")
+        check_slot_range(start, end, duration)
 
         
-        total_minutes = (datetime.combine(datetime.today(), end) - 
-                         datetime.combine(datetime.today(), start)).total_seconds() / 60
+        doctor = self.instance.doctor if self.instance.doctor_id else self.initial.get("doctor")
+        
 
-        if duration > total_minutes:
-            raise forms.ValidationError("Slot duration cannot be larger than the time range.")
+        if doctor:
+            avail = overlapping_availabilities(
+                doctor, day, start, end, exclude_pk=self.instance.pk
+            ).first()
 
-        if total_minutes % duration != 0:
-            raise forms.ValidationError(
-                f"The selected time range ({int(total_minutes)} min) "
-                f"must be divisible by slot duration ({duration} min)."
-            )
+            if avail:
+                raise forms.ValidationError(
+                    f"Overlapping availability exists: {avail.start_time}–{avail.end_time}"
+                )
 
-        
-        doctor = self.instance.doctor if self.instance.pk else self.initial.get("doctor")
-        
+        return cleaned_data
+    
+    
 
-        if doctor:
-            qs = Availability.objects.filter(doctor=doctor, day_of_week=day)
+class ScheduleTemplateForm(forms.ModelForm):
+    class Meta:
+        model = ScheduleTemplate
+        fields = ["name"]
+        widgets = {
+            "name": forms.TextInput(attrs={"class": "form-control"}),
+        }
 
-            if self.instance.pk:
-                qs = qs.exclude(pk=self.instance.pk)
 
-            for avail in qs:
-                if (start < avail.end_time and end > avail.start_time):
-                    
-                    raise forms.ValidationError(
-                        f"Overlapping availability exists: {avail.start_time}–{avail.end_time}"
-                    )
+class ScheduleTemplateEntryForm(forms.ModelForm):
+    class Meta:
+        model = ScheduleTemplateEntry
+        fields = ["day_of_week", "start_time", "end_time", "slot_duration_minutes"]
+        widgets = {
+            "day_of_week": forms.Select(attrs={"class": "form-select"}),
+            "start_time": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+            "end_time": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+            "slot_duration_minutes": forms.NumberInput(attrs={"min": 5, "class": "form-control"}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start_time")
+        end = cleaned_data.get("end_time")
+        duration = cleaned_data.get("slot_duration_minutes")
+
+        if start and end and duration:
+            check_slot_range(start, end, duration)
 
         return cleaned_data
-    
-    from django import forms
+
+
+class BaseScheduleTemplateEntryFormSet(forms.BaseInlineFormSet):
+
+    def clean(self):
+        super().clean()
+
+        week = WeekSchedule()
+        for form in self.forms:
+            data = getattr(form, "cleaned_data", None)
+            if not data or data.get("DELETE") or data.get("day_of_week") is None:
+                continue
+
+            clash = week.add(data["day_of_week"], data["start_time"], data["end_time"])
+            if clash:
+                raise forms.ValidationError(
+                    f"{dict(WEEK_DAYS)[data['day_of_week']]} "
+                    f"{data['start_time']:%H:%M}–{data['end_time']:%H:%M} overlaps "
+                    f"{clash[0]:%H:%M}–{clash[1]:%H:%M}"
+                )
+
+
+ScheduleTemplateEntryFormSet = forms.inlineformset_factory(
+    ScheduleTemplate,
+    ScheduleTemplateEntry,
+    form=ScheduleTemplateEntryForm,
+    formset=BaseScheduleTemplateEntryFormSet,
+    extra=7,
+    can_delete=False,
+)
+
+
+class ScheduleExceptionForm(forms.ModelForm):
+    class Meta:
+        model = ScheduleException
+        fields = ["doctor", "kind", "start_date", "end_date", "start_time", "end_time", "reason"]
+        widgets = {
+            "doctor": forms.Select(attrs={"class": "form-select"}),
+            "kind": forms.Select(attrs={"class": "form-select"}),
+            "start_date": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+            "end_date": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+            "start_time": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+            "end_time": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+            "reason": forms.TextInput(attrs={"class": "form-control"}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.fields["doctor"].queryset = User.objects.filter(profile__role="doctor")
+        self.fields["doctor"].empty_label = "Whole clinic"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get("start_date")
+        end_date = cleaned_data.get("end_date")
+        start_time = cleaned_data.get("start_time")
+        end_time = cleaned_data.get("end_time")
+
+        if start_date and end_date and end_date < start_date:
+            raise forms.ValidationError("End date cannot be before start date.")
+
+        if (start_time is None) != (end_time is None):
+            raise forms.ValidationError("Give both a start and end time, or neither for whole days.")
+
+        if start_time and end_time and start_time >= end_time:
+            raise forms.ValidationError("End time must be later than start time.")
+
+        return cleaned_data
+
+
+from django import forms
 from patient.models import Prescription
 
 class PrescriptionForm(forms.ModelForm):
@@ -0,0 +1,141 @@
+import bisect
+
+from .models import Availability, WEEK_DAYS
+
+
+# ======================================================
+# DATABASE LOOKUP
+# ======================================================
+
+def overlapping_availabilities(doctor, day_of_week, start, end, exclude_pk=None):
+    """
+    Availability rows of `doctor` on `day_of_week` that overlap [start, end).
+
+    Only the overlapping rows are fetched; the (doctor, day_of_week,
+    start_time) prefix of the unique index narrows the scan.
+    """
+    qs = Availability.objects.filter(
+        doctor=doctor,
+        day_of_week=day_of_week,
+        start_time__lt=end,
+        end_time__gt=start,
+    )
+
+    if exclude_pk:
+        qs = qs.exclude(pk=exclude_pk)
+
+    return qs
+
+
+# ======================================================
+# IN-MEMORY WEEK
+# ======================================================
+
+class WeekSchedule:
+    """
+    Non-overlapping [start, end) intervals per weekday, kept sorted so a
+    new interval is checked against its two neighbours only (bisect).
+
+    Used to validate a whole submitted week, or many doctors' weeks in a
+    bulk import, without one query per row.
+    """
+
+    def __init__(self, availabilities=()):
+        self._starts = {day: [] for day, _ in WEEK_DAYS}
+        self._intervals = {day: [] for day, _ in WEEK_DAYS}
+
+        for av in availabilities:
+            self.add(av.day_of_week, av.start_time, av.end_time, label=av)
+
+    def conflict(self, day, start, end):
+        """
+        The stored (start, end, label) overlapping [start, end), or None
+        """
+        starts = self._starts[day]
+        intervals = self._intervals[day]
+        i = bisect.bisect_left(starts, start)
+
+        if i > 0 and intervals[i - 1][1] > start:
+            return intervals[i - 1]
+
+        if i < len(intervals) and intervals[i][0] < end:
+            return intervals[i]
+
+        return None
+
+    def add(self, day, start, end, label=None):
+        """
+        Insert the interval; returns the conflicting interval instead
+        (and stores nothing) if it would overlap.
+        """
+        clash = self.conflict(day, start, end)
+        if clash:
+            return clash
+
+        i = bisect.bisect_left(self._starts[day], start)
+        self._starts[day].insert(i, start)
+        self._intervals[day].insert(i, (start, end, label))
+        return None
+
+    def intervals(self, day):
+        return list(self._intervals[day])
+
+
+def week_conflicts(doctor, rows, replace=False):
+    """
+    Validate many (day_of_week, start, end) rows for one doctor at once.
+
+    Existing availability is loaded with a single query (skipped when
+    `replace` is set, i.e. the rows will replace the current week).
+    Returns a list of (row, clash) pairs, where clash is the existing
+    Availability or the earlier row it overlaps.
+    """
+    existing = [] if replace else Availability.objects.filter(doctor=doctor)
+    week = WeekSchedule(existing)
+
+    conflicts = []
+    for row in rows:
+        day, start, end = row[:3]
+        clash = week.add(day, start, end, label=row)
+        if clash:
+            conflicts.append((row, clash[2]))
+
+    return conflicts
+
+
+# ======================================================
+# INTERVAL ARITHMETIC
+# ======================================================
+
+def merge_intervals(intervals):
+    """
+    Sorted, non-overlapping union of (start, end) pairs
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(slots, blocked):
+    """
+    Starts of the (start, end) `slots` that do not overlap any `blocked`
+    interval. Both inputs sorted, `blocked` merged: one linear sweep.
+    """
+    free = []
+    i = 0
+
+    for start, end in slots:
+        while i < len(blocked) and blocked[i][1] <= start:
+            i += 1
+
+        if i < len(blocked) and blocked[i][0] < end:
+            continue
+
+        free.append(start)
+
+    return free
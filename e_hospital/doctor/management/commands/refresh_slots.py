@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from doctor.models import Availability, Slot
+from doctor.slots import SLOT_WINDOW_DAYS, refresh_doctor_slots
+
+
+class Command(BaseCommand):
+    help = "Roll the materialized slot inventory forward (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=SLOT_WINDOW_DAYS)
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+
+        pruned, _ = Slot.objects.filter(date__lt=today).delete()
+
+        # Expired holds are already ignored by the read path; this just
+        # tidies them up (held_until is indexed, so no table scan)
+        Slot.objects.filter(held_until__lte=timezone.now()).update(
+            held_by=None, held_until=None
+        )
+
+        doctor_ids = (
+            Availability.objects.order_by("doctor_id")
+            .values_list("doctor_id", flat=True)
+            .distinct()
+        )
+        for doctor_id in doctor_ids:
+            refresh_doctor_slots(doctor_id, days=options["days"])
+
+        # Doctors whose availability was removed entirely
+        Slot.objects.exclude(doctor_id__in=doctor_ids).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed slots for {len(doctor_ids)} doctors, pruned {pruned} past slots."
+        ))
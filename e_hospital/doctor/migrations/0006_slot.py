@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0005_doctorprofile_profile_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Slot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('is_booked', models.BooleanField(default=False)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['doctor', 'date', 'time'],
+                'unique_together': {('doctor', 'date', 'time')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+import datetime
+
+from django.db import migrations
+
+
+def add_lunch_break(apps, schema_editor):
+    """
+    The 13:00–14:00 lunch break used to be hard-coded in slot generation
+    """
+    ScheduleException = apps.get_model('doctor', 'ScheduleException')
+    ScheduleException.objects.create(
+        kind='break',
+        start_date=datetime.date(2000, 1, 1),
+        start_time=datetime.time(13, 0),
+        end_time=datetime.time(14, 0),
+        reason='Lunch break',
+    )
+
+
+def remove_lunch_break(apps, schema_editor):
+    ScheduleException = apps.get_model('doctor', 'ScheduleException')
+    ScheduleException.objects.filter(
+        doctor__isnull=True, kind='break', reason='Lunch break'
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctor', '0009_scheduleexception'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_lunch_break, remove_lunch_break),
+    ]
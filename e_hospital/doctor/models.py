@@ -52,3 +52,91 @@ class Availability(models.Model):
         return f"{self.doctor.username} - {self.get_day_of_week_display()} {self.start_time}-{self.end_time}"
 
 
+class Slot(models.Model):
+    """
+    One bookable slot for a doctor on a concrete date.
+
+    Rows are materialized from Availability for a rolling window
+    (see doctor/slots.py) so the booking endpoints only do an
+    indexed range read instead of rebuilding the grid per request.
+    """
+
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='slots')
+    date = models.DateField()
+    time = models.TimeField()
+    is_booked = models.BooleanField(default=False)
+
+    # Short-lived reservation while a patient fills in the booking form;
+    # an expired hold is simply ignored, there is nothing to clean up.
+    held_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='held_slots')
+    held_until = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['doctor', 'date', 'time']
+        unique_together = ('doctor', 'date', 'time')
+
+    def __str__(self):
+        return f"{self.doctor} - {self.date} {self.time}"
+
+
+class ScheduleTemplate(models.Model):
+    """
+    A named weekly pattern admins can apply to many doctors at once
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class ScheduleTemplateEntry(models.Model):
+    template = models.ForeignKey(ScheduleTemplate, on_delete=models.CASCADE, related_name='entries')
+    day_of_week = models.IntegerField(choices=WEEK_DAYS)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_duration_minutes = models.PositiveIntegerField(default=15)
+
+    class Meta:
+        ordering = ['template', 'day_of_week', 'start_time']
+
+    def __str__(self):
+        return f"{self.template} - {self.get_day_of_week_display()} {self.start_time}-{self.end_time}"
+
+
+EXCEPTION_KINDS = (
+    ('holiday', 'Clinic holiday'),
+    ('leave', 'Leave'),
+    ('break', 'Break'),
+)
+
+
+class ScheduleException(models.Model):
+    """
+    A period in which no slots are offered, subtracted from Availability.
+
+    No doctor means the whole clinic; no times means the whole day; no
+    end date means it repeats every day from start_date on (e.g. lunch).
+    """
+
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='schedule_exceptions')
+    kind = models.CharField(max_length=20, choices=EXCEPTION_KINDS)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    reason = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ['start_date', 'start_time']
+        indexes = [
+            models.Index(fields=['doctor', 'start_date', 'end_date']),
+        ]
+
+    def __str__(self):
+        who = self.doctor.username if self.doctor_id else "Clinic"
+        return f"{who} - {self.get_kind_display()} from {self.start_date}"
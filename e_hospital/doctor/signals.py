@@ -0,0 +1,53 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from patient.models import Appointment
+from .models import Availability, ScheduleException
+from .slots import (
+    invalidate_weekly_template, refresh_doctor_slots, schedule_changed_on_commit, sync_slot,
+)
+
+
+# Availability changed → drop the cached template, rebuild the slot window
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def availability_changed(sender, instance, **kwargs):
+    # Dropped now so the refresh reads the new rows, and again on commit
+    invalidate_weekly_template(instance.doctor_id)
+    refresh_doctor_slots(instance.doctor_id)
+    schedule_changed_on_commit(instance.doctor_id, template=True)
+
+
+# Appointment booked / moved / cancelled → update the affected slots
+# (_previous_slot is recorded by patient.signals)
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def appointment_changed(sender, instance, **kwargs):
+    current = (instance.doctor_id, instance.date, instance.time)
+    previous = getattr(instance, "_previous_slot", None)
+
+    sync_slot(*current)
+    schedule_changed_on_commit(instance.doctor_id)
+
+    if previous and previous != current:
+        sync_slot(*previous)
+        schedule_changed_on_commit(previous[0])
+
+
+# Holiday / leave / break changed → rebuild the affected doctors' windows
+@receiver(post_save, sender=ScheduleException)
+@receiver(post_delete, sender=ScheduleException)
+def schedule_exception_changed(sender, instance, **kwargs):
+    if instance.doctor_id:
+        doctor_ids = [instance.doctor_id]
+    else:
+        # order_by() first: Meta.ordering would put its columns in the DISTINCT
+        doctor_ids = (
+            Availability.objects.order_by("doctor_id")
+            .values_list("doctor_id", flat=True)
+            .distinct()
+        )
+
+    for doctor_id in doctor_ids:
+        refresh_doctor_slots(doctor_id)
+        schedule_changed_on_commit(doctor_id)
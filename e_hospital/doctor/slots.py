@@ -0,0 +1,506 @@
+import datetime
+import hashlib
+import heapq
+import itertools
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .intervals import merge_intervals, subtract_intervals
+from .models import Availability, ScheduleException, Slot
+from patient.models import Appointment
+
+
+# How many days ahead the slot inventory is materialized
+SLOT_WINDOW_DAYS = 30
+
+# How many days ahead patients can book
+BOOKING_WINDOW_DAYS = 14
+
+# How long a slot stays reserved while a patient completes the form
+HOLD_MINUTES = 5
+
+# Appointment statuses that occupy a slot
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+
+# ======================================================
+# SLOT GRID
+# ======================================================
+
+def availability_slots(availability):
+    """
+    (start, end) time pairs of the slots one availability row produces
+    """
+    reference = datetime.date(2000, 1, 3)
+    current = datetime.datetime.combine(reference, availability.start_time)
+    end = datetime.datetime.combine(reference, availability.end_time)
+    duration = datetime.timedelta(minutes=availability.slot_duration_minutes)
+
+    while current + duration <= end:
+        yield current.time(), (current + duration).time()
+        current += duration
+
+
+def exceptions_by_date(doctor_id, start, end):
+    """
+    {date: merged [(start_time, end_time)]} blocked by ScheduleException
+    rows of the doctor or the whole clinic within [start, end).
+    Only rows overlapping the range are read (doctor/start_date index).
+    """
+    rows = ScheduleException.objects.filter(
+        Q(doctor_id=doctor_id) | Q(doctor__isnull=True),
+        Q(end_date__isnull=True) | Q(end_date__gte=start),
+        start_date__lt=end,
+    ).values_list("start_date", "end_date", "start_time", "end_time")
+
+    last = end - datetime.timedelta(days=1)
+    blocked = {}
+
+    for first_day, last_day, from_time, to_time in rows:
+        interval = (from_time or datetime.time.min, to_time or datetime.time.max)
+
+        day = max(first_day, start)
+        stop = min(last_day or last, last)
+        while day <= stop:
+            blocked.setdefault(day, []).append(interval)
+            day += datetime.timedelta(days=1)
+
+    return {day: merge_intervals(intervals) for day, intervals in blocked.items()}
+
+
+# ======================================================
+# SCHEDULE CACHE
+# ======================================================
+# The Slot rows are the one record of what is free: materialized from
+# Availability and ScheduleException (refresh_doctor_slots), with the
+# booked flag following the appointments (sync_slot). The parsed weekly
+# template is cached for materializing; the free-slot grid of the rolling
+# window, read from the Slot rows, is cached per doctor under the
+# schedule version, which the signals bump whenever those rows change.
+
+def _template_key(doctor_id):
+    return f"schedule:template:{doctor_id}"
+
+
+def _grid_key(doctor_id, today):
+    return f"schedule:grid:{doctor_id}:{schedule_version(doctor_id)}:{today}"
+
+
+def _count(outcome, n=1):
+    if not n:
+        return
+
+    key = f"schedule:stats:{outcome}"
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, n)
+    except ValueError:
+        pass
+
+
+def schedule_cache_stats():
+    hits = cache.get("schedule:stats:hits", 0)
+    misses = cache.get("schedule:stats:misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def reset_schedule_cache_stats():
+    cache.delete_many(["schedule:stats:hits", "schedule:stats:misses"])
+
+
+def invalidate_weekly_template(doctor_id):
+    cache.delete(_template_key(doctor_id))
+
+
+def weekly_template(doctor_id):
+    """
+    {weekday: sorted (start, end) slot pairs} parsed from the doctor's Availability
+    """
+    key = _template_key(doctor_id)
+    template = cache.get(key)
+
+    if template is not None:
+        _count("hits")
+        return template
+
+    _count("misses")
+
+    by_weekday = {}
+    for av in Availability.objects.filter(doctor_id=doctor_id):
+        by_weekday.setdefault(av.day_of_week, set()).update(availability_slots(av))
+
+    template = {day: tuple(sorted(slots)) for day, slots in by_weekday.items()}
+    cache.set(key, template, None)
+    return template
+
+
+def build_grid(doctor_id, start, end):
+    """
+    {date: set(times)} for every working day in [start, end), with
+    holidays, leave and breaks subtracted
+    """
+    template = weekly_template(doctor_id)
+    blocked = exceptions_by_date(doctor_id, start, end) if template else {}
+
+    grid = {}
+    day = start
+    while day < end:
+        slots = template.get(day.weekday())
+        if slots:
+            times = subtract_intervals(slots, blocked.get(day, []))
+            if times:
+                grid[day] = set(times)
+        day += datetime.timedelta(days=1)
+
+    return grid
+
+
+def booked_pairs(doctor_id, start, end):
+    """
+    Set of (date, time) already taken by an active appointment
+    """
+    return set(
+        Appointment.objects.filter(
+            doctor_id=doctor_id,
+            date__gte=start,
+            date__lt=end,
+            status__in=ACTIVE_STATUSES,
+        ).order_by().values_list("date", "time")
+    )
+
+
+def _free_slot_rows(doctor_ids, start, end):
+    """
+    {doctor_id: {date: frozenset(times)}} of the doctors' unbooked Slot
+    rows in [start, end), in one query
+    """
+    rows = (
+        Slot.objects.filter(doctor_id__in=doctor_ids, date__gte=start, date__lt=end, is_booked=False)
+        .order_by()
+        .values_list("doctor_id", "date", "time")
+    )
+
+    grids = {}
+    for doctor_id, day, time_ in rows:
+        grids.setdefault(doctor_id, {}).setdefault(day, set()).add(time_)
+    return {
+        doctor_id: {day: frozenset(times) for day, times in grid.items()}
+        for doctor_id, grid in grids.items()
+    }
+
+
+def _window_grids(doctor_ids, today):
+    """
+    {doctor_id: free grid of the window}, from the cache where present;
+    the misses are read together
+    """
+    keys = {_grid_key(d, today): d for d in doctor_ids}
+    grids = {keys[key]: grid for key, grid in cache.get_many(list(keys)).items()}
+
+    missing = [d for d in doctor_ids if d not in grids]
+    _count("hits", len(grids))
+    _count("misses", len(missing))
+
+    if missing:
+        ensure_slots_many(missing)
+        read = _free_slot_rows(
+            missing, today, today + datetime.timedelta(days=SLOT_WINDOW_DAYS)
+        )
+        fresh = {d: read.get(d, {}) for d in missing}
+        cache.set_many({_grid_key(d, today): grid for d, grid in fresh.items()}, 60 * 60 * 24)
+        grids.update(fresh)
+
+    return grids
+
+
+def free_grids(doctor_ids, start, end):
+    """
+    {doctor_id: {date: set(free times)}} for [start, end), served from
+    the cached grids of the materialized window. Days past the window
+    have no Slot rows yet, cannot be booked and come back empty.
+    """
+    now = timezone.localtime()
+    today = now.date()
+
+    doctor_ids = [int(d) for d in doctor_ids]
+    grids = _window_grids(doctor_ids, today)
+
+    free = {}
+    for doctor_id in doctor_ids:
+        days = free[doctor_id] = {}
+
+        for day, times in grids[doctor_id].items():
+            if not start <= day < end:
+                continue
+
+            if day == today:
+                times = {t for t in times if t > now.time()}
+
+            if times:
+                days[day] = set(times)
+
+    return free
+
+
+def free_grid(doctor_id, start, end):
+    """
+    {date: set(free times)} of one doctor for [start, end)
+    """
+    return free_grids([doctor_id], start, end)[int(doctor_id)]
+
+
+def free_dates(doctor_id, start, days=BOOKING_WINDOW_DAYS):
+    """
+    Sorted dates in the window that still have at least one free slot
+    """
+    return sorted(free_grid(doctor_id, start, start + datetime.timedelta(days=days)))
+
+
+# ======================================================
+# INVENTORY MAINTENANCE
+# ======================================================
+
+def _horizon_key(doctor_id):
+    return f"slots:horizon:{doctor_id}"
+
+
+@transaction.atomic
+def refresh_doctor_slots(doctor_id, start=None, days=SLOT_WINDOW_DAYS):
+    """
+    Bring a doctor's slot rows in line with Availability and bookings
+    for the window starting at `start` (today by default).
+    """
+    start = start or timezone.localdate()
+    end = start + datetime.timedelta(days=days)
+
+    grid = build_grid(doctor_id, start, end)
+    booked = booked_pairs(doctor_id, start, end)
+
+    wanted = {(d, t) for d, times in grid.items() for t in times}
+
+    existing = {
+        (s.date, s.time): s
+        for s in Slot.objects.filter(doctor_id=doctor_id, date__gte=start, date__lt=end)
+    }
+
+    stale = [s.pk for key, s in existing.items() if key not in wanted]
+    if stale:
+        Slot.objects.filter(pk__in=stale).delete()
+
+    Slot.objects.bulk_create(
+        [
+            Slot(doctor_id=doctor_id, date=d, time=t, is_booked=(d, t) in booked)
+            for d, t in wanted
+            if (d, t) not in existing
+        ],
+        ignore_conflicts=True,
+    )
+
+    flipped = [
+        s for key, s in existing.items()
+        if key in wanted and s.is_booked != (key in booked)
+    ]
+    for s in flipped:
+        s.is_booked = not s.is_booked
+    Slot.objects.bulk_update(flipped, ["is_booked"])
+
+    if start == timezone.localdate():
+        cache.set(_horizon_key(doctor_id), start, 60 * 60 * 24)
+
+
+def ensure_slots(doctor_id):
+    """
+    Roll the window forward at most once a day per doctor, so the
+    inventory stays populated even if the nightly command did not run.
+    """
+    ensure_slots_many([doctor_id])
+
+
+def ensure_slots_many(doctor_ids):
+    """
+    ensure_slots for many doctors with a single cache round trip
+    """
+    today = timezone.localdate()
+    keys = {_horizon_key(d): d for d in doctor_ids}
+    fresh = cache.get_many(list(keys))
+
+    for key, doctor_id in keys.items():
+        if fresh.get(key) != today:
+            refresh_doctor_slots(doctor_id)
+
+
+def sync_slot(doctor_id, date, time):
+    """
+    Re-derive the booked flag of a single slot from its appointments
+    """
+    if not doctor_id:
+        return
+
+    taken = Appointment.objects.filter(
+        doctor_id=doctor_id,
+        date=date,
+        time=time,
+        status__in=ACTIVE_STATUSES,
+    ).exists()
+
+    Slot.objects.filter(doctor_id=doctor_id, date=date, time=time).update(is_booked=taken)
+
+
+# ======================================================
+# SCHEDULE VERSIONS (ETags)
+# ======================================================
+
+def _version_key(doctor_id):
+    return f"schedule:version:{doctor_id}"
+
+
+def schedule_version(doctor_id):
+    """
+    Opaque per-doctor counter that changes whenever the doctor's free
+    slots may have changed. Seeded from the clock so an evicted key can
+    never hand out a version that was already used.
+    """
+    key = _version_key(doctor_id)
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def bump_schedule_version(doctor_id):
+    if not doctor_id:
+        return
+
+    try:
+        cache.incr(_version_key(doctor_id))
+    except ValueError:
+        cache.set(_version_key(doctor_id), time.time_ns(), None)
+
+
+def schedule_changed_on_commit(doctor_id, template=False):
+    """
+    Bump the doctor's schedule version (and drop the cached weekly
+    template) once the current transaction commits, right away outside
+    one. Bumping earlier would let a concurrent reader rebuild the grid
+    from the old rows and cache it under the new version.
+    """
+    def changed():
+        if template:
+            invalidate_weekly_template(doctor_id)
+        bump_schedule_version(doctor_id)
+
+    transaction.on_commit(changed)
+
+
+def schedule_etag(doctor_ids, *parts):
+    """
+    ETag for any view derived from the given doctors' schedules.
+    Only reads the cache; also rolls over every 15 minutes so slots
+    that have just passed drop out.
+    """
+    now = timezone.localtime()
+    bucket = now.replace(minute=now.minute - now.minute % 15, second=0, microsecond=0)
+
+    raw = "|".join(
+        [bucket.isoformat()]
+        + [str(p) for p in parts]
+        + [f"{d}:{schedule_version(d)}" for d in doctor_ids]
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# ======================================================
+# READ PATH
+# ======================================================
+
+def _not_held(now, user=None):
+    not_held = Q(held_until__isnull=True) | Q(held_until__lte=now)
+    if user is not None:
+        not_held |= Q(held_by=user)
+    return not_held
+
+
+def held_slots(doctor_ids, start, end, user=None):
+    """
+    {(doctor_id, date): set(times)} held by someone other than `user` on
+    [start, end). Read from the Slot rows (held_until index) rather than
+    a cache marker, so a hold taken in one worker process is seen by all.
+    """
+    qs = Slot.objects.filter(
+        doctor_id__in=list(doctor_ids), date__gte=start, date__lt=end,
+        held_until__gt=timezone.now(),
+    )
+    if user is not None:
+        qs = qs.exclude(held_by=user)
+
+    held = {}
+    for doctor_id, date, time_ in qs.order_by().values_list("doctor_id", "date", "time"):
+        held.setdefault((doctor_id, date), set()).add(time_)
+    return held
+
+
+def free_slots(doctor_id, date, user=None):
+    """
+    Free slot times for one doctor and date, in order, from one indexed
+    read of the Slot rows. Slots held by another patient are left out;
+    `user`'s own hold is still offered.
+    """
+    ensure_slots(doctor_id)
+
+    now = timezone.localtime()
+    slots = Slot.objects.filter(
+        _not_held(now, user), doctor_id=doctor_id, date=date, is_booked=False,
+    )
+    if date == now.date():
+        slots = slots.filter(time__gt=now.time())
+
+    return list(slots.order_by("time").values_list("time", flat=True))
+
+
+def earliest_free_slots(doctor_ids, k, user=None):
+    """
+    The next `k` free (date, time, doctor_id) across many doctors.
+
+    A single query takes at most `k` upcoming free slots per doctor
+    (ROW_NUMBER over the (doctor, date, time) index); those per-doctor
+    streams are already enough to contain the global top `k`, which a
+    heap merge then picks out.
+    """
+    doctor_ids = list(doctor_ids)
+    if not doctor_ids or k <= 0:
+        return []
+
+    ensure_slots_many(doctor_ids)
+
+    now = timezone.localtime()
+    upcoming = Q(date__gt=now.date()) | Q(date=now.date(), time__gt=now.time())
+
+    rows = (
+        Slot.objects.filter(
+            _not_held(now, user), upcoming,
+            doctor_id__in=doctor_ids, is_booked=False,
+        )
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=F("doctor_id"),
+            order_by=[F("date").asc(), F("time").asc()],
+        ))
+        .filter(rank__lte=k)
+        .values_list("doctor_id", "date", "time")
+    )
+
+    streams = {}
+    for doctor_id, date, time_ in rows:
+        streams.setdefault(doctor_id, []).append((date, time_, doctor_id))
+
+    for stream in streams.values():
+        stream.sort()
+
+    return list(itertools.islice(heapq.merge(*streams.values()), k))
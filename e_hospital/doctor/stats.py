@@ -0,0 +1,64 @@
+import datetime
+
+from django.db.models import Count, Q
+
+from patient.models import Appointment, APPOINTMENT_STATUS
+
+
+TREND_DAYS = 7
+
+
+def _status_counts():
+    """
+    One COUNT(...) FILTER (WHERE status = ...) per status, plus the total
+    """
+    counts = {
+        status: Count("id", filter=Q(status=status))
+        for status, _ in APPOINTMENT_STATUS
+    }
+    counts["total"] = Count("id")
+    return counts
+
+
+def today_summary(doctor_id, today):
+    """
+    Today's appointments (patients joined) and their per-status counts,
+    counted from the rows already loaded: one query in all.
+    """
+    appointments = list(
+        Appointment.objects.filter(doctor_id=doctor_id, date=today)
+        .select_related("patient")
+        .order_by("time")
+    )
+
+    counts = dict.fromkeys((status for status, _ in APPOINTMENT_STATUS), 0)
+    for appointment in appointments:
+        counts[appointment.status] = counts.get(appointment.status, 0) + 1
+    counts["total"] = len(appointments)
+
+    return appointments, counts
+
+
+def weekly_trend(doctor_id, today, days=TREND_DAYS):
+    """
+    Per-day status counts for the `days` days ending today, oldest first,
+    from one grouped query. Days without appointments are filled with
+    zeros.
+    """
+    start = today - datetime.timedelta(days=days - 1)
+
+    rows = (
+        Appointment.objects.filter(doctor_id=doctor_id, date__range=(start, today))
+        .order_by()
+        .values("date")
+        .annotate(**_status_counts())
+    )
+    by_date = {row.pop("date"): row for row in rows}
+
+    empty = {key: 0 for key in _status_counts()}
+    trend = []
+    for offset in range(days):
+        date = start + datetime.timedelta(days=offset)
+        trend.append({"date": date, **by_date.get(date, empty)})
+
+    return trend
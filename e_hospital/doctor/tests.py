@@ -1,3 +1,272 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .bulk import apply_schedule_template
+from .consultation import ConsultationError, commit_consultation
+from .forms import AvailabilityForm
+from .intervals import WeekSchedule, week_conflicts
+from .models import Availability, DoctorProfile, ScheduleException, ScheduleTemplate, Slot
+from .slots import free_slots
+from .stats import today_summary, weekly_trend
+from patient.models import Appointment, MedicalRecord, Prescription
+from patient.search import get_backend
+
+
+def t(hour, minute=0):
+    return datetime.time(hour, minute)
+
+
+class AvailabilityOverlapTests(TestCase):
+
+    def setUp(self):
+        self.doctor = User.objects.create_user(username="doc")
+        Availability.objects.create(
+            doctor=self.doctor, day_of_week=0, start_time=t(9), end_time=t(12)
+        )
+
+    def form(self, day, start, end):
+        return AvailabilityForm(
+            {
+                "day_of_week": day,
+                "start_time": start,
+                "end_time": end,
+                "slot_duration_minutes": 15,
+            },
+            instance=Availability(doctor=self.doctor),
+        )
+
+    def test_form_rejects_overlap_on_monday(self):
+        self.assertFalse(self.form(0, "11:00", "13:00").is_valid())
+        self.assertTrue(self.form(0, "12:00", "13:00").is_valid())
+
+    def test_week_schedule_checks_neighbours(self):
+        week = WeekSchedule()
+        self.assertIsNone(week.add(1, t(9), t(10)))
+        self.assertIsNone(week.add(1, t(11), t(12)))
+        self.assertIsNone(week.add(1, t(10), t(11)))
+        self.assertIsNotNone(week.add(1, t(10, 30), t(11, 30)))
+        self.assertEqual(len(week.intervals(1)), 3)
+
+    def test_week_conflicts(self):
+        rows = [(0, t(8), t(10)), (2, t(9), t(12)), (2, t(11), t(13))]
+
+        with self.assertNumQueries(1):
+            conflicts = week_conflicts(self.doctor, rows)
+
+        self.assertEqual([row for row, _ in conflicts], [rows[0], rows[2]])
+        self.assertEqual(week_conflicts(self.doctor, rows[:2], replace=True), [])
+
+
+class ScheduleTemplateTests(TestCase):
+
+    def setUp(self):
+        self.template = ScheduleTemplate.objects.create(name="Weekday mornings")
+        for day in range(5):
+            self.template.entries.create(day_of_week=day, start_time=t(9), end_time=t(12))
+
+        self.doctors = [User.objects.create_user(username=f"doc{i}") for i in range(3)]
+        for doctor in self.doctors:
+            DoctorProfile.objects.create(user=doctor)
+        Availability.objects.create(
+            doctor=self.doctors[2], day_of_week=4, start_time=t(11), end_time=t(14)
+        )
+
+    def test_apply_reports_conflicting_doctors(self):
+        applied, conflicts = apply_schedule_template(
+            self.template, [d.id for d in self.doctors]
+        )
+
+        self.assertEqual(applied, [self.doctors[0].id, self.doctors[1].id])
+        self.assertEqual(list(conflicts), [self.doctors[2].id])
+        self.assertIn("Friday", conflicts[self.doctors[2].id][0])
+
+        self.assertEqual(Availability.objects.filter(doctor=self.doctors[0]).count(), 5)
+        self.assertEqual(Availability.objects.filter(doctor=self.doctors[2]).count(), 1)
+
+    def test_only_doctor_ids_are_applied(self):
+        patient = User.objects.create_user(username="pat")
+
+        applied, conflicts = apply_schedule_template(
+            self.template, ["x", "", str(patient.id), str(self.doctors[0].id), str(self.doctors[0].id)]
+        )
+
+        self.assertEqual(applied, [self.doctors[0].id])
+        self.assertEqual(conflicts, {patient.id: ["Not a doctor."]})
+        self.assertFalse(Availability.objects.filter(doctor=patient).exists())
+        self.assertTrue(Slot.objects.filter(doctor=self.doctors[0]).exists())
+
+
+class ScheduleExceptionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(username="doc")
+        self.date = timezone.localdate() + datetime.timedelta(days=1)
+        Availability.objects.create(
+            doctor=self.doctor, day_of_week=self.date.weekday(),
+            start_time=t(12), end_time=t(15), slot_duration_minutes=30,
+        )
+
+    def test_clinic_lunch_break_is_subtracted(self):
+        self.assertEqual(
+            free_slots(self.doctor.id, self.date),
+            [t(12), t(12, 30), t(14), t(14, 30)],
+        )
+
+    def test_leave_and_break_refresh_slots(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ScheduleException.objects.create(
+                doctor=self.doctor, kind="break", start_date=self.date,
+                end_date=self.date, start_time=t(14, 15), end_time=t(14, 45),
+            )
+        self.assertEqual(free_slots(self.doctor.id, self.date), [t(12), t(12, 30)])
+        self.assertFalse(
+            Slot.objects.filter(doctor=self.doctor, date=self.date, time=t(14)).exists()
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ScheduleException.objects.create(
+                doctor=self.doctor, kind="leave", start_date=self.date, end_date=None,
+            )
+        self.assertEqual(free_slots(self.doctor.id, self.date), [])
+
+
+    def test_clinic_wide_exception_refreshes_each_doctor_once(self):
+        other = User.objects.create_user(username="doc2")
+        for day in range(3):
+            Availability.objects.create(
+                doctor=other, day_of_week=day,
+                start_time=t(9), end_time=t(11), slot_duration_minutes=30,
+            )
+
+        with mock.patch("doctor.signals.refresh_doctor_slots") as refresh:
+            ScheduleException.objects.create(kind="holiday", start_date=self.date, end_date=self.date)
+
+        self.assertCountEqual(
+            [call.args[0] for call in refresh.call_args_list], [self.doctor.id, other.id]
+        )
+
+
+class DashboardStatsTests(TestCase):
+
+    def setUp(self):
+        self.doctor = User.objects.create_user(username="doc")
+        self.patient = User.objects.create_user(username="pat")
+        self.today = timezone.localdate()
+
+        for hour, status in [(9, "pending"), (10, "completed"), (11, "completed"), (12, "cancelled")]:
+            self.book(self.today, hour, status)
+        self.book(self.today - datetime.timedelta(days=2), 9, "completed")
+
+    def book(self, date, hour, status):
+        Appointment.objects.bulk_create([
+            Appointment(patient=self.patient, doctor=self.doctor, date=date, time=t(hour), status=status)
+        ])
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            appointments, counts = today_summary(self.doctor.id, self.today)
+            [a.patient.username for a in appointments]
+
+        self.assertEqual(len(appointments), 4)
+        self.assertEqual(
+            counts,
+            {"total": 4, "pending": 1, "confirmed": 0, "completed": 2, "cancelled": 1},
+        )
+
+    def test_weekly_trend_fills_empty_days(self):
+        with self.assertNumQueries(1):
+            trend = weekly_trend(self.doctor.id, self.today)
+
+        self.assertEqual([day["total"] for day in trend], [0, 0, 0, 0, 1, 0, 4])
+        self.assertEqual(trend[-1]["date"], self.today)
+        self.assertEqual(trend[4]["completed"], 1)
+
+
+class ConsultationTests(TestCase):
+
+    def setUp(self):
+        self.doctor = User.objects.create_user(username="doc")
+        self.doctor.profile.role = "doctor"
+        self.doctor.profile.save()
+        self.patient = User.objects.create_user(username="pat")
+        self.appt = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor,
+            date=timezone.localdate(), time=t(9), status="confirmed",
+        )
+
+    def commit(self, prescriptions, **kwargs):
+        return commit_consultation(
+            self.doctor, self.appt.id, {"diagnosis": "Migraine", "notes": "Aura"}, prescriptions, **kwargs
+        )
+
+    def test_record_prescriptions_and_completion_in_one_go(self):
+        record = self.commit([("Sumatriptan", "as needed"), ("", ""), ("Rest ", "")])
+
+        self.appt.refresh_from_db()
+        self.assertEqual(self.appt.status, "completed")
+        self.assertEqual((record.patient, record.appointment, record.diagnosis), (self.patient, self.appt, "Migraine"))
+        self.assertEqual(
+            sorted(record.prescriptions.values_list("medication", "instructions")),
+            [("Rest", ""), ("Sumatriptan", "as needed")],
+        )
+        # Bulk-inserted prescriptions are still searchable
+        self.assertEqual([hit.record_id for hit in get_backend().search("sumatriptan")], [record.pk])
+
+    def test_fills_in_the_started_record(self):
+        started = MedicalRecord.objects.create(patient=self.patient, doctor=self.doctor, appointment=self.appt)
+
+        record = self.commit([("Sumatriptan", "")])
+
+        self.assertEqual(record.pk, started.pk)
+        self.assertEqual(MedicalRecord.objects.count(), 1)
+
+    def test_queries_do_not_grow_with_prescriptions(self):
+        def count(n):
+            self.appt.status = "confirmed"
+            self.appt.save()
+            MedicalRecord.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                self.commit([(f"Drug {i}", "") for i in range(n)])
+            return len(queries)
+
+        self.assertEqual(count(1), count(10))
+
+    def test_failure_leaves_nothing_behind(self):
+        with mock.patch.object(Appointment, "save", side_effect=DatabaseError("lost")):
+            with self.assertRaises(DatabaseError):
+                self.commit([("Sumatriptan", "")])
+
+        self.assertFalse(MedicalRecord.objects.exists())
+        self.assertFalse(Prescription.objects.exists())
+
+    def test_only_confirmed_appointments_complete(self):
+        Appointment.objects.filter(pk=self.appt.pk).update(status="pending")
+
+        with self.assertRaises(ConsultationError):
+            self.commit([("Sumatriptan", "")])
+        self.assertFalse(MedicalRecord.objects.exists())
+
+    def test_single_submit_endpoint(self):
+        self.client.force_login(self.doctor)
+
+        response = self.client.post(reverse("doctor:consultation", args=[self.appt.id]), {
+            "diagnosis": "Migraine", "notes": "", "allergies": "", "medications": "",
+            "medication": ["Sumatriptan", ""], "instructions": ["as needed", ""],
+            "complete": "1",
+        })
 
-# Create your tests here.
+        self.assertRedirects(
+            response, reverse("doctor:appointment_detail", args=[self.appt.id]), fetch_redirect_response=False
+        )
+        self.appt.refresh_from_db()
+        self.assertEqual(self.appt.status, "completed")
+        self.assertEqual(Prescription.objects.get().medication, "Sumatriptan")
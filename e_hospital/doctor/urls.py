@@ -13,6 +13,7 @@ urlpatterns = [
     path("prescription/<int:appointment_id>/create/",views.create_prescription,name="create_prescription"),
     path("appointments/<int:appointment_id>/start/",views.start_consultation,name="start_consultation" ),
     path("appointments/<int:appointment_id>/complete/",views.complete_appointment,name="complete_appointment"),
+    path("appointments/<int:appointment_id>/consultation/",views.consultation,name="consultation"),
     path("appointments/<int:appointment_id>/record/",views.edit_medical_record, name="edit_medical_record"),
     path("appointments/<int:pk>/history/",views.patient_medical_history,name="patient_medical_history"),
 
@@ -22,6 +23,8 @@ urlpatterns = [
     path('availability/<int:pk>/delete/', views.delete_availability, name='delete_availability'),
 
     path('patients/', views.patient_list, name='patient_list'),
+    path('records/search/', views.search_records, name='search_records'),
+    path('patients/<int:patient_id>/timeline/', views.patient_timeline, name='patient_timeline'),
 
     path("profile/", views.profile, name="profile"),
     path("profile/edit/", views.profile_edit, name="profile_edit"),
@@ -4,10 +4,10 @@
 from functools import wraps
 
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.core.paginator import Paginator
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login
 
@@ -15,6 +15,8 @@ from django.contrib.auth import authenticate, login
 # APP IMPORTS
 # ======================================================
 from .models import DoctorProfile, Availability
+from .stats import today_summary, weekly_trend
+from .consultation import ConsultationError, commit_consultation
 from .forms import (
     AvailabilityForm,
     DoctorProfileForm,
@@ -24,6 +26,13 @@ from .forms import (
 
 from patient.models import Appointment, Prescription, MedicalRecord
 from accounts.models import Profile
+from e_hospital.pagination import paginate
+from patient.search import search_records as search_record_index
+from patient.timeline import timeline_page
+
+
+# Blank prescription rows on the consultation form
+CONSULTATION_PRESCRIPTION_ROWS = 5
 
 
 # ======================================================
@@ -76,17 +85,19 @@ def doctor_required(view_func):
 def dashboard(request):
     today = timezone.now().date()
 
-    appointments = Appointment.objects.filter(
-        doctor=request.user,
-        date=today
-    ).order_by("time")
+    appointments, counts = today_summary(request.user.id, today)
+    trend = weekly_trend(request.user.id, today)
+    trend_max = max(day["total"] for day in trend) or 1
 
     context = {
         "appointments": appointments,
-        "today_count": appointments.count(),
-        "pending_count": appointments.filter(status="pending").count(),
-        "completed_count": appointments.filter(status="completed").count(),
-        "cancelled_count": appointments.filter(status="cancelled").count(),
+        "today_count": counts["total"],
+        "pending_count": counts["pending"],
+        "completed_count": counts["completed"],
+        "cancelled_count": counts["cancelled"],
+        "trend": [
+            {**day, "percent": day["total"] * 100 // trend_max} for day in trend
+        ],
     }
 
     return render(request, "doctor/dashboard.html", context)
@@ -104,22 +115,22 @@ def appointment_list(request):
         doctor=request.user,
         date=today,
         status="confirmed"
-    ).order_by("time")
+    ).select_related("patient").order_by("time")
 
     upcoming_appointments = Appointment.objects.filter(
         doctor=request.user,
         date__gt=today,
         status="confirmed"
-    ).order_by("date", "time")
+    ).select_related("patient").order_by("date", "time")
 
     completed_qs = Appointment.objects.filter(
         doctor=request.user,
         status="completed"
-    ).order_by("-date", "-time")
+    ).select_related("patient")
 
-    paginator = Paginator(completed_qs, 10)
-    page_number = request.GET.get("page")
-    completed_appointments = paginator.get_page(page_number)
+    completed_appointments = paginate(
+        request, completed_qs, ("-date", "-time", "-id"), per_page=10
+    )
 
     return render(request, "doctor/appointment_list.html", {
         "today_appointments": today_appointments,
@@ -215,7 +226,10 @@ def manage_availability(request):
 @login_required
 @doctor_required
 def add_availability(request):
-    form = AvailabilityForm(request.POST or None)
+    form = AvailabilityForm(
+        request.POST or None,
+        instance=Availability(doctor=request.user)
+    )
 
     if request.method == "POST" and form.is_valid():
         availability = form.save(commit=False)
@@ -280,27 +294,64 @@ def add_record(request, appointment_id):
     )
 
     if request.method == "POST":
-        record = MedicalRecord.objects.create(
-            patient=appointment.patient,
-            doctor=request.user,
-            appointment=appointment,
-            diagnosis=request.POST.get("diagnosis"),
-            notes=request.POST.get("notes"),
+        commit_consultation(
+            request.user,
+            appointment.id,
+            request.POST,
+            _posted_prescriptions(request),
+            complete=False,
         )
+        return redirect("doctor:appointment_detail", appointment_id)
 
-        meds = request.POST.getlist("medication")
-        insts = request.POST.getlist("instructions")
+    return render(request, "doctor/add_record.html")
 
-        for med, ins in zip(meds, insts):
-            Prescription.objects.create(
-                record=record,
-                medication=med,
-                instructions=ins
-            )
 
-        return redirect("doctor:appointment_detail", appointment_id)
+def _posted_prescriptions(request):
+    return list(zip(request.POST.getlist("medication"), request.POST.getlist("instructions")))
 
-    return render(request, "doctor/add_record.html")
+
+@login_required
+@doctor_required
+def consultation(request, appointment_id):
+    """
+    Diagnosis, prescriptions and completion of an appointment in one
+    submit, saved in one transaction (instead of start, add and complete
+    as separate requests)
+    """
+    appt = get_object_or_404(
+        Appointment.objects.select_related("patient"),
+        id=appointment_id,
+        doctor=request.user,
+        status="confirmed"
+    )
+
+    record = MedicalRecord.objects.filter(appointment=appt).first()
+    form = MedicalRecordForm(request.POST or None, instance=record)
+
+    if request.method == "POST" and form.is_valid():
+        complete = bool(request.POST.get("complete"))
+        try:
+            commit_consultation(
+                request.user,
+                appt.id,
+                form.cleaned_data,
+                _posted_prescriptions(request),
+                complete=complete,
+            )
+        except ConsultationError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(
+                request,
+                "Consultation saved and appointment completed." if complete else "Consultation saved.",
+            )
+        return redirect("doctor:appointment_detail", appt.id)
+
+    return render(request, "doctor/consultation.html", {
+        "form": form,
+        "appt": appt,
+        "prescription_rows": range(CONSULTATION_PRESCRIPTION_ROWS),
+    })
 
 
 @login_required
@@ -327,19 +378,87 @@ def edit_medical_record(request, appointment_id):
 @doctor_required
 def patient_medical_history(request, pk):
     appointment = get_object_or_404(
-        Appointment,
+        Appointment.objects.select_related("patient"),
         pk=pk,
         doctor=request.user
     )
 
-    records = MedicalRecord.objects.filter(
-        patient=appointment.patient
-    ).order_by("-created_at")
+    q = request.GET.get("q", "").strip()
+
+    if q:
+        # Ranked matches within this patient's history
+        page = _page_number(request)
+        records, has_next = search_record_index(
+            q, patients=User.objects.filter(pk=appointment.patient_id).values_list("pk"), page=page
+        )
+    else:
+        records = MedicalRecord.objects.filter(
+            patient=appointment.patient
+        ).select_related("doctor")
+        records = paginate(request, records, ("-created_at", "-id"), per_page=10)
+        page, has_next = None, False
 
     return render(request, "doctor/patient_medical_history.html", {
         "appointment": appointment,
         "patient": appointment.patient,
-        "records": records
+        "records": records,
+        "q": q,
+        "page": page,
+        "has_next": has_next,
+    })
+
+
+def _page_number(request):
+    try:
+        return max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        return 1
+
+
+@login_required
+@doctor_required
+def patient_timeline(request, patient_id):
+    """
+    A patient's timeline as JSON, for patients the doctor has seen or will see
+    """
+    if not Appointment.objects.filter(doctor=request.user, patient_id=patient_id).exists():
+        return JsonResponse({"error": "Not your patient."}, status=404)
+
+    events, next_cursor = timeline_page(patient_id, request.GET.get("cursor"))
+    return JsonResponse({"events": [e.as_dict() for e in events], "next": next_cursor})
+
+
+@login_required
+@doctor_required
+def search_records(request):
+    """
+    Ranked full-text search over the records of the doctor's patients
+    (anyone they have an appointment with); ?q=, optional ?patient=, ?page=
+    """
+    q = request.GET.get("q", "").strip()
+    page = _page_number(request)
+
+    patients = Appointment.objects.filter(doctor=request.user).values_list("patient_id")
+    if request.GET.get("patient", "").isdigit():
+        patients = patients.filter(patient_id=int(request.GET["patient"]))
+
+    records, has_next = search_record_index(q, patients=patients, page=page) if q else ([], False)
+
+    return JsonResponse({
+        "query": q,
+        "page": page,
+        "has_next": has_next,
+        "results": [
+            {
+                "id": record.id,
+                "patient": record.patient.get_full_name() or record.patient.username,
+                "doctor": (record.doctor.get_full_name() or record.doctor.username) if record.doctor else None,
+                "date": timezone.localtime(record.created_at).date(),
+                "diagnosis": record.diagnosis,
+                "snippet": record.search_snippet,
+            }
+            for record in records
+        ],
     })
 
 
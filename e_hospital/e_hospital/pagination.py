@@ -0,0 +1,206 @@
+"""
+Keyset (cursor) pagination for long lists.
+
+A page is read as WHERE (ordering columns) past the boundary row,
+ORDER BY the same columns, LIMIT per_page + 1, so page 500 costs the same
+index range scan as page 1, where OFFSET reads and discards every earlier
+row. The ordering must end with a unique column (normally "id") and
+should be backed by an index over the same columns; the columns must not
+be nullable.
+
+The cursor is an opaque url-safe token carrying the boundary row's values
+and the direction to read in. An unreadable cursor falls back to the
+first page, like Paginator.get_page does for a bad page number.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+PER_PAGE = 20
+
+AFTER, BEFORE = "a", "b"
+
+
+# ======================================================
+# CURSOR ENCODING
+# ======================================================
+
+def encode_cursor(direction, values):
+    raw = json.dumps([direction, values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, fields):
+    """
+    (direction, encoded values, python values) of a cursor, or None when
+    it is missing, tampered with or was made for a different ordering
+    """
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, values = json.loads(raw)
+        if direction not in (AFTER, BEFORE) or len(values) != len(fields):
+            return None
+        return direction, values, [field.to_python(value) for field, value in zip(fields, values)]
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+
+
+# ======================================================
+# PAGE
+# ======================================================
+
+class CursorPage:
+    """
+    One page of rows; iterates like a list. next_query / previous_query
+    are the current query string with this page's parameter moved, so
+    other filters and other lists' cursors on the same page are kept.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor, param, query):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.param = param
+        self.query = query
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _query_with(self, cursor):
+        query = self.query.copy()
+        if cursor:
+            query[self.param] = cursor
+        else:
+            query.pop(self.param, None)
+        return query.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query_with(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query_with(self.previous_cursor)
+
+    @property
+    def first_query(self):
+        return self._query_with(None)
+
+
+# ======================================================
+# PAGINATE
+# ======================================================
+
+def _keyset(ordering, fields, values, direction):
+    """
+    Rows strictly past `values` in `ordering` (or before them):
+    (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+    with < for descending columns, and everything flipped for BEFORE.
+    """
+    condition = Q()
+    equal = Q()
+
+    for name, field, value in zip(ordering, fields, values):
+        descending = name.startswith("-")
+        lookup = "lt" if descending != (direction == BEFORE) else "gt"
+
+        condition |= equal & Q(**{f"{field.attname}__{lookup}": value})
+        equal &= Q(**{field.attname: value})
+
+    return condition
+
+
+def _fields(model, ordering):
+    return [model._meta.get_field(name.lstrip("-")) for name in ordering]
+
+
+def cursor_after(obj, ordering):
+    """
+    The cursor of the page following `obj`, for callers that fetched a
+    first page themselves (e.g. several lists in one query)
+    """
+    return encode_cursor(AFTER, [field.value_to_string(obj) for field in _fields(type(obj), ordering)])
+
+
+def rows_after(queryset, ordering, cursor, limit):
+    """
+    Up to `limit` rows of `queryset` in `ordering` past a cursor_after()
+    cursor (from the start when there is none); one query. For callers
+    that merge several lists into one page.
+    """
+    fields = _fields(queryset.model, ordering)
+
+    decoded = decode_cursor(cursor, fields)
+    if decoded:
+        queryset = queryset.filter(_keyset(ordering, fields, decoded[2], AFTER))
+
+    return list(queryset.order_by(*ordering)[:limit])
+
+
+def _reverse(ordering):
+    return [name[1:] if name.startswith("-") else f"-{name}" for name in ordering]
+
+
+def paginate(request, queryset, ordering, param="cursor", per_page=PER_PAGE):
+    """
+    The page of `queryset` in `ordering` (e.g. ("-date", "-time", "-id"))
+    named by the `param` GET parameter; one query per page.
+    """
+    fields = _fields(queryset.model, ordering)
+
+    def values(obj):
+        return [field.value_to_string(obj) for field in fields]
+
+    cursor = decode_cursor(request.GET.get(param), fields)
+    direction, boundary, boundary_values = cursor or (AFTER, None, None)
+
+    if direction == BEFORE:
+        rows = list(
+            queryset.filter(_keyset(ordering, fields, boundary_values, BEFORE))
+            .order_by(*_reverse(ordering))[:per_page + 1]
+        )
+        more_before = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+
+        next_cursor = encode_cursor(AFTER, values(rows[-1]) if rows else boundary)
+        previous_cursor = encode_cursor(BEFORE, values(rows[0])) if more_before else None
+    else:
+        if cursor:
+            queryset = queryset.filter(_keyset(ordering, fields, boundary_values, AFTER))
+
+        rows = list(queryset.order_by(*ordering)[:per_page + 1])
+        more_after = len(rows) > per_page
+        rows = rows[:per_page]
+
+        next_cursor = encode_cursor(AFTER, values(rows[-1])) if more_after else None
+        previous_cursor = None
+        if cursor:
+            # Came from an earlier page; if this one emptied meanwhile, go back from the boundary
+            previous_cursor = encode_cursor(BEFORE, values(rows[0]) if rows else boundary)
+
+    return CursorPage(rows, next_cursor, previous_cursor, param, request.GET)
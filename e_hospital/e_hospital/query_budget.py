@@ -0,0 +1,129 @@
+"""
+Per-request SQL instrumentation.
+
+Every query issued while handling a request is recorded; the request is
+then checked against the query budget declared for its URL (in each
+app's budgets.py, next to urls.py) and for repeated query shapes, the
+signature of an N+1 loop. Problems are logged, and the query count is
+exposed in an X-Query-Count header.
+
+Enabled by QUERY_BUDGET_ENABLED (defaults to DEBUG).
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger("e_hospital.query_budget")
+
+# The same query shape this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+# ======================================================
+# RECORDING
+# ======================================================
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """
+        {normalized sql: times issued} for shapes issued `threshold`+ times.
+        Parameters are already out of the SQL; IN lists are collapsed.
+        """
+        shapes = Counter(_IN_LIST.sub("IN (...)", sql) for sql in self.queries)
+        return {sql: n for sql, n in shapes.items() if n >= threshold}
+
+
+@contextmanager
+def record_queries():
+    log = QueryLog()
+    with connection.execute_wrapper(log):
+        yield log
+
+
+# ======================================================
+# BUDGETS
+# ======================================================
+
+_budgets = None
+
+
+def query_budgets():
+    """
+    {"namespace:url_name": max queries} merged from every installed app's
+    budgets.QUERY_BUDGETS. A budget of None marks a URL the budget suite
+    does not render (external calls, one-time tokens).
+    """
+    global _budgets
+
+    if _budgets is None:
+        budgets = {}
+        for app in apps.get_app_configs():
+            try:
+                module = import_module(f"{app.name}.budgets")
+            except ModuleNotFoundError:
+                continue
+            budgets.update(module.QUERY_BUDGETS)
+        _budgets = budgets
+
+    return _budgets
+
+
+def check_request(view_name, log):
+    """
+    Problems with a recorded request, as human-readable strings
+    """
+    problems = []
+    budget = query_budgets().get(view_name)
+
+    if budget is not None and len(log) > budget:
+        problems.append(f"{len(log)} queries, budget is {budget}")
+
+    for sql, n in log.repeated_shapes().items():
+        problems.append(f"possible N+1, {n}x: {sql}")
+
+    return problems
+
+
+# ======================================================
+# MIDDLEWARE
+# ======================================================
+
+class QueryBudgetMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "QUERY_BUDGET_ENABLED", settings.DEBUG)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        with record_queries() as log:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        if match:
+            for problem in check_request(match.view_name, log):
+                logger.warning("%s %s: %s", request.method, request.path, problem)
+
+        response["X-Query-Count"] = str(len(log))
+        return response
@@ -0,0 +1,311 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from doctor.models import Availability, DoctorProfile, ScheduleException, ScheduleTemplate
+from doctor.slots import ensure_slots_many
+from patient.models import (
+    Appointment, Billing, HealthCategory, HealthResource, Insurance,
+    MedicalRecord, Payment, Prescription, WaitlistEntry,
+)
+from .pagination import paginate
+from .query_budget import query_budgets, record_queries
+
+
+SEEDED_ROWS = 4   # rows per list, enough for a per-row query to show as N+1
+
+ROLES = {"patient": "patient", "doctor": "doctor", "admin_panel": "admin"}
+
+
+def make_user(username, role, **fields):
+    user = User.objects.create_user(username=username, first_name=username.title(), **fields)
+    user.profile.role = role
+    user.profile.save()
+    return user
+
+
+def named_urls(resolver=None, namespace=None):
+    """
+    Every "namespace:name" of the project's apps (Django admin excluded)
+    with its parameter names
+    """
+    resolver = resolver or get_resolver()
+
+    for entry in resolver.url_patterns:
+        if isinstance(entry, URLResolver):
+            yield from named_urls(entry, entry.namespace or namespace)
+        elif isinstance(entry, URLPattern) and entry.name and namespace not in (None, "admin"):
+            yield f"{namespace}:{entry.name}", list(entry.pattern.converters)
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True)
+class QueryBudgetTests(TestCase):
+    """
+    Renders every URL as its owner role against a seeded dataset and
+    fails when a view exceeds its budget or repeats a query per row.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+
+        cls.admin = make_user("admin", "admin")
+        cls.doctor = make_user("doc", "doctor")
+        DoctorProfile.objects.create(user=cls.doctor, department="Cardiology")
+
+        other_doctors = [make_user(f"doc{i}", "doctor") for i in range(SEEDED_ROWS)]
+        for doctor in other_doctors:
+            DoctorProfile.objects.create(user=doctor, department="Cardiology")
+        cls.doctor_ids = [cls.doctor.pk] + [doctor.pk for doctor in other_doctors]
+
+        for day in range(7):
+            Availability.objects.create(
+                doctor=cls.doctor, day_of_week=day,
+                start_time=datetime.time(9, 0), end_time=datetime.time(12, 0),
+            )
+
+        cls.patients = [make_user(f"pat{i}", "patient") for i in range(SEEDED_ROWS)]
+        cls.patient = cls.patients[0]
+
+        category = HealthCategory.objects.create(name="Heart")
+        cls.category = category
+
+        for i, patient in enumerate(cls.patients):
+            Insurance.objects.create(
+                patient=patient, provider="Acme", policy_number=f"P{i}",
+                coverage_details="Basic", coverage_percent=20,
+            )
+
+            for n in range(SEEDED_ROWS):
+                appointment = Appointment.objects.create(
+                    patient=patient, doctor=cls.doctor,
+                    date=today - datetime.timedelta(days=n + 1),
+                    time=datetime.time(9 + i, 0), status="completed",
+                )
+                record = MedicalRecord.objects.create(
+                    patient=patient, doctor=cls.doctor, appointment=appointment,
+                    diagnosis="Checkup",
+                )
+                Prescription.objects.create(record=record, medication="Rest")
+
+                bill = Billing.objects.create(
+                    patient=patient, description="Consultation", amount=Decimal("100.00"),
+                )
+                Payment.objects.create(
+                    billing=bill, patient=patient, amount=Decimal("100.00"),
+                    method="cash", status="paid",
+                )
+
+                HealthResource.objects.create(
+                    title=f"Tip {i}-{n}", category=category, resource_type="tip",
+                    content="Walk daily", created_by=cls.admin,
+                )
+
+            for n in range(2):
+                Appointment.objects.create(
+                    patient=patient, doctor=cls.doctor,
+                    date=today + datetime.timedelta(days=n + 1),
+                    time=datetime.time(9 + i, 0),
+                    status="confirmed" if n else "pending",
+                )
+
+            WaitlistEntry.objects.create(
+                patient=patient, doctor=cls.doctor,
+                earliest_date=today, latest_date=today + datetime.timedelta(days=7),
+            )
+
+        cls.appointment = Appointment.objects.filter(patient=cls.patient, status="completed").first()
+        cls.confirmed = Appointment.objects.filter(patient=cls.patient, status="confirmed").first()
+        cls.bill = Billing.objects.filter(patient=cls.patient).first()
+        cls.record = MedicalRecord.objects.filter(patient=cls.patient).first()
+        cls.resource = HealthResource.objects.first()
+        cls.insurance = Insurance.objects.get(patient=cls.patient)
+        cls.availability = Availability.objects.first()
+        cls.waitlist_entry = WaitlistEntry.objects.get(patient=cls.patient)
+
+        cls.template = ScheduleTemplate.objects.create(name="Mornings")
+        cls.template.entries.create(
+            day_of_week=0, start_time=datetime.time(9, 0), end_time=datetime.time(12, 0),
+        )
+        cls.exception = ScheduleException.objects.create(
+            doctor=cls.doctor, kind="leave", start_date=today + datetime.timedelta(days=30),
+        )
+
+    def setUp(self):
+        cache.clear()
+        # Steady state: every doctor's slot inventory was rolled forward today
+        ensure_slots_many(self.doctor_ids)
+
+    def url_kwargs(self, name):
+        """
+        Sample arguments for URLs with parameters, taken from the seed
+        """
+        return {
+            "patient:appointment_detail": {"pk": self.confirmed.pk},
+            "patient:appointment_list_more": {"status": "completed"},
+            "patient:reschedule_appointment": {"pk": self.confirmed.pk},
+            "patient:cancel_appointment": {"pk": self.confirmed.pk},
+            "patient:record_detail": {"record_id": self.record.pk},
+            "patient:prescription_detail": {"pk": self.record.prescriptions.get().pk},
+            "patient:billing_detail": {"pk": self.bill.pk},
+            "patient:invoice_view": {"pk": self.bill.pk},
+            "patient:health_resource_detail": {"pk": self.resource.pk},
+            "patient:waitlist_accept": {"pk": self.waitlist_entry.pk},
+            "patient:waitlist_leave": {"pk": self.waitlist_entry.pk},
+
+            "doctor:appointment_detail": {"pk": self.appointment.pk},
+            "doctor:add_record": {"appointment_id": self.appointment.pk},
+            "doctor:view_prescription": {"appointment_id": self.appointment.pk},
+            "doctor:create_prescription": {"appointment_id": self.appointment.pk},
+            "doctor:start_consultation": {"appointment_id": self.confirmed.pk},
+            "doctor:complete_appointment": {"appointment_id": self.confirmed.pk},
+            "doctor:consultation": {"appointment_id": self.confirmed.pk},
+            "doctor:edit_medical_record": {"appointment_id": self.appointment.pk},
+            "doctor:patient_medical_history": {"pk": self.appointment.pk},
+            "doctor:patient_timeline": {"patient_id": self.patient.pk},
+            "doctor:edit_availability": {"pk": self.availability.pk},
+            "doctor:delete_availability": {"pk": self.availability.pk},
+
+            "admin_panel:approve_appointment": {"pk": self.confirmed.pk},
+            "admin_panel:appointment_detail": {"pk": self.confirmed.pk},
+            "admin_panel:billing_edit": {"pk": self.bill.pk},
+            "admin_panel:billing_delete": {"pk": self.bill.pk},
+            "admin_panel:payment_create_for_bill": {"billing_pk": self.bill.pk},
+            "admin_panel:insurance_edit": {"id": self.insurance.pk},
+            "admin_panel:insurance_delete": {"id": self.insurance.pk},
+            "admin_panel:get_insurance": {"patient_id": self.patient.pk},
+            "admin_panel:doctor_edit": {"doctor_id": self.doctor.pk},
+            "admin_panel:doctor_delete": {"doctor_id": self.doctor.pk},
+            "admin_panel:schedule_template_apply": {"pk": self.template.pk},
+            "admin_panel:schedule_exception_delete": {"pk": self.exception.pk},
+            "admin_panel:patient_edit": {"patient_id": self.patient.pk},
+            "admin_panel:patient_deactivate": {"patient_id": self.patient.pk},
+            "admin_panel:patient_view": {"patient_id": self.patient.pk},
+            "admin_panel:patient_export": {"patient_id": self.patient.pk},
+            "admin_panel:patient_section": {"patient_id": self.patient.pk, "section": "records"},
+            "admin_panel:patient_activate": {"user_id": self.patient.pk},
+            "admin_panel:admin_health_resource_edit": {"pk": self.resource.pk},
+            "admin_panel:admin_health_resource_delete": {"pk": self.resource.pk},
+            "admin_panel:admin_health_category_toggle": {"pk": self.category.pk},
+        }.get(name, {})
+
+    def url_params(self, name):
+        """
+        Sample query strings for views that read GET parameters, so they
+        run past their early exits
+        """
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+
+        return {
+            "patient:get_available_slots": {"doctor": self.doctor.pk, "date": tomorrow.isoformat()},
+            "patient:get_available_dates": {"doctor": self.doctor.pk},
+            "patient:get_month_availability": {"doctor": self.doctor_ids, "month": tomorrow.strftime("%Y-%m")},
+            "patient:earliest_slots": {"department": "Cardiology", "k": 5},
+            "patient:payment_success": {"bill_id": self.bill.pk},
+
+            "doctor:patient_medical_history": {"q": "Checkup"},
+            "doctor:search_records": {"q": "Checkup"},
+
+            "admin_panel:schedule_template_apply": {"department": "Cardiology"},
+            "admin_panel:billing_list": {"q": "pat", "status": "unpaid"},
+        }.get(name, {})
+
+    def get(self, name):
+        namespace = name.split(":")[0]
+        user = {"patient": self.patient, "doctor": self.doctor, "admin": self.admin}.get(
+            ROLES.get(namespace)
+        )
+
+        self.client.logout()
+        if user:
+            self.client.force_login(user)
+
+        url = reverse(name, kwargs=self.url_kwargs(name))
+        params = self.url_params(name)
+        with record_queries() as log:
+            response = self.client.get(url, params)
+
+        return response, log
+
+    def test_every_url_has_a_budget(self):
+        budgets = query_budgets()
+        missing = [name for name, _ in named_urls() if name not in budgets]
+
+        self.assertEqual(missing, [], "declare these in the app's budgets.py")
+
+    def test_views_stay_within_budget(self):
+        for name, budget in sorted(query_budgets().items()):
+            if budget is None:
+                continue
+
+            with self.subTest(url=name):
+                response, log = self.get(name)
+
+                self.assertLess(response.status_code, 500)
+                self.assertLessEqual(len(log), budget, log.queries)
+                self.assertEqual(log.repeated_shapes(), {})
+
+
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_user("doc", "doctor")
+        cls.patient = make_user("pat", "patient")
+        day = datetime.date(2025, 1, 1)
+
+        # Ties on (date, time) so the id tie-break matters
+        for n in range(25):
+            Appointment.objects.create(
+                patient=cls.patient, doctor=cls.doctor,
+                date=day + datetime.timedelta(days=n // 5),
+                time=datetime.time(9, 0), status="completed",
+            )
+
+        cls.ordering = ("-date", "-time", "-id")
+        cls.expected = list(
+            Appointment.objects.order_by(*cls.ordering).values_list("pk", flat=True)
+        )
+
+    def page(self, query=""):
+        request = RequestFactory().get(f"/?{query}")
+        return paginate(request, Appointment.objects.all(), self.ordering, per_page=10)
+
+    def test_walks_forward_and_back_without_gaps(self):
+        seen = []
+        page = self.page()
+        self.assertFalse(page.has_previous)
+
+        pages = [page]
+        while page.has_next:
+            page = self.page(page.next_query)
+            pages.append(page)
+
+        for page in pages:
+            seen += [a.pk for a in page]
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+
+        back = self.page(pages[-1].previous_query)
+        self.assertEqual([a.pk for a in back], self.expected[10:20])
+        first = self.page(back.previous_query)
+        self.assertEqual([a.pk for a in first], self.expected[:10])
+        self.assertFalse(first.has_previous)
+
+    def test_each_page_is_one_query(self):
+        page = self.page()
+        with self.assertNumQueries(1):
+            self.page(page.next_query)
+
+    def test_keeps_other_parameters_and_ignores_bad_cursors(self):
+        page = self.page("q=smith")
+        self.assertIn("q=smith", page.next_query)
+
+        page = self.page("cursor=not-a-cursor")
+        self.assertEqual([a.pk for a in page], self.expected[:10])
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Insurance, Appointment, MedicalRecord, Prescription, Payment, HealthCategory, HealthResource
+from django.db.models import Q
+
+from .models import Insurance, Appointment, MedicalRecord, Prescription, Payment, HealthCategory, HealthResource, WaitlistEntry, RecordImport
+from .search import get_backend
 
 
 @admin.register(Appointment)
@@ -8,15 +11,39 @@ class AppointmentAdmin(admin.ModelAdmin):
     list_filter = ('status', 'date')
     search_fields = ('patient__username', 'doctor__username')
 
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('patient', 'doctor', 'department', 'earliest_date', 'latest_date', 'status')
+    list_filter = ('status',)
+    search_fields = ('patient__username', 'department')
+
 @admin.register(MedicalRecord)
 class MedicalRecordAdmin(admin.ModelAdmin):
     list_display = ('patient', 'doctor', 'diagnosis', 'created_at')
     search_fields = ('patient__username', 'diagnosis')
+    search_help_text = "Full-text search of diagnosis, notes, allergies, medications and prescriptions, or an exact patient username."
+
+    # Best-ranked matches shown for a search
+    search_limit = 500
+
+    def get_search_results(self, request, queryset, search_term):
+        # The search index instead of icontains over the whole table
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+
+        hits = get_backend().search(term, limit=self.search_limit)
+        matches = Q(pk__in=[hit.record_id for hit in hits]) | Q(patient__username__iexact=term)
+        return queryset.filter(matches), False
 
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
     list_display = ('record', 'created_at')
 
+@admin.register(RecordImport)
+class RecordImportAdmin(admin.ModelAdmin):
+    list_display = ('name', 'rows_done', 'imported', 'skipped', 'updated_at', 'finished_at')
+
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ('patient', 'amount', 'method', 'paid_at')
@@ -0,0 +1,61 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from e_hospital.pagination import cursor_after, paginate
+from .models import Appointment
+
+
+SECTION_SIZE = 10
+
+ORDERING = ("-date", "-time", "-id")
+
+# status: section shown on the appointments page, in page order
+SECTIONS = {
+    "pending": {"heading": "⏳ Pending Appointments", "color": "warning", "badge": "Pending"},
+    "confirmed": {"heading": "✔ Approved Appointments", "color": "success", "badge": "Approved"},
+    "cancelled": {"heading": "❌ Cancelled Appointments", "color": "danger", "badge": "Cancelled"},
+    "completed": {"heading": "✅ Completed Appointments", "color": "primary", "badge": "Completed"},
+}
+
+
+def _appointments(patient_id):
+    return Appointment.objects.filter(patient_id=patient_id).select_related(
+        "doctor", "doctor__doctor_profile"
+    )
+
+
+def first_pages(patient_id, size=SECTION_SIZE):
+    """
+    The first `size` appointments of every status section from one query:
+    rows are numbered per status and cut at size + 1, so the page never
+    reads more than a few rows per section however long the history is.
+    Returns {status: (appointments, cursor of the next page or None)}.
+    """
+    rows = (
+        _appointments(patient_id)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=[F("status")],
+            order_by=[F("date").desc(), F("time").desc(), F("id").desc()],
+        ))
+        .filter(position__lte=size + 1)
+        .order_by(*ORDERING)
+    )
+
+    by_status = {status: [] for status in SECTIONS}
+    for appt in rows:
+        by_status.setdefault(appt.status, []).append(appt)
+
+    pages = {}
+    for status, appts in by_status.items():
+        more = len(appts) > size
+        appts = appts[:size]
+        pages[status] = (appts, cursor_after(appts[-1], ORDERING) if more else None)
+    return pages
+
+
+def next_page(request, patient_id, status, size=SECTION_SIZE):
+    """
+    A following page of one section, named by its ?cursor=
+    """
+    return paginate(request, _appointments(patient_id).filter(status=status), ORDERING, per_page=size)
@@ -0,0 +1,123 @@
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from doctor.models import Slot
+from doctor.slots import ACTIVE_STATUSES, HOLD_MINUTES, ensure_slots, schedule_changed_on_commit
+from .models import Appointment
+
+
+class SlotUnavailable(Exception):
+    """
+    The requested slot is not offered by the doctor or was already taken
+    """
+
+
+def _check_not_past(date, time):
+    now = timezone.localtime()
+    if date < now.date() or (date == now.date() and time <= now.time()):
+        raise SlotUnavailable("This slot is in the past.")
+
+
+def _held_by_other(slot, user_id):
+    return (
+        slot.held_until is not None
+        and slot.held_until > timezone.now()
+        and slot.held_by_id != user_id
+    )
+
+
+def hold_slot(user, doctor_id, date, time, minutes=HOLD_MINUTES):
+    """
+    Reserve a free slot for `user` for `minutes` and return the expiry.
+
+    A patient holds at most one slot at a time, picking another slot
+    releases the previous hold. Holds are never swept eagerly: readers
+    compare held_until with the current time.
+    """
+    _check_not_past(date, time)
+    ensure_slots(doctor_id)
+
+    with transaction.atomic():
+        slot = (
+            Slot.objects.select_for_update()
+            .filter(doctor_id=doctor_id, date=date, time=time)
+            .first()
+        )
+        if slot is None:
+            raise SlotUnavailable("The doctor is not available at this time.")
+
+        if slot.is_booked:
+            raise SlotUnavailable("This slot has just been booked.")
+
+        if _held_by_other(slot, user.id):
+            raise SlotUnavailable("Another patient is booking this slot.")
+
+        Slot.objects.filter(held_by=user).exclude(pk=slot.pk).update(
+            held_by=None, held_until=None
+        )
+
+        slot.held_by = user
+        slot.held_until = timezone.now() + datetime.timedelta(minutes=minutes)
+        slot.save(update_fields=["held_by", "held_until"])
+
+    # Views cached on the schedule version (month view ETag) must see the hold
+    schedule_changed_on_commit(doctor_id)
+
+    return slot.held_until
+
+
+def book_slot(appointment, date, time):
+    """
+    Save `appointment` as a pending booking of (doctor, date, time).
+
+    The doctor's slot row is locked for the duration of the transaction so
+    concurrent bookers of the same slot are serialized; the partial unique
+    constraint on Appointment is the final guard on backends without row
+    locks. A slot held by another patient is refused; the patient's own
+    hold is released. Works for new bookings and for rescheduling.
+    """
+    _check_not_past(date, time)
+    ensure_slots(appointment.doctor_id)
+
+    try:
+        with transaction.atomic():
+            slot = (
+                Slot.objects.select_for_update()
+                .filter(doctor_id=appointment.doctor_id, date=date, time=time)
+                .first()
+            )
+            if slot is None:
+                raise SlotUnavailable("The doctor is not available at this time.")
+
+            if _held_by_other(slot, appointment.patient_id):
+                raise SlotUnavailable("Another patient is booking this slot.")
+
+            taken = (
+                Appointment.objects.filter(
+                    doctor_id=appointment.doctor_id,
+                    date=date,
+                    time=time,
+                    status__in=ACTIVE_STATUSES,
+                )
+                .exclude(pk=appointment.pk)
+                .exists()
+            )
+            if taken:
+                raise SlotUnavailable("This slot has just been booked.")
+
+            appointment.date = date
+            appointment.time = time
+            appointment.status = "pending"
+            appointment.save()
+
+            # The booking replaces the hold
+            Slot.objects.filter(held_by_id=appointment.patient_id).update(
+                held_by=None, held_until=None
+            )
+
+    except IntegrityError:
+        raise SlotUnavailable("This slot has just been booked.")
+
+    return appointment
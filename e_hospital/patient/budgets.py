@@ -0,0 +1,41 @@
+"""
+Maximum SQL queries per request for the patient URLs (see
+e_hospital.query_budget). Session, user and profile lookups account for
+3 of every logged-in request. None: not rendered by the budget suite.
+"""
+
+QUERY_BUDGETS = {
+    "patient:login": 2,
+    "patient:dashboard": 7,
+    "patient:appointment_list": 4,
+    "patient:appointment_list_more": 4,
+    "patient:timeline": 8,                       # one query per source
+    "patient:timeline_feed": 8,
+    "patient:book_appointment": 4,
+    "patient:appointment_detail": 5,
+    "patient:reschedule_appointment": 5,
+    "patient:cancel_appointment": 12,
+    "patient:waitlist": 5,
+    "patient:waitlist_accept": 3,
+    "patient:waitlist_leave": 3,
+    "patient:medical_history": 5,
+    "patient:record_detail": 7,
+    "patient:my_prescriptions": 4,
+    "patient:prescription_detail": 4,
+    "patient:get_available_slots": 4,
+    "patient:profile": 4,
+    "patient:edit_profile": 3,
+    "patient:billing_list": 3,
+    "patient:billing_detail": 6,
+    "patient:pay_bill": None,                   # creates a Stripe checkout session
+    "patient:payment_success": 11,              # payment + bill update, with their counters / rollup marks
+    "patient:payment_cancel": 3,
+    "patient:insurance_info": 4,
+    "patient:invoice_view": 6,
+    "patient:get_available_dates": 4,
+    "patient:get_month_availability": 4,        # holds + every doctor's grid in one read
+    "patient:hold_slot": 3,
+    "patient:earliest_slots": 6,
+    "patient:health_resources": 4,
+    "patient:health_resource_detail": 5,
+}
@@ -0,0 +1,84 @@
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Appointment, MedicalRecord, Payment, WaitlistEntry
+
+
+DASHBOARD_CACHE_SECONDS = 60 * 60
+
+
+def _version_key(patient_id):
+    return f"patient:dashboard:version:{patient_id}"
+
+
+def _data_key(patient_id):
+    return f"patient:dashboard:{patient_id}"
+
+
+def bump_dashboard_version(patient_id):
+    """
+    Invalidate the patient's cached dashboard (called from signals)
+    """
+    if not patient_id:
+        return
+
+    try:
+        cache.incr(_version_key(patient_id))
+    except ValueError:
+        cache.set(_version_key(patient_id), time.time_ns(), None)
+
+
+def _load(patient_id, today):
+    return {
+        "upcoming": list(
+            Appointment.objects.filter(patient_id=patient_id, date__gte=today)
+            .select_related("doctor")
+            .order_by("date", "time")[:5]
+        ),
+        "recent_records": list(
+            MedicalRecord.objects.filter(patient_id=patient_id).order_by("-created_at")[:3]
+        ),
+        "payments": list(
+            Payment.objects.filter(patient_id=patient_id).order_by("-paid_at")[:5]
+        ),
+        "waitlist_offers": list(
+            WaitlistEntry.objects.filter(patient_id=patient_id, status="offered")
+            .select_related("offered_doctor")
+        ),
+    }
+
+
+def dashboard_data(patient_id):
+    """
+    The patient dashboard lists, cached per patient.
+
+    The cached entry records the version counter it was built from; both
+    are fetched in one get_many, so a hit costs a single cache round trip
+    and no queries. A bump by any of the patient's rows (or a new day)
+    makes the entry stale.
+    """
+    today = timezone.localdate()
+    version_key, data_key = _version_key(patient_id), _data_key(patient_id)
+
+    found = cache.get_many([version_key, data_key])
+    version = found.get(version_key)
+    entry = found.get(data_key)
+
+    if version is not None and entry and entry[0] == (version, today):
+        data = entry[1]
+    else:
+        if version is None:
+            cache.add(version_key, time.time_ns(), None)
+            version = cache.get(version_key)
+
+        data = _load(patient_id, today)
+        cache.set(data_key, ((version, today), data), DASHBOARD_CACHE_SECONDS)
+
+    # Offers lapse by the clock, not by a write
+    now = timezone.now()
+    return {
+        **data,
+        "waitlist_offers": [o for o in data["waitlist_offers"] if o.offer_expires > now],
+    }
@@ -0,0 +1,291 @@
+"""
+Streaming export of a patient's full record as FHIR-style resources.
+
+Resources are produced by generators over QuerySet.iterator(chunk_size),
+so at most one chunk of rows per table is in memory, and written out as
+either a JSON Bundle (type "collection") or NDJSON, one resource per
+line. Both are iterables of text that can feed a StreamingHttpResponse
+or a file.
+
+The mapping follows the FHIR resource shapes loosely: Patient, Coverage,
+Appointment, Condition (a medical record), MedicationRequest (a
+prescription) and Invoice (a bill).
+"""
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+from .models import Appointment, Billing, Insurance, MedicalRecord, Prescription
+
+
+EXPORT_CHUNK_SIZE = 500
+
+FORMATS = {"json": ".json", "ndjson": ".ndjson"}
+
+APPOINTMENT_STATUS = {
+    "pending": "proposed",
+    "confirmed": "booked",
+    "cancelled": "cancelled",
+    "completed": "fulfilled",
+}
+
+_encoder = DjangoJSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def _reference(kind, pk):
+    return {"reference": f"{kind}/{pk}"} if pk else None
+
+
+def _practitioner(user):
+    if not user:
+        return None
+    return {**_reference("Practitioner", user.pk), "display": user.get_full_name() or user.username}
+
+
+def _drop_empty(resource):
+    return {key: value for key, value in resource.items() if value not in (None, "", [])}
+
+
+# ======================================================
+# RESOURCES
+# ======================================================
+
+def patient_resource(user):
+    profile = getattr(user, "profile", None)
+    return _drop_empty({
+        "resourceType": "Patient",
+        "id": str(user.pk),
+        "active": user.is_active,
+        "name": [_drop_empty({"family": user.last_name, "given": [user.first_name] if user.first_name else [],
+                              "text": user.get_full_name() or user.username})],
+        "telecom": [
+            telecom for telecom in (
+                {"system": "email", "value": user.email} if user.email else None,
+                {"system": "phone", "value": profile.phone} if profile and profile.phone else None,
+            ) if telecom
+        ],
+        "address": [{"text": profile.address}] if profile and profile.address else [],
+    })
+
+
+def coverage_resource(insurance):
+    return _drop_empty({
+        "resourceType": "Coverage",
+        "id": str(insurance.pk),
+        "status": "active",
+        "beneficiary": _reference("Patient", insurance.patient_id),
+        "payor": [{"display": insurance.provider}],
+        "subscriberId": insurance.policy_number,
+        "period": {"end": insurance.expiry_date} if insurance.expiry_date else None,
+        "costToBeneficiary": [{"value": {"value": 100 - insurance.coverage_percent, "unit": "%"}}],
+        "note": insurance.coverage_details,
+    })
+
+
+def appointment_resource(appt):
+    return _drop_empty({
+        "resourceType": "Appointment",
+        "id": str(appt.pk),
+        "status": APPOINTMENT_STATUS.get(appt.status, appt.status),
+        "start": timezone.make_aware(datetime.datetime.combine(appt.date, appt.time)),
+        "description": appt.reason,
+        "created": appt.created_at,
+        "participant": [
+            participant for participant in (
+                {"actor": _reference("Patient", appt.patient_id), "status": "accepted"},
+                {"actor": _practitioner(appt.doctor), "status": "accepted"} if appt.doctor else None,
+            ) if participant
+        ],
+    })
+
+
+def condition_resource(record):
+    notes = [
+        {"text": f"{label}: {text}"}
+        for label, text in (("Notes", record.notes), ("Allergies", record.allergies), ("Medications", record.medications))
+        if text
+    ]
+    return _drop_empty({
+        "resourceType": "Condition",
+        "id": str(record.pk),
+        "subject": _reference("Patient", record.patient_id),
+        "encounter": _reference("Appointment", record.appointment_id),
+        "code": {"text": record.diagnosis} if record.diagnosis else None,
+        "recordedDate": record.created_at,
+        "recorder": _practitioner(record.doctor),
+        "note": notes,
+    })
+
+
+def medication_request_resource(prescription):
+    record = prescription.record
+    return _drop_empty({
+        "resourceType": "MedicationRequest",
+        "id": str(prescription.pk),
+        "status": "active",
+        "intent": "order",
+        "subject": _reference("Patient", record.patient_id),
+        "medicationCodeableConcept": {"text": prescription.medication},
+        "dosageInstruction": [{"text": prescription.instructions}] if prescription.instructions else [],
+        "reasonReference": [_reference("Condition", record.pk)],
+        "authoredOn": prescription.created_at,
+        "requester": _practitioner(record.doctor),
+    })
+
+
+def invoice_resource(bill):
+    return _drop_empty({
+        "resourceType": "Invoice",
+        "id": str(bill.pk),
+        "status": "balanced" if bill.status == "paid" else "issued",
+        "subject": _reference("Patient", bill.patient_id),
+        "date": bill.created_at,
+        "note": [{"text": bill.description}],
+        "totalGross": {"value": bill.amount, "currency": "INR"},
+        "totalNet": {"value": bill.amount_due, "currency": "INR"},
+        "totalPriceComponent": [
+            {"type": "discount", "code": {"text": "Insurance"},
+             "amount": {"value": bill.insurance_covered_amount, "currency": "INR"}},
+        ] if bill.insurance_covered_amount else [],
+    })
+
+
+def iter_resources(patient, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Every resource of the patient, table by table, streaming each table
+    in chunks of `chunk_size` rows
+    """
+    yield patient_resource(patient)
+
+    for insurance in Insurance.objects.filter(patient=patient):
+        yield coverage_resource(insurance)
+
+    tables = [
+        (Appointment.objects.filter(patient=patient).select_related("doctor").order_by("date", "time", "pk"),
+         appointment_resource),
+        (MedicalRecord.objects.filter(patient=patient).select_related("doctor").order_by("created_at", "pk"),
+         condition_resource),
+        (Prescription.objects.filter(patient=patient)
+         .select_related("record", "record__doctor").order_by("created_at", "pk"),
+         medication_request_resource),
+        (Billing.objects.filter(patient=patient).order_by("created_at", "pk"),
+         invoice_resource),
+    ]
+
+    for queryset, to_resource in tables:
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            yield to_resource(obj)
+
+
+# ======================================================
+# SERIALIZATION
+# ======================================================
+
+def bundle_chunks(patient, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    A JSON Bundle, one resource entry per yielded string
+    """
+    header = {
+        "resourceType": "Bundle",
+        "type": "collection",
+        "timestamp": timezone.now(),
+    }
+    yield _encoder.encode(header)[:-1] + ',"entry":['
+
+    separator = ""
+    for resource in iter_resources(patient, chunk_size):
+        yield separator + _encoder.encode({
+            "fullUrl": f"{resource['resourceType']}/{resource['id']}",
+            "resource": resource,
+        })
+        separator = ","
+
+    yield "]}\n"
+
+
+def ndjson_lines(patient, chunk_size=EXPORT_CHUNK_SIZE):
+    for resource in iter_resources(patient, chunk_size):
+        yield _encoder.encode(resource) + "\n"
+
+
+def export_chunks(patient, fmt="json", chunk_size=EXPORT_CHUNK_SIZE):
+    if fmt == "ndjson":
+        return ndjson_lines(patient, chunk_size)
+    return bundle_chunks(patient, chunk_size)
+
+
+def buffered(chunks, size=64 * 1024):
+    """
+    Join small strings into pieces of about `size` characters, so a
+    response is written in a few large writes rather than one per resource
+    """
+    parts, length = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(parts)
+            parts, length = [], 0
+    if parts:
+        yield "".join(parts)
+
+
+def export_filename(patient, fmt="json"):
+    return f"patient-{patient.pk}{FORMATS[fmt]}"
+
+
+# ======================================================
+# BULK
+# ======================================================
+
+def export_to_file(patient_id, directory, fmt="json", chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Write one patient's export into `directory`; returns (path, bytes)
+    """
+    patient = get_user_model().objects.select_related("profile").get(pk=patient_id)
+    path = os.path.join(directory, export_filename(patient, fmt))
+
+    written = 0
+    with open(path, "wb") as out:
+        for chunk in buffered(export_chunks(patient, fmt, chunk_size)):
+            written += out.write(chunk.encode("utf-8"))
+    return path, written
+
+
+def _export_in_worker(*args):
+    try:
+        return export_to_file(*args)
+    finally:
+        connection.close()
+
+
+def export_many(patient_ids, directory, fmt="json", workers=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Export several patients, one file each, across `workers` processes
+    (in this process when workers is 1). Yields (path, bytes) as each
+    patient finishes. An unknown patient id raises the user model's
+    DoesNotExist.
+    """
+    if workers == 1:
+        for patient_id in patient_ids:
+            yield export_to_file(patient_id, directory, fmt, chunk_size)
+        return
+
+    # Forked workers must not inherit the parent's open connection
+    connection.close()
+
+    # Workers set Django up themselves, so spawned (not only forked)
+    # processes work too
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        futures = [
+            pool.submit(_export_in_worker, patient_id, directory, fmt, chunk_size)
+            for patient_id in patient_ids
+        ]
+        for future in as_completed(futures):
+            yield future.result()
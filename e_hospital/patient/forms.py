@@ -1,6 +1,6 @@
 from django import forms
 from django.utils import timezone
-from .models import Appointment
+from .models import Appointment, WaitlistEntry
 from accounts.models import Profile
 from django.contrib.auth.models import User
 
@@ -34,3 +34,40 @@ class ProfileForm(forms.ModelForm):
     class Meta:
         model = Profile
         fields = ["phone", "address"]
+
+
+
+class WaitlistForm(forms.ModelForm):
+    class Meta:
+        model = WaitlistEntry
+        fields = ["doctor", "department", "earliest_date", "latest_date"]
+        widgets = {
+            "doctor": forms.Select(attrs={"class": "form-control"}),
+            "department": forms.TextInput(attrs={"class": "form-control", "placeholder": "e.g. Cardiology"}),
+            "earliest_date": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+            "latest_date": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.fields["doctor"].queryset = User.objects.filter(profile__role="doctor")
+        self.fields["doctor"].empty_label = "Any doctor of the department"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        doctor = cleaned_data.get("doctor")
+        department = cleaned_data.get("department", "").strip()
+        earliest = cleaned_data.get("earliest_date")
+        latest = cleaned_data.get("latest_date")
+
+        if not doctor and not department:
+            raise forms.ValidationError("Choose a doctor or a department.")
+
+        if earliest and earliest < timezone.localdate():
+            raise forms.ValidationError("The waiting window cannot start in the past.")
+
+        if earliest and latest and latest < earliest:
+            raise forms.ValidationError("The last date cannot be before the first date.")
+
+        return cleaned_data
@@ -0,0 +1,328 @@
+"""
+Bulk import of historical medical records (legacy EHR or digitized paper).
+
+Input is CSV or NDJSON read line by line (a plain JSON array is accepted
+too, but is parsed whole). One row is one record:
+
+    patient, doctor, created_at, diagnosis, notes, allergies, medications,
+    prescriptions
+
+patient and doctor are a username or user id; doctor may be empty. In
+CSV, prescriptions are "medication | instructions" pairs separated by
+";"; in JSON they are a list of {"medication", "instructions"} objects
+or of plain strings.
+
+Users are resolved through a map loaded once. Valid rows are written
+with bulk_create, a batch per transaction, together with the search
+index entries and the RecordImport checkpoint, so a rerun under the
+same name resumes after the last committed batch. bulk_create skips the
+MedicalRecord signals; what they would do (search index, patient
+dashboard cache) is done here once per batch.
+"""
+import codecs
+import csv
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .dashboard import bump_dashboard_version
+from .models import MedicalRecord, Prescription, RecordImport
+from .search import get_backend
+
+
+IMPORT_BATCH_SIZE = 1000
+
+# Errors kept for the report; all of them are counted
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "json"}
+
+TEXT_FIELDS = ("diagnosis", "notes", "allergies", "medications")
+
+DIAGNOSIS_MAX_LENGTH = MedicalRecord._meta.get_field("diagnosis").max_length
+
+
+class RowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    name: str
+    resumed_from: int = 0
+    rows: int = 0
+    imported: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def format_for(filename):
+    return FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def check_file(chunks, fmt):
+    """
+    Raise ValueError if the file as a whole cannot be read: not UTF-8, or
+    (JSON) not an array of rows. Problems within a row are reported per
+    row by import_records instead. Returns the file's SHA-256, the
+    checksum of its import checkpoint.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    digest = hashlib.sha256()
+    text = []
+    try:
+        for chunk in chunks:
+            digest.update(chunk)
+            part = decoder.decode(chunk)
+            if fmt == "json":
+                text.append(part)
+        text.append(decoder.decode(b"", final=True))
+    except UnicodeDecodeError as e:
+        raise ValueError(f"The file is not UTF-8 text ({e.reason} at byte {e.start}).")
+
+    if fmt == "json":
+        try:
+            rows = json.loads("".join(text))
+        except ValueError as e:
+            raise ValueError(f"The file is not valid JSON ({e}).")
+        if not isinstance(rows, list):
+            raise ValueError("A JSON file must hold an array of rows.")
+
+    return digest.hexdigest()
+
+
+# ======================================================
+# READING
+# ======================================================
+
+def read_rows(lines, fmt):
+    """
+    Rows (dicts) from an iterable of text lines
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+    elif fmt == "ndjson":
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    # Reported against its row rather than ending the import
+                    yield RowError(f"bad JSON: {e}")
+    elif fmt == "json":
+        yield from json.loads("".join(lines))
+    else:
+        raise ValueError(f"Unknown import format {fmt!r}")
+
+
+class UserLookup:
+    """
+    {username or id: user id} of patients and of doctors, from one query
+    """
+
+    def __init__(self):
+        self.patients = {}
+        self.doctors = {}
+
+        users = get_user_model().objects.filter(profile__role__in=("patient", "doctor"))
+        for pk, username, role in users.values_list("pk", "username", "profile__role").iterator():
+            found = self.patients if role == "patient" else self.doctors
+            found[username] = found[str(pk)] = pk
+
+    def patient(self, key):
+        try:
+            return self.patients[key]
+        except KeyError:
+            raise RowError(f"unknown patient {key!r}")
+
+    def doctor(self, key):
+        try:
+            return self.doctors[key]
+        except KeyError:
+            raise RowError(f"unknown doctor {key!r}")
+
+
+def _text(row, name):
+    value = row.get(name)
+    return "" if value is None else str(value).strip()
+
+
+def _created_at(value):
+    if not value:
+        raise RowError("created_at is required")
+
+    try:
+        # Well formed but impossible values (2020-02-30) raise ValueError
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:
+        raise RowError(f"bad created_at {value!r}")
+
+    if moment is None:
+        if day is None:
+            raise RowError(f"bad created_at {value!r}")
+        moment = datetime.datetime.combine(day, datetime.time.min)
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _prescriptions(value):
+    """
+    [(medication, instructions)]
+    """
+    if not value:
+        return []
+
+    if isinstance(value, str):
+        items = [part.split("|", 1) for part in value.split(";") if part.strip()]
+        pairs = [(item[0], item[1] if len(item) > 1 else "") for item in items]
+    elif isinstance(value, list):
+        pairs = []
+        for item in value:
+            if isinstance(item, dict):
+                pairs.append((str(item.get("medication") or ""), str(item.get("instructions") or "")))
+            else:
+                pairs.append((str(item), ""))
+    else:
+        raise RowError("prescriptions must be text or a list")
+
+    pairs = [(medication.strip(), instructions.strip()) for medication, instructions in pairs]
+    if any(not medication for medication, _ in pairs):
+        raise RowError("prescription without a medication")
+    return pairs
+
+
+def parse_row(row, users):
+    """
+    (unsaved MedicalRecord, [(medication, instructions)]); RowError if invalid
+    """
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("not an object")
+
+    doctor = _text(row, "doctor")
+    record = MedicalRecord(
+        patient_id=users.patient(_text(row, "patient")),
+        doctor_id=users.doctor(doctor) if doctor else None,
+        created_at=_created_at(_text(row, "created_at")),
+        **{name: _text(row, name) for name in TEXT_FIELDS},
+    )
+
+    if len(record.diagnosis) > DIAGNOSIS_MAX_LENGTH:
+        raise RowError(f"diagnosis longer than {DIAGNOSIS_MAX_LENGTH} characters")
+
+    return record, _prescriptions(row.get("prescriptions"))
+
+
+# ======================================================
+# WRITING
+# ======================================================
+
+def _write_batch(checkpoint, parsed, rows, skipped):
+    """
+    Insert one batch and advance the checkpoint, all or nothing
+    """
+    with transaction.atomic():
+        records = MedicalRecord.objects.bulk_create([record for record, _ in parsed])
+
+        prescriptions = [
+            Prescription(
+                record=record, patient_id=record.patient_id,
+                medication=medication, instructions=instructions,
+            )
+            for record, pairs in parsed
+            for medication, instructions in pairs
+        ]
+        if prescriptions:
+            Prescription.objects.bulk_create(prescriptions)
+            # created_at is auto_now_add: date them with their record instead
+            Prescription.objects.filter(record__in=records).update(
+                created_at=Subquery(
+                    MedicalRecord.objects.filter(pk=OuterRef("record_id")).values("created_at")
+                )
+            )
+
+        get_backend().index_created(
+            [(record, [medication for medication, _ in pairs]) for record, pairs in parsed]
+        )
+
+        RecordImport.objects.filter(pk=checkpoint.pk).update(
+            rows_done=F("rows_done") + rows,
+            imported=F("imported") + len(records),
+            skipped=F("skipped") + skipped,
+            updated_at=timezone.now(),
+        )
+
+        patient_ids = {record.patient_id for record in records}
+        transaction.on_commit(lambda: [bump_dashboard_version(pk) for pk in patient_ids])
+
+
+def import_records(rows, name, batch_size=IMPORT_BATCH_SIZE, restart=False, on_batch=None, checksum=""):
+    """
+    Import rows under checkpoint `name`, skipping the rows an earlier run
+    already committed. Invalid rows are skipped and reported. on_batch,
+    if given, is called with the running ImportResult after each batch.
+    With a `checksum` (see check_file), a checkpoint left by different
+    content under the same name is started over instead of resumed.
+    """
+    checkpoint, _ = RecordImport.objects.get_or_create(name=name)
+    if checksum and checkpoint.checksum != checksum:
+        restart = True
+
+    if restart:
+        checkpoint.rows_done = checkpoint.imported = checkpoint.skipped = 0
+        checkpoint.finished_at = None
+        checkpoint.checksum = checksum
+        checkpoint.save()
+
+    result = ImportResult(name, resumed_from=checkpoint.rows_done)
+    users = UserLookup()
+    started = time.perf_counter()
+
+    numbered = itertools.islice(enumerate(rows, start=1), checkpoint.rows_done, None)
+
+    while True:
+        batch = list(itertools.islice(numbered, batch_size))
+        if not batch:
+            break
+
+        parsed = []
+        skipped = 0
+        for number, row in batch:
+            try:
+                parsed.append(parse_row(row, users))
+            except RowError as e:
+                skipped += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append((number, str(e)))
+
+        _write_batch(checkpoint, parsed, len(batch), skipped)
+
+        result.rows += len(batch)
+        result.imported += len(parsed)
+        result.skipped += skipped
+        result.seconds = time.perf_counter() - started
+        if on_batch:
+            on_batch(result)
+
+    RecordImport.objects.filter(pk=checkpoint.pk).update(finished_at=timezone.now())
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,135 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from patient.search import SQLiteFTSBackend
+
+
+DIAGNOSES = [
+    "hypertension", "type 2 diabetes", "asthma", "migraine", "influenza",
+    "bronchitis", "anaemia", "gastritis", "hypothyroidism", "osteoarthritis",
+    "dermatitis", "sinusitis", "tonsillitis", "vertigo", "sciatica",
+]
+MEDICATIONS = [
+    "amlodipine", "metformin", "salbutamol", "sumatriptan", "paracetamol",
+    "amoxicillin", "ferrous sulfate", "omeprazole", "levothyroxine", "ibuprofen",
+    "hydrocortisone", "cetirizine", "azithromycin", "betahistine", "pregabalin",
+]
+WORDS = (
+    "patient reports pain fever cough fatigue nausea dizziness swelling rash "
+    "follow up review advised rest fluids diet exercise blood pressure sugar "
+    "levels stable improving worsening mild moderate severe chronic acute"
+).split()
+
+# Findings in about 1 record in 20,000, the kind of term a doctor searches for
+RARE = ["sarcoidosis", "pheochromocytoma", "amyloidosis"]
+RARE_EVERY = 20_000
+
+# (label, query)
+QUERIES = [
+    ("common", "hypertension"),
+    ("rare", "sarcoidosis"),
+    ("prefix", "pheochromo"),
+    ("rare+common", "amyloidosis chronic"),
+]
+
+
+def _record(rng, pk):
+    diagnosis = rng.choice(DIAGNOSES)
+    notes = " ".join(rng.choices(WORDS, k=12))
+    if rng.randrange(RARE_EVERY) == 0:
+        notes += " suspected " + rng.choice(RARE)
+    medications = ", ".join(rng.sample(MEDICATIONS, 2))
+    allergies = rng.choice(["", "", "", "penicillin", "nuts", "latex"])
+    return pk, pk % 5000, diagnosis, notes, allergies, medications, medications
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the FTS5 record search against the icontains (LIKE) baseline on a "
+        "synthetic table in a scratch SQLite file; the project database is not touched"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        fts = SQLiteFTSBackend
+
+        with tempfile.TemporaryDirectory() as scratch:
+            db = sqlite3.connect(os.path.join(scratch, "benchmark.sqlite3"))
+            db.execute(
+                "CREATE TABLE record (id INTEGER PRIMARY KEY, patient_id INTEGER, diagnosis TEXT, "
+                "notes TEXT, allergies TEXT, medications TEXT, prescriptions TEXT)"
+            )
+            db.execute(
+                f"CREATE VIRTUAL TABLE {fts.table} USING fts5(patient_id UNINDEXED, diagnosis, "
+                "notes, allergies, medications, prescriptions, tokenize = 'porter unicode61')"
+            )
+
+            started = time.perf_counter()
+            for start in range(1, options["records"] + 1, 10_000):
+                end = min(start + 10_000, options["records"] + 1)
+                db.executemany(
+                    "INSERT INTO record VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (_record(rng, pk) for pk in range(start, end)),
+                )
+            db.commit()
+            loaded = time.perf_counter() - started
+
+            started = time.perf_counter()
+            db.execute(f"INSERT INTO {fts.table} (rowid, patient_id, diagnosis, notes, allergies, "
+                       "medications, prescriptions) SELECT * FROM record")
+            db.commit()
+            indexed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{options['records']} records: loaded in {loaded:.1f}s, indexed in {indexed:.1f}s"
+            )
+
+            weights = ", ".join(str(w) for w in fts.weights)
+            for label, query in QUERIES:
+                terms = query.split()
+
+                like = " AND ".join(
+                    "(diagnosis LIKE ? OR notes LIKE ? OR allergies LIKE ? OR medications LIKE ? "
+                    "OR prescriptions LIKE ?)"
+                    for _ in terms
+                )
+                like_sql = f"SELECT id FROM record WHERE {like} ORDER BY id DESC LIMIT 20"
+                like_params = [f"%{term}%" for term in terms for _ in range(5)]
+
+                fts_sql = (
+                    f"SELECT rowid FROM {fts.table} WHERE {fts.table} MATCH ? "
+                    f"ORDER BY bm25({fts.table}, {weights}), rowid LIMIT 20"
+                )
+                fts_params = [fts.match_expression(terms)]
+
+                baseline = self._time(db, like_sql, like_params, options["repeat"])
+                indexed = self._time(db, fts_sql, fts_params, options["repeat"])
+
+                self.stdout.write(
+                    f"  {label:<12} {query!r:<22} icontains {baseline * 1000:8.1f} ms   "
+                    f"fts5 {indexed * 1000:8.1f} ms   ({baseline / max(indexed, 1e-9):.1f}x)"
+                )
+
+            db.close()
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished (median of each query)."))
+
+    @staticmethod
+    def _time(db, sql, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            db.execute(sql, params).fetchall()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
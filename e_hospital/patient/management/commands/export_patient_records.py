@@ -0,0 +1,53 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from patient.export import EXPORT_CHUNK_SIZE, FORMATS, export_many
+
+
+class Command(BaseCommand):
+    help = "Write FHIR-style record exports, one file per patient, streamed in bounded memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("patient_ids", nargs="*", type=int)
+        parser.add_argument("--all", action="store_true", help="Every patient")
+        parser.add_argument("--output", default=".", help="Directory for the files")
+        parser.add_argument("--format", choices=sorted(FORMATS), default="json")
+        parser.add_argument("--workers", type=int, default=1, help="Parallel worker processes")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+
+        patient_ids = options["patient_ids"]
+        if options["all"]:
+            patient_ids = list(
+                User.objects.filter(profile__role="patient")
+                .order_by("pk").values_list("pk", flat=True)
+            )
+        if not patient_ids:
+            raise CommandError("Give patient ids or --all.")
+
+        found = User.objects.filter(pk__in=patient_ids).values_list("pk", flat=True)
+        unknown = set(patient_ids) - set(found)
+        if unknown:
+            raise CommandError(f"No such user: {', '.join(map(str, sorted(unknown)))}.")
+
+        os.makedirs(options["output"], exist_ok=True)
+
+        total = 0
+        try:
+            for path, written in export_many(
+                patient_ids, options["output"], fmt=options["format"],
+                workers=options["workers"], chunk_size=options["chunk_size"],
+            ):
+                total += written
+                self.stdout.write(f"{path} ({written} bytes)")
+        except User.DoesNotExist:
+            # Deleted since the check above
+            raise CommandError("A patient was deleted during the export.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(patient_ids)} patients ({total} bytes) to {options['output']}."
+        ))
@@ -0,0 +1,58 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from patient.importer import IMPORT_BATCH_SIZE, check_file, format_for, import_records, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import historical medical records from CSV / NDJSON / JSON in batched bulk inserts; "
+        "rerunning resumes from the last committed batch"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson", "json"], help="Default: from the file extension")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument("--name", help="Checkpoint name (default: the file name)")
+        parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or format_for(path)
+        if not fmt:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        name = options["name"] or os.path.basename(path)
+
+        with open(path, "rb") as raw:
+            try:
+                checksum = check_file(iter(lambda: raw.read(64 * 1024), b""), fmt)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        def progress(result):
+            self.stdout.write(
+                f"{result.resumed_from + result.rows} rows: {result.imported} imported, "
+                f"{result.skipped} skipped ({result.rows_per_second:.0f} rows/s)"
+            )
+
+        with open(path, newline="", encoding="utf-8-sig") as lines:
+            result = import_records(
+                read_rows(lines, fmt), name,
+                batch_size=options["batch_size"], restart=options["restart"], on_batch=progress,
+                checksum=checksum,
+            )
+
+        for number, error in result.errors:
+            self.stderr.write(f"row {number}: {error}")
+
+        if result.resumed_from:
+            self.stdout.write(f"Resumed after row {result.resumed_from}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} records ({result.skipped} rows skipped) in "
+            f"{result.seconds:.1f}s, {result.rows_per_second:.0f} rows/s."
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from patient.waitlist import EXPIRE_BATCH_SIZE, expire_offers
+
+
+class Command(BaseCommand):
+    help = "Expire lapsed waitlist offers and pass their slots on (run every few minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=EXPIRE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        lapsed = expire_offers(batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {lapsed} waitlist offers and re-offered their slots."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from patient.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the medical record search index from the records (after bulk writes that skip signals)"
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        indexed = backend.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} medical records with {type(backend).__name__}."
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cancel_double_bookings(apps, schema_editor):
+    """
+    Keep the earliest booking of every doubly booked slot and cancel the
+    rest, otherwise the constraint below cannot be created.
+    """
+    Appointment = apps.get_model('patient', 'Appointment')
+
+    seen = set()
+    duplicates = []
+
+    active = (
+        Appointment.objects.filter(status__in=['pending', 'confirmed'], doctor__isnull=False)
+        .order_by('id')
+        .values_list('id', 'doctor_id', 'date', 'time')
+    )
+    for pk, doctor_id, date, time in active.iterator():
+        key = (doctor_id, date, time)
+        if key in seen:
+            duplicates.append(pk)
+        else:
+            seen.add(key)
+
+    Appointment.objects.filter(pk__in=duplicates).update(status='cancelled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0008_remove_healthresource_video_url_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'confirmed'])), fields=('doctor', 'date', 'time'), name='unique_active_appointment_slot'),
+        ),
+    ]
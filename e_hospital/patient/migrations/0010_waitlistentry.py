@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0009_appointment_unique_active_slot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(blank=True, max_length=255)),
+                ('earliest_date', models.DateField()),
+                ('latest_date', models.DateField()),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('offered', 'Offered'), ('booked', 'Booked'), ('expired', 'Expired'), ('cancelled', 'Cancelled')], default='waiting', max_length=20)),
+                ('offered_date', models.DateField(blank=True, null=True)),
+                ('offered_time', models.TimeField(blank=True, null=True)),
+                ('offer_expires', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='waitlisted_by', to=settings.AUTH_USER_MODEL)),
+                ('offered_doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'doctor', 'created_at'], name='patient_wai_status_8f79d6_idx'), models.Index(fields=['status', 'department', 'created_at'], name='patient_wai_status_4ae300_idx'), models.Index(fields=['status', 'offer_expires'], name='patient_wai_status_d2dd3a_idx')],
+            },
+        ),
+    ]
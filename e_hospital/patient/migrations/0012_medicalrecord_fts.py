@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+FTS_TABLE = "patient_medicalrecord_fts"
+
+
+def create_index(apps, schema_editor):
+    # FTS5 is SQLite only; other databases use the icontains search backend
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "patient_id UNINDEXED, diagnosis, notes, allergies, medications, prescriptions, "
+        "tokenize = 'porter unicode61')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} "
+        "(rowid, patient_id, diagnosis, notes, allergies, medications, prescriptions) "
+        "SELECT r.id, r.patient_id, r.diagnosis, r.notes, r.allergies, r.medications, "
+        "COALESCE((SELECT group_concat(p.medication, char(10)) FROM patient_prescription p "
+        "WHERE p.record_id = r.id), '') "
+        "FROM patient_medicalrecord r"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0011_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
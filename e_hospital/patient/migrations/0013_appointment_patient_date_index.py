@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0012_medicalrecord_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date', 'time'], name='patient_app_patient_5467cc_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_record_patient(apps, schema_editor):
+    Prescription = apps.get_model('patient', 'Prescription')
+    MedicalRecord = apps.get_model('patient', 'MedicalRecord')
+
+    Prescription.objects.update(
+        patient_id=Subquery(
+            MedicalRecord.objects.filter(pk=OuterRef('record_id')).values('patient_id')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0014_recordimport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prescription',
+            name='patient',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='prescriptions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_record_patient, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='prescription',
+            name='patient',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='prescriptions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', 'created_at'], name='patient_pre_patient_27577c_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0015_prescription_patient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recordimport',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -28,11 +28,76 @@ class Appointment(models.Model):
 
     class Meta:
         ordering = ['-date', '-time']
+        constraints = [
+            # One pending/confirmed appointment per doctor slot
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'],
+                condition=models.Q(status__in=['pending', 'confirmed']),
+                name='unique_active_appointment_slot',
+            ),
+        ]
+        indexes = [
+            # A doctor's day (dashboard, slot checks), then their history by status
+            models.Index(fields=['doctor', 'date', 'status', 'time']),
+            models.Index(fields=['doctor', 'status', 'date', 'time']),
+            # A patient's appointments by status, and all of them in date order (timeline)
+            models.Index(fields=['patient', 'status', 'date', 'time']),
+            models.Index(fields=['patient', 'date', 'time']),
+            # Clinic-wide lists by status (admin)
+            models.Index(fields=['status', 'date', 'time']),
+        ]
 
     def __str__(self):
         return f"{self.patient} — {self.date} {self.time} ({self.status})"
 
 
+WAITLIST_STATUS = (
+    ('waiting', 'Waiting'),
+    ('offered', 'Offered'),
+    ('booked', 'Booked'),
+    ('expired', 'Expired'),
+    ('cancelled', 'Cancelled'),
+)
+
+
+class WaitlistEntry(models.Model):
+    """
+    A patient waiting for a freed slot with one doctor, or with any doctor
+    of a department (doctor left empty), between two dates.
+    """
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='waitlisted_by')
+    department = models.CharField(max_length=255, blank=True)
+    earliest_date = models.DateField()
+    latest_date = models.DateField()
+    status = models.CharField(max_length=20, choices=WAITLIST_STATUS, default='waiting')
+
+    # The slot currently offered to the patient (held for them until offer_expires)
+    offered_doctor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    offered_date = models.DateField(null=True, blank=True)
+    offered_time = models.TimeField(null=True, blank=True)
+    offer_expires = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # Matching reads the oldest waiters of one doctor / department
+            models.Index(fields=['status', 'doctor', 'created_at']),
+            models.Index(fields=['status', 'department', 'created_at']),
+            models.Index(fields=['status', 'offer_expires']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Stored normalized so matching is an exact (indexable) lookup
+        self.department = self.department.strip().lower()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.patient} waiting for {self.doctor or self.department} ({self.status})"
+
+
 class MedicalRecord(models.Model):
     patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='medical_records')
     doctor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='issued_records')
@@ -45,6 +110,10 @@ class MedicalRecord(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # SQLite appends the rowid, so this also serves ("-created_at", "-id") pages
+            models.Index(fields=['patient', 'created_at']),
+        ]
 
     def __str__(self):
         return f"Record: {self.patient} — {self.diagnosis or 'No diagnosis'}"
@@ -52,14 +121,48 @@ class MedicalRecord(models.Model):
 
 class Prescription(models.Model):
     record = models.ForeignKey(MedicalRecord, on_delete=models.CASCADE, related_name='prescriptions')
+    # The record's patient, copied on save so a patient's prescriptions are
+    # read in date order from one index rather than through the record join
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prescriptions', editable=False)
     medication = models.TextField()
     instructions = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # SQLite appends the rowid, so this also serves ("-created_at", "-id") pages
+            models.Index(fields=['patient', 'created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.patient_id is None:
+            self.patient_id = self.record.patient_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Prescription for {self.record.patient} ({self.created_at.date()})"
 
 
+class RecordImport(models.Model):
+    """
+    Checkpoint of a bulk medical record import (patient.importer), saved
+    in the same transaction as each batch so a rerun resumes after the
+    last committed row. checksum (SHA-256 of the file) tells a rerun of
+    the same file from a different file uploaded under the same name.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    checksum = models.CharField(max_length=64, blank=True)
+    rows_done = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import {self.name}: {self.imported} records"
+
+
 
 
 
@@ -109,6 +212,13 @@ class Billing(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'created_at']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
     def __str__(self):
         return f"Bill {self.id} - {self.patient.username}"
 
@@ -155,6 +265,12 @@ class Payment(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'paid_at']),
+            models.Index(fields=['paid_at']),
+        ]
+
     def __str__(self):
         return f"Payment #{self.id} - {self.patient.username}"
     
@@ -0,0 +1,313 @@
+"""
+Full-text search over medical records.
+
+Records are indexed on diagnosis, notes, allergies, medications and the
+text of their prescriptions. The backend is pluggable through
+MEDICAL_RECORD_SEARCH_BACKEND (a dotted path):
+
+- SQLiteFTSBackend (default on SQLite): an FTS5 table next to the
+  records, ranked with bm25, so a search reads the inverted index
+  instead of every row.
+- IContainsBackend (default elsewhere): plain LIKE '%term%' filters,
+  unranked (newest first) and a full scan each time. The
+  benchmark_record_search command compares the two.
+
+The index is kept in sync by signals (patient.signals) in the writer's
+transaction; rebuild_search_index rebuilds it from scratch.
+"""
+import re
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from .models import MedicalRecord
+
+
+SEARCH_PAGE_SIZE = 20
+
+INDEXED_FIELDS = ("diagnosis", "notes", "allergies", "medications")
+
+DEFAULT_BACKENDS = {
+    "sqlite": "patient.search.SQLiteFTSBackend",
+}
+FALLBACK_BACKEND = "patient.search.IContainsBackend"
+
+_WORD = re.compile(r"\w+")
+
+# Snippet highlight markers; control characters never typed into a record
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+
+@dataclass
+class SearchHit:
+    record_id: int
+    score: float
+    snippet: str
+
+
+def query_terms(query):
+    return _WORD.findall(query.lower())[:10]
+
+
+def highlight(snippet):
+    """
+    A backend snippet as HTML: escaped, with the matched terms in <mark>
+    """
+    html = escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+    return mark_safe(html)
+
+
+def _row(record, prescriptions):
+    """
+    (patient id, diagnosis, notes, allergies, medications, prescriptions)
+    """
+    return (
+        record.patient_id,
+        *(getattr(record, field) for field in INDEXED_FIELDS),
+        "\n".join(prescriptions),
+    )
+
+
+def _record_text(record_ids):
+    """
+    {record id: indexed row} for these records, in two queries
+    """
+    records = (
+        MedicalRecord.objects.filter(pk__in=record_ids)
+        .only("patient_id", *INDEXED_FIELDS)
+        .prefetch_related("prescriptions")
+    )
+    return {r.pk: _row(r, [p.medication for p in r.prescriptions.all()]) for r in records}
+
+
+# ======================================================
+# BACKENDS
+# ======================================================
+
+class SearchBackend:
+
+    def update(self, record_ids):
+        """
+        (Re)index these records; ids of records that no longer exist are dropped
+        """
+        raise NotImplementedError
+
+    def index_new(self, record):
+        """
+        Index a just-created record from memory (it has no prescriptions yet)
+        """
+        self.update([record.pk])
+
+    def index_created(self, records):
+        """
+        Index just-created records from memory, [(record, [medications])]
+        (bulk inserts, which skip the signals)
+        """
+        self.update([record.pk for record, _ in records])
+
+    def remove(self, record_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """
+        Reindex every record; returns how many were indexed
+        """
+        raise NotImplementedError
+
+    def search(self, query, patients=None, offset=0, limit=SEARCH_PAGE_SIZE):
+        """
+        [SearchHit] best first. `patients` is an optional queryset of
+        patient ids (values_list("patient_id")) the search is limited to.
+        """
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    table = "patient_medicalrecord_fts"
+
+    # bm25 column weights: patient_id (unindexed), diagnosis, notes,
+    # allergies, medications, prescriptions
+    weights = (0.0, 10.0, 1.0, 2.0, 4.0, 4.0)
+
+    rebuild_batch_size = 2000
+
+    def update(self, record_ids):
+        record_ids = list(record_ids)
+        if not record_ids:
+            return
+
+        rows = _record_text(record_ids)
+        with connection.cursor() as cursor:
+            self._delete(cursor, record_ids)
+            self._insert(cursor, [(pk, *values) for pk, values in rows.items()])
+
+    def index_new(self, record):
+        self.index_created([(record, [])])
+
+    def index_created(self, records):
+        if records:
+            with connection.cursor() as cursor:
+                self._insert(cursor, [(record.pk, *_row(record, medications)) for record, medications in records])
+
+    def remove(self, record_ids):
+        record_ids = list(record_ids)
+        if record_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, record_ids)
+
+    def _insert(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {self.table} "
+            "(rowid, patient_id, diagnosis, notes, allergies, medications, prescriptions) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+    def _delete(self, cursor, record_ids):
+        placeholders = ", ".join(["%s"] * len(record_ids))
+        cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", record_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+        ids = MedicalRecord.objects.order_by("pk").values_list("pk", flat=True).iterator()
+        indexed = 0
+        batch = []
+        for pk in ids:
+            batch.append(pk)
+            if len(batch) == self.rebuild_batch_size:
+                self.update(batch)
+                indexed += len(batch)
+                batch = []
+        self.update(batch)
+
+        return indexed + len(batch)
+
+    @staticmethod
+    def match_expression(terms):
+        """
+        Every term required, quoted so FTS5 operators in the input are
+        literal; the last one is a prefix so partial words match as typed
+        """
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += "*"
+        return " ".join(quoted)
+
+    def search(self, query, patients=None, offset=0, limit=SEARCH_PAGE_SIZE):
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        weights = ", ".join(str(w) for w in self.weights)
+        sql = (
+            f"SELECT rowid, bm25({self.table}, {weights}) AS score, "
+            f"snippet({self.table}, -1, %s, %s, '…', 16) "
+            f"FROM {self.table} WHERE {self.table} MATCH %s"
+        )
+        params = [_MARK_START, _MARK_END, self.match_expression(terms)]
+
+        if patients is not None:
+            patients_sql, patients_params = patients.order_by().query.sql_with_params()
+            sql += f" AND patient_id IN ({patients_sql})"
+            params += list(patients_params)
+
+        sql += " ORDER BY score, rowid LIMIT %s OFFSET %s"
+        params += [limit, offset]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [SearchHit(pk, score, snippet) for pk, score, snippet in cursor.fetchall()]
+
+
+class IContainsBackend(SearchBackend):
+    """
+    No index to maintain; every search scans the records
+    """
+
+    def update(self, record_ids):
+        pass
+
+    def index_new(self, record):
+        pass
+
+    def index_created(self, records):
+        pass
+
+    def remove(self, record_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def search(self, query, patients=None, offset=0, limit=SEARCH_PAGE_SIZE):
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        records = MedicalRecord.objects.all()
+        for term in terms:
+            matches = Q(prescriptions__medication__icontains=term)
+            for field in INDEXED_FIELDS:
+                matches |= Q(**{f"{field}__icontains": term})
+            records = records.filter(matches)
+
+        if patients is not None:
+            records = records.filter(patient_id__in=patients)
+
+        rows = (
+            records.distinct()
+            .order_by("-created_at", "-pk")
+            .values_list("pk", "diagnosis")[offset:offset + limit]
+        )
+        return [SearchHit(pk, 0.0, diagnosis) for pk, diagnosis in rows]
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+
+    if _backend is None:
+        path = getattr(settings, "MEDICAL_RECORD_SEARCH_BACKEND", None) or DEFAULT_BACKENDS.get(
+            connection.vendor, FALLBACK_BACKEND
+        )
+        _backend = import_string(path)()
+    return _backend
+
+
+# ======================================================
+# SEARCH
+# ======================================================
+
+def search_records(query, patients=None, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    One page of matching records, best first, as (records, has_next).
+    Each record carries its `search_snippet` (safe HTML). Ranked results
+    are paged by offset: every page ranks the whole match set anyway.
+    """
+    page = max(page, 1)
+    hits = get_backend().search(
+        query, patients=patients, offset=(page - 1) * per_page, limit=per_page + 1
+    )
+    has_next = len(hits) > per_page
+    hits = hits[:per_page]
+
+    records = MedicalRecord.objects.select_related("patient", "doctor").in_bulk(
+        [hit.record_id for hit in hits]
+    )
+
+    results = []
+    for hit in hits:
+        record = records.get(hit.record_id)
+        if record:
+            record.search_snippet = highlight(hit.snippet)
+            results.append(record)
+
+    return results, has_next
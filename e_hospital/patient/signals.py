@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from doctor.slots import ACTIVE_STATUSES
+from .dashboard import bump_dashboard_version
+from .models import Appointment, MedicalRecord, Payment, Prescription, WaitlistEntry
+from .search import get_backend
+from .waitlist import match_freed_slots
+
+
+# Remember the slot and status an appointment had before it is edited; read
+# by the slot (doctor), counter and rollup (admin_panel) receivers too
+@receiver(pre_save, sender=Appointment)
+def remember_appointment_slot(sender, instance, **kwargs):
+    instance._previous_slot = None
+    instance._previous_status = None
+
+    if instance.pk:
+        row = (
+            Appointment.objects.filter(pk=instance.pk)
+            .values_list("doctor_id", "date", "time", "status")
+            .first()
+        )
+        if row:
+            instance._previous_slot = row[:3]
+            instance._previous_status = row[3]
+
+
+# Appointment cancelled / rejected / moved → offer the freed slot to a waiter
+@receiver(post_save, sender=Appointment)
+def offer_freed_slot(sender, instance, created, **kwargs):
+    if created or getattr(instance, "_previous_status", None) not in ACTIVE_STATUSES:
+        return
+
+    previous = instance._previous_slot
+    current = (instance.doctor_id, instance.date, instance.time)
+
+    if instance.status in ACTIVE_STATUSES and previous == current:
+        return
+
+    transaction.on_commit(
+        lambda: match_freed_slots([previous], exclude_patient_ids=[instance.patient_id])
+    )
+
+
+# Any of the patient's dashboard rows changed → drop their cached dashboard
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=MedicalRecord)
+@receiver(post_delete, sender=MedicalRecord)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=WaitlistEntry)
+@receiver(post_delete, sender=WaitlistEntry)
+def patient_dashboard_changed(sender, instance, **kwargs):
+    # After the commit, or a concurrent reader could cache the old rows under the new version
+    patient_id = instance.patient_id
+    transaction.on_commit(lambda: bump_dashboard_version(patient_id))
+
+
+# Keep the medical record search index in step with the records
+@receiver(post_save, sender=MedicalRecord)
+def index_medical_record(sender, instance, created, **kwargs):
+    if created:
+        get_backend().index_new(instance)
+    else:
+        get_backend().update([instance.pk])
+
+
+@receiver(post_delete, sender=MedicalRecord)
+def unindex_medical_record(sender, instance, **kwargs):
+    get_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Prescription)
+@receiver(post_delete, sender=Prescription)
+def index_prescription_record(sender, instance, **kwargs):
+    get_backend().update([instance.record_id])
@@ -1,3 +1,1053 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import re
+import tempfile
+import time
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from doctor.models import Availability, DoctorProfile, ScheduleException, Slot
+from doctor.slots import (
+    HOLD_MINUTES, SLOT_WINDOW_DAYS, free_dates, free_grid, free_slots, refresh_doctor_slots,
+    schedule_cache_stats, schedule_version,
+)
+from .appointments import first_pages
+from .booking import book_slot, hold_slot, SlotUnavailable
+from .dashboard import dashboard_data
+from .export import export_chunks, export_many
+from .importer import import_records, read_rows
+from .models import Appointment, Billing, MedicalRecord, Payment, Prescription, RecordImport, WaitlistEntry
+from .search import IContainsBackend, get_backend, search_records
+from .timeline import timeline_page
+from .waitlist import accept_offer, expire_offers, leave_waitlist
+
+
+def make_user(username, role):
+    user = User.objects.create_user(username=username)
+    user.profile.role = role
+    user.profile.save()
+    return user
+
+
+class AvailableDatesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user("doc", "doctor")
+        self.patient = make_user("pat", "patient")
+
+        # Every day 09:00–12:00 in 15 minute slots
+        for day in range(7):
+            Availability.objects.create(
+                doctor=self.doctor,
+                day_of_week=day,
+                start_time=datetime.time(9, 0),
+                end_time=datetime.time(12, 0),
+                slot_duration_minutes=15,
+            )
+
+        self.tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+
+    def book_whole_day(self, date):
+        current = datetime.datetime.combine(date, datetime.time(9, 0))
+        while current.time() < datetime.time(12, 0):
+            Appointment.objects.create(
+                patient=self.patient,
+                doctor=self.doctor,
+                date=date,
+                time=current.time(),
+                status="confirmed",
+            )
+            current += datetime.timedelta(minutes=15)
+
+    def test_fully_booked_day_is_excluded(self):
+        self.book_whole_day(self.tomorrow)
+
+        dates = free_dates(self.doctor.id, self.tomorrow, days=3)
+
+        self.assertNotIn(self.tomorrow, dates)
+        self.assertEqual(len(dates), 2)
+
+    def test_query_count_is_constant_in_window_size(self):
+        for day in range(10):
+            self.book_whole_day(self.tomorrow + datetime.timedelta(days=day * 3))
+
+        # Cold grid cache: one read of the Slot rows, whatever the window
+        for days in (14, 60, 365):
+            cache.clear()
+            refresh_doctor_slots(self.doctor.id)
+            with self.assertNumQueries(1):
+                free_dates(self.doctor.id, self.tomorrow, days=days)
+
+    def test_only_the_materialized_window_is_offered(self):
+        dates = free_dates(self.doctor.id, self.tomorrow, days=SLOT_WINDOW_DAYS + 10)
+
+        last = timezone.localdate() + datetime.timedelta(days=SLOT_WINDOW_DAYS - 1)
+        self.assertEqual(dates[-1], last)
+
+    def test_endpoint(self):
+        self.book_whole_day(self.tomorrow)
+
+        cache.clear()
+        refresh_doctor_slots(self.doctor.id)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("patient:get_available_dates"),
+                {"doctor": self.doctor.id},
+            )
+
+        # Warm cache
+        with self.assertNumQueries(0):
+            self.client.get(
+                reverse("patient:get_available_dates"),
+                {"doctor": self.doctor.id},
+            )
+
+        dates = response.json()["dates"]
+        self.assertNotIn(self.tomorrow.strftime("%Y-%m-%d"), dates)
+        self.assertIn(
+            (self.tomorrow + datetime.timedelta(days=1)).strftime("%Y-%m-%d"),
+            dates,
+        )
+
+
+class MonthAvailabilityTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user("doc", "doctor")
+        self.patient = make_user("pat", "patient")
+        self.tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+
+        Availability.objects.create(
+            doctor=self.doctor,
+            day_of_week=self.tomorrow.weekday(),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0),
+            slot_duration_minutes=30,
+        )
+
+        self.params = {
+            "doctor": self.doctor.id,
+            "month": self.tomorrow.strftime("%Y-%m"),
+        }
+
+    def get(self, **headers):
+        return self.client.get(
+            reverse("patient:get_month_availability"), self.params, **headers
+        )
+
+    def test_payload(self):
+        days = self.get().json()["doctors"][str(self.doctor.id)]
+
+        self.assertEqual(
+            days[self.tomorrow.strftime("%Y-%m-%d")],
+            {"free": 2, "slots": ["09:00 AM", "09:30 AM"]},
+        )
+
+    def test_conditional_get(self):
+        etag = self.get()["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                patient=self.patient,
+                doctor=self.doctor,
+                date=self.tomorrow,
+                time=datetime.time(9, 0),
+            )
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_conditional_get_when_logged_in(self):
+        self.client.force_login(self.patient)
+        etag = self.get()["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Another session may see different holds
+        self.client.logout()
+        self.client.force_login(self.patient)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+def _book_in_worker(doctor_id, patient_id, date, time):
+    """
+    Thread / process entry point: returns True when the booking went through
+    """
+    from django.db import connection
+
+    try:
+        appt = Appointment(patient_id=patient_id, doctor_id=doctor_id)
+        book_slot(appt, date, time)
+        return True
+    except SlotUnavailable:
+        return False
+    finally:
+        connection.close()
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+
+    WORKERS = 8
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user("doc", "doctor")
+        self.patients = [make_user(f"pat{i}", "patient") for i in range(self.WORKERS)]
+        self.date = timezone.localdate() + datetime.timedelta(days=1)
+        self.time = datetime.time(9, 0)
+
+        Availability.objects.create(
+            doctor=self.doctor,
+            day_of_week=self.date.weekday(),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0),
+        )
+
+    def assert_single_booking(self, results):
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(
+            Appointment.objects.filter(
+                doctor=self.doctor, date=self.date, time=self.time, status="pending"
+            ).count(),
+            1,
+        )
+        self.assertTrue(
+            Slot.objects.get(doctor=self.doctor, date=self.date, time=self.time).is_booked
+        )
+
+    def run_workers(self, executor_class):
+        with executor_class(max_workers=self.WORKERS) as pool:
+            futures = [
+                pool.submit(_book_in_worker, self.doctor.id, p.id, self.date, self.time)
+                for p in self.patients
+            ]
+            return [f.result() for f in futures]
+
+    def test_parallel_threads(self):
+        self.assert_single_booking(self.run_workers(ThreadPoolExecutor))
+
+    def test_parallel_processes(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("worker processes cannot share an in-memory SQLite database")
+
+        # Forked workers must not inherit the parent's open connection
+        connection.close()
+        self.assert_single_booking(self.run_workers(ProcessPoolExecutor))
+
+    def test_rebooking_a_taken_slot_fails(self):
+        book_slot(Appointment(patient=self.patients[0], doctor=self.doctor), self.date, self.time)
+
+        with self.assertRaises(SlotUnavailable):
+            book_slot(Appointment(patient=self.patients[1], doctor=self.doctor), self.date, self.time)
+
+
+class SlotHoldTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user("doc", "doctor")
+        self.alice = make_user("alice", "patient")
+        self.bob = make_user("bob", "patient")
+        self.date = timezone.localdate() + datetime.timedelta(days=1)
+        self.time = datetime.time(9, 0)
+
+        Availability.objects.create(
+            doctor=self.doctor,
+            day_of_week=self.date.weekday(),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(9, 30),
+        )
+
+    def free_for(self, user):
+        return free_slots(self.doctor.id, self.date, user=user)
+
+    def test_held_slot_is_hidden_from_other_patients(self):
+        hold_slot(self.alice, self.doctor.id, self.date, self.time)
+
+        self.assertIn(self.time, self.free_for(self.alice))
+        self.assertNotIn(self.time, self.free_for(self.bob))
+
+        with self.assertRaises(SlotUnavailable):
+            book_slot(Appointment(patient=self.bob, doctor=self.doctor), self.date, self.time)
+
+        book_slot(Appointment(patient=self.alice, doctor=self.doctor), self.date, self.time)
+        self.assertFalse(Slot.objects.filter(held_by=self.alice).exists())
+
+    def test_hold_is_seen_without_the_cache(self):
+        # Another worker process: no shared cache entries at all
+        hold_slot(self.alice, self.doctor.id, self.date, self.time)
+        cache.clear()
+
+        self.assertNotIn(self.time, self.free_for(self.bob))
+
+    def test_month_view_leaves_out_held_slots(self):
+        hold_slot(self.alice, self.doctor.id, self.date, self.time)
+        params = {"doctor": self.doctor.id, "month": self.date.strftime("%Y-%m")}
+        url = reverse("patient:get_month_availability")
+
+        def slots_for(user):
+            self.client.force_login(user)
+            days = self.client.get(url, params).json()["doctors"][str(self.doctor.id)]
+            return days.get(self.date.strftime("%Y-%m-%d"), {}).get("slots", [])
+
+        self.assertNotIn("09:00 AM", slots_for(self.bob))
+        self.assertIn("09:00 AM", slots_for(self.alice))
+
+    def test_expired_hold_is_ignored(self):
+        hold_slot(self.alice, self.doctor.id, self.date, self.time)
+        Slot.objects.filter(held_by=self.alice).update(
+            held_until=timezone.now() - datetime.timedelta(seconds=1)
+        )
+
+        self.assertIn(self.time, self.free_for(self.bob))
+        hold_slot(self.bob, self.doctor.id, self.date, self.time)
+
+    def test_endpoint(self):
+        self.client.force_login(self.alice)
+        url = reverse("patient:hold_slot")
+        data = {"doctor": self.doctor.id, "date": self.date.isoformat(), "time": "09:00 AM"}
+
+        self.assertTrue(self.client.post(url, data).json()["held"])
+
+        self.client.force_login(self.bob)
+        self.assertEqual(self.client.post(url, data).status_code, 409)
+
+
+class EarliestSlotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.patient = make_user("pat", "patient")
+        self.date = timezone.localdate() + datetime.timedelta(days=1)
+
+        self.doctors = []
+        for i, start in enumerate([11, 9, 10]):
+            doctor = make_user(f"cardio{i}", "doctor")
+            DoctorProfile.objects.create(user=doctor, department="Cardiology")
+            Availability.objects.create(
+                doctor=doctor,
+                day_of_week=self.date.weekday(),
+                start_time=datetime.time(start, 0),
+                end_time=datetime.time(start, 30),
+            )
+            self.doctors.append(doctor)
+
+        other = make_user("derma", "doctor")
+        DoctorProfile.objects.create(user=other, department="Dermatology")
+        Availability.objects.create(
+            doctor=other,
+            day_of_week=self.date.weekday(),
+            start_time=datetime.time(8, 0),
+            end_time=datetime.time(9, 0),
+        )
+
+    def test_merges_doctors_in_time_order(self):
+        self.client.force_login(self.patient)
+
+        slots = self.client.get(
+            reverse("patient:earliest_slots"), {"department": "cardiology", "k": 3}
+        ).json()["slots"]
+
+        self.assertEqual(
+            [(s["doctor"], s["time"]) for s in slots],
+            [
+                (self.doctors[1].id, "09:00 AM"),
+                (self.doctors[1].id, "09:15 AM"),
+                (self.doctors[2].id, "10:00 AM"),
+            ],
+        )
+
+
+class ScheduleCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user("doc", "doctor")
+        self.patient = make_user("pat", "patient")
+        self.date = timezone.localdate() + datetime.timedelta(days=1)
+
+        self.availability = Availability.objects.create(
+            doctor=self.doctor,
+            day_of_week=self.date.weekday(),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(9, 30),
+        )
+
+    def free_times(self):
+        grid = free_grid(self.doctor.id, self.date, self.date + datetime.timedelta(days=1))
+        return sorted(grid.get(self.date, ()))
+
+    def test_signals_invalidate_cached_slots(self):
+        self.free_times()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.free_times()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=self.date, time=datetime.time(9, 0)
+            )
+        self.assertEqual(self.free_times(), [datetime.time(9, 15)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.availability.end_time = datetime.time(10, 0)
+            self.availability.save()
+        self.assertEqual(len(self.free_times()), 3)
+
+        self.assertGreater(schedule_cache_stats()["hits"], 0)
+
+    def test_grid_and_single_day_agree(self):
+        # Both read the Slot rows, so a change that only reached the
+        # rows (and the version) is seen by both
+        self.free_times()
+        with self.captureOnCommitCallbacks(execute=True):
+            ScheduleException.objects.create(
+                doctor=self.doctor, kind="break", start_date=self.date, end_date=self.date,
+                start_time=datetime.time(9, 0), end_time=datetime.time(9, 15),
+            )
+
+        self.assertEqual(self.free_times(), [datetime.time(9, 15)])
+        self.assertEqual(free_slots(self.doctor.id, self.date), self.free_times())
+
+    def test_version_moves_only_when_the_write_commits(self):
+        free_slots(self.doctor.id, self.date)
+        before = schedule_version(self.doctor.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=self.date, time=datetime.time(9, 0)
+            )
+            # Still inside the writer's transaction: readers keep the old version
+            self.assertEqual(schedule_version(self.doctor.id), before)
+
+        self.assertNotEqual(schedule_version(self.doctor.id), before)
+
+
+class WaitlistTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user("doc", "doctor")
+        DoctorProfile.objects.create(user=self.doctor, department="Cardiology")
+        self.patient = make_user("pat", "patient")
+        self.date = timezone.localdate() + datetime.timedelta(days=1)
+        self.time = datetime.time(9, 0)
+
+        Availability.objects.create(
+            doctor=self.doctor,
+            day_of_week=self.date.weekday(),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(9, 30),
+        )
+        self.appointment = book_slot(
+            Appointment(patient=self.patient, doctor=self.doctor), self.date, self.time
+        )
+
+        # Created in this order: FIFO within each kind of request
+        self.by_department = self.wait("early", department="cardiology")
+        self.by_doctor = self.wait("late", doctor=self.doctor)
+
+    def wait(self, username, **target):
+        return WaitlistEntry.objects.create(
+            patient=make_user(username, "patient"),
+            earliest_date=self.date,
+            latest_date=self.date,
+            **target,
+        )
+
+    def cancel(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.status = "cancelled"
+            self.appointment.save()
+
+    def test_cancellation_offers_slot_to_doctor_waiter_first(self):
+        self.cancel()
+
+        self.by_doctor.refresh_from_db()
+        self.assertEqual(self.by_doctor.status, "offered")
+        self.assertEqual(self.by_doctor.offered_time, self.time)
+        self.assertEqual(
+            WaitlistEntry.objects.get(pk=self.by_department.pk).status, "waiting"
+        )
+
+        # The slot is held for the waiter only
+        self.assertNotIn(self.time, free_slots(self.doctor.id, self.date, user=self.patient))
+
+        # ... for the whole offer, well past a booking form hold
+        later = time.time() + (HOLD_MINUTES + 2) * 60
+        with mock.patch("time.time", return_value=later):
+            self.assertNotIn(self.time, free_slots(self.doctor.id, self.date, user=self.patient))
+
+        accept_offer(self.by_doctor)
+        self.assertTrue(
+            Appointment.objects.filter(
+                patient=self.by_doctor.patient, date=self.date, time=self.time, status="pending"
+            ).exists()
+        )
+
+    def test_declined_and_lapsed_offers_move_down_the_list(self):
+        self.cancel()
+        self.by_doctor.refresh_from_db()
+        leave_waitlist(self.by_doctor)
+
+        self.by_department.refresh_from_db()
+        self.assertEqual(self.by_department.status, "offered")
+
+        WaitlistEntry.objects.filter(pk=self.by_department.pk).update(
+            offer_expires=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        self.assertEqual(expire_offers(), 1)
+        self.assertEqual(
+            WaitlistEntry.objects.get(pk=self.by_department.pk).status, "expired"
+        )
+
+    def test_expiry_refreshes_the_waiters_dashboards(self):
+        self.cancel()
+        self.by_doctor.refresh_from_db()
+        past = self.wait("past", department="cardiology")
+        WaitlistEntry.objects.filter(pk=past.pk).update(
+            latest_date=timezone.localdate() - datetime.timedelta(days=1)
+        )
+
+        dashboard_data(self.by_doctor.patient_id)
+        dashboard_data(past.patient_id)
+
+        WaitlistEntry.objects.filter(pk=self.by_doctor.pk).update(
+            offer_expires=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_offers()
+
+        # Both entries were rebuilt, as a save of each would have done
+        for patient_id in (self.by_doctor.patient_id, past.patient_id):
+            with self.assertNumQueries(4):
+                dashboard_data(patient_id)
+
+
+
+class DashboardCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.patient = make_user("pat", "patient")
+        self.other = make_user("other", "patient")
+
+    def test_hit_needs_no_queries_until_patient_rows_change(self):
+        dashboard_data(self.patient.id)
+        dashboard_data(self.other.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard_data(self.patient.id)["recent_records"], [])
+
+        # Another patient's write leaves this patient's entry alone
+        with self.captureOnCommitCallbacks(execute=True):
+            MedicalRecord.objects.create(patient=self.other, diagnosis="Flu")
+        with self.assertNumQueries(0):
+            dashboard_data(self.patient.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MedicalRecord.objects.create(patient=self.patient, diagnosis="Cold")
+            # Not yet committed: readers still get the cached entry
+            self.assertEqual(dashboard_data(self.patient.id)["recent_records"], [])
+        self.assertEqual(len(dashboard_data(self.patient.id)["recent_records"]), 1)
+
+    def test_view(self):
+        self.client.force_login(self.patient)
+        self.client.get(reverse("patient:dashboard"))
+
+        # session, user and profile lookups only
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("patient:dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+
+HOT_TABLES = ("patient_appointment", "patient_medicalrecord", "patient_billing", "patient_payment")
+
+# "SCAN patient_billing" reads the whole table; "SCAN ... USING INDEX" and
+# "SEARCH ..." do not (older SQLite versions say "SCAN TABLE")
+_FULL_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)")
+
+
+class IndexUsageTests(TestCase):
+    """
+    EXPLAINs every query the hot list views issue against the big tables
+    and fails on a full table scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        cls.doctor = make_user("doc", "doctor")
+        DoctorProfile.objects.create(user=cls.doctor, department="Cardiology")
+        cls.patient = make_user("pat", "patient")
+        cls.admin = make_user("admin", "admin")
+
+        for n in range(3):
+            appointment = Appointment.objects.create(
+                patient=cls.patient, doctor=cls.doctor,
+                date=today - datetime.timedelta(days=n), time=datetime.time(9, 0),
+                status="completed",
+            )
+            MedicalRecord.objects.create(patient=cls.patient, doctor=cls.doctor, appointment=appointment)
+            bill = Billing.objects.create(patient=cls.patient, description="Visit", amount=100)
+            Payment.objects.create(billing=bill, patient=cls.patient, amount=100, method="cash", status="paid")
+
+    def setUp(self):
+        cache.clear()
+
+    def full_scans(self, url, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        scans = []
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT") or not any(t in sql for t in HOT_TABLES):
+                    continue
+
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for row in cursor.fetchall():
+                    match = _FULL_SCAN.search(row[-1])
+                    if match and match.group(1) in HOT_TABLES:
+                        scans.append((row[-1], sql))
+        return scans
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_hot_views_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plan format checked here is SQLite's")
+
+        views = [
+            (reverse("patient:dashboard"), self.patient),
+            (reverse("patient:appointment_list"), self.patient),
+            (reverse("patient:medical_history"), self.patient),
+            (reverse("patient:billing_list"), self.patient),
+            (reverse("patient:timeline"), self.patient),
+            (reverse("doctor:dashboard"), self.doctor),
+            (reverse("doctor:appointment_list"), self.doctor),
+            (reverse("admin_panel:appointment_list"), self.admin),
+            (reverse("admin_panel:billing_list") + "?status=unpaid", self.admin),
+            (reverse("admin_panel:billing_list"), self.admin),
+            (reverse("admin_panel:payments"), self.admin),
+        ]
+
+        for url, user in views:
+            with self.subTest(url=url):
+                self.assertEqual(self.full_scans(url, user), [])
+
+
+class AppointmentListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_user("doc", "doctor")
+        DoctorProfile.objects.create(user=cls.doctor, department="Cardiology")
+        cls.patient = make_user("pat", "patient")
+        day = datetime.date(2024, 1, 1)
+
+        for n in range(25):
+            Appointment.objects.create(
+                patient=cls.patient, doctor=cls.doctor,
+                date=day + datetime.timedelta(days=n), time=datetime.time(9, 0),
+                status="completed",
+            )
+        Appointment.objects.create(
+            patient=cls.patient, doctor=cls.doctor,
+            date=day, time=datetime.time(10, 0), status="cancelled",
+        )
+
+    def test_sections_come_from_one_bounded_query(self):
+        with self.assertNumQueries(1):
+            pages = first_pages(self.patient.id, size=10)
+            departments = {appt.doctor.doctor_profile.department for appt in pages["completed"][0]}
+
+        self.assertEqual(departments, {"Cardiology"})
+
+        completed, cursor = pages["completed"]
+        self.assertEqual(len(completed), 10)
+        self.assertEqual(completed[0].date, datetime.date(2024, 1, 25))
+        self.assertIsNotNone(cursor)
+
+        self.assertEqual(len(pages["cancelled"][0]), 1)
+        self.assertIsNone(pages["cancelled"][1])
+        self.assertEqual(pages["pending"], ([], None))
+
+    def test_load_more_continues_the_section(self):
+        self.client.force_login(self.patient)
+        response = self.client.get(reverse("patient:appointment_list"))
+        cursor = response.context["sections"][3]["next"]
+
+        url = reverse("patient:appointment_list_more", args=["completed"])
+        seen = 10
+        while cursor:
+            data = self.client.get(url, {"cursor": cursor}).json()
+            seen += data["html"].count("<tr>")
+            cursor = data["next"]
+
+        self.assertEqual(seen, 25)
+        self.assertEqual(self.client.get(reverse("patient:appointment_list_more", args=["nope"])).status_code, 404)
+
+
+class RecordSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_user("doc", "doctor")
+        cls.patient = make_user("pat", "patient")
+        cls.stranger = make_user("other", "patient")
+
+        Appointment.objects.create(
+            patient=cls.patient, doctor=cls.doctor,
+            date=datetime.date(2025, 1, 1), time=datetime.time(9, 0), status="completed",
+        )
+
+        cls.in_notes = MedicalRecord.objects.create(
+            patient=cls.patient, doctor=cls.doctor, diagnosis="Checkup",
+            notes="Family history of asthma <b>noted</b>",
+        )
+        cls.in_diagnosis = MedicalRecord.objects.create(
+            patient=cls.patient, doctor=cls.doctor, diagnosis="Asthma",
+        )
+        cls.stranger_record = MedicalRecord.objects.create(
+            patient=cls.stranger, diagnosis="Asthma",
+        )
+
+    def ids(self, query, **kwargs):
+        return [r.id for r in search_records(query, **kwargs)[0]]
+
+    def test_ranked_and_kept_in_sync(self):
+        patients = User.objects.filter(pk=self.patient.pk).values_list("pk")
+        self.assertEqual(self.ids("asthma", patients=patients), [self.in_diagnosis.id, self.in_notes.id])
+
+        Prescription.objects.create(record=self.in_notes, medication="Salbutamol inhaler")
+        self.assertEqual(self.ids("salbut"), [self.in_notes.id])
+
+        self.in_diagnosis.delete()
+        self.assertEqual(self.ids("asthma", patients=patients), [self.in_notes.id])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        records, _ = search_records("noted")
+        self.assertIn("&lt;b&gt;<mark>noted</mark>", records[0].search_snippet)
+
+    def test_query_syntax_is_literal(self):
+        self.assertEqual(self.ids('asthma" OR NOT "x'), [])
+        self.assertEqual(self.ids("***"), [])
+
+    def test_icontains_backend_matches_the_same_records(self):
+        hits = IContainsBackend().search("asthma")
+        self.assertEqual(
+            {h.record_id for h in hits},
+            {h.record_id for h in get_backend().search("asthma")},
+        )
+
+    def test_doctor_endpoint_is_scoped_to_their_patients(self):
+        self.client.force_login(self.doctor)
+        data = self.client.get(reverse("doctor:search_records"), {"q": "asthma"}).json()
+
+        self.assertEqual([r["id"] for r in data["results"]], [self.in_diagnosis.id, self.in_notes.id])
+        self.assertFalse(data["has_next"])
+
+
+class TimelineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_user("doc", "doctor")
+        cls.patient = make_user("pat", "patient")
+        start = timezone.make_aware(datetime.datetime(2024, 1, 1, 9, 0))
+
+        # One event of some kind every day; records get a prescription a minute later
+        for n in range(30):
+            at = start + datetime.timedelta(days=n)
+            if n % 3 == 0:
+                Appointment.objects.create(
+                    patient=cls.patient, doctor=cls.doctor, date=at.date(), time=at.time(),
+                    status="completed",
+                )
+            elif n % 3 == 1:
+                record = MedicalRecord.objects.create(patient=cls.patient, doctor=cls.doctor, created_at=at)
+                prescription = Prescription.objects.create(record=record, medication="Rest")
+                Prescription.objects.filter(pk=prescription.pk).update(created_at=at + datetime.timedelta(minutes=1))
+            else:
+                bill = Billing.objects.create(patient=cls.patient, description="Visit", amount=100)
+                Billing.objects.filter(pk=bill.pk).update(created_at=at)
+
+        cls.total = 30 + 10  # plus the prescriptions
+
+    def test_pages_merge_every_source_in_time_order(self):
+        events, cursor = [], None
+        pages = 0
+        while True:
+            page, cursor = timeline_page(self.patient.id, cursor, size=7)
+            events += page
+            pages += 1
+            if not cursor:
+                break
+
+        self.assertEqual(len(events), self.total)
+        self.assertEqual(pages, 6)
+        self.assertEqual(len({(e.kind, e.id) for e in events}), self.total)
+
+        times = [e.at for e in events]
+        self.assertEqual(times, sorted(times, reverse=True))
+        self.assertEqual(
+            {e.kind for e in events}, {"appointment", "record", "prescription", "bill"}
+        )
+
+    def test_page_cost_does_not_grow_with_history(self):
+        _, cursor = timeline_page(self.patient.id, size=5)
+
+        # One query per source; payments ran out on the first page
+        with self.assertNumQueries(4):
+            timeline_page(self.patient.id, cursor, size=5)
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_sources_are_read_in_index_order(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plan format checked here is SQLite's")
+
+        _, cursor = timeline_page(self.patient.id, size=5)
+        with CaptureQueriesContext(connection) as captured:
+            timeline_page(self.patient.id, cursor, size=5)
+
+        with connection.cursor() as db:
+            for query in captured.captured_queries:
+                with self.subTest(sql=query["sql"][:80]):
+                    db.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plan = " | ".join(row[-1] for row in db.fetchall())
+                    self.assertNotIn("TEMP B-TREE", plan)
+                    self.assertIsNone(_FULL_SCAN.search(plan), plan)
+
+    def test_bad_cursor_starts_over(self):
+        first, _ = timeline_page(self.patient.id, size=5)
+        again, _ = timeline_page(self.patient.id, "not!a*cursor", size=5)
+        self.assertEqual([(e.kind, e.id) for e in again], [(e.kind, e.id) for e in first])
+
+
+class PatientExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user("admin", "admin")
+        cls.doctor = make_user("doc", "doctor")
+        cls.patient = make_user("pat", "patient")
+        today = timezone.localdate()
+
+        for n in range(7):
+            appt = Appointment.objects.create(
+                patient=cls.patient, doctor=cls.doctor, date=today, time=datetime.time(9, n),
+                status="completed",
+            )
+            record = MedicalRecord.objects.create(
+                patient=cls.patient, doctor=cls.doctor, appointment=appt, diagnosis=f"Check {n}",
+            )
+            Prescription.objects.create(record=record, medication="Rest")
+            Billing.objects.create(patient=cls.patient, description="Visit", amount=100)
+
+    def test_bundle_is_one_json_document(self):
+        bundle = json.loads("".join(export_chunks(self.patient, chunk_size=3)))
+
+        self.assertEqual(bundle["resourceType"], "Bundle")
+        kinds = [entry["resource"]["resourceType"] for entry in bundle["entry"]]
+        self.assertEqual(kinds.count("Patient"), 1)
+        for kind in ("Appointment", "Condition", "MedicationRequest", "Invoice"):
+            self.assertEqual(kinds.count(kind), 7)
+
+    def test_ndjson_is_one_resource_per_line(self):
+        lines = "".join(export_chunks(self.patient, "ndjson", chunk_size=3)).splitlines()
+        self.assertEqual(len(lines), 1 + 4 * 7)
+        self.assertEqual(json.loads(lines[0])["resourceType"], "Patient")
+
+    def test_admin_download_is_streamed(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse("admin_panel:patient_export", args=[self.patient.pk]), {"format": "ndjson"}
+        )
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn(f"patient-{self.patient.pk}.ndjson", response["Content-Disposition"])
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 1 + 4 * 7)
+
+    def test_bulk_export_writes_a_file_per_patient(self):
+        other = make_user("pat2", "patient")
+
+        with tempfile.TemporaryDirectory() as directory:
+            written = dict(export_many([self.patient.pk, other.pk], directory, workers=1))
+
+            self.assertEqual(
+                sorted(os.path.basename(path) for path in written),
+                [f"patient-{self.patient.pk}.json", f"patient-{other.pk}.json"],
+            )
+            for path, size in written.items():
+                self.assertEqual(os.path.getsize(path), size)
+                with open(path, encoding="utf-8") as exported:
+                    self.assertEqual(json.load(exported)["resourceType"], "Bundle")
+
+    def test_command_reports_unknown_ids(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaisesMessage(CommandError, "No such user: 999999."):
+                call_command("export_patient_records", self.patient.pk, 999999, output=directory)
+
+            self.assertEqual(os.listdir(directory), [])
+
+
+IMPORT_CSV = """patient,doctor,created_at,diagnosis,notes,allergies,medications,prescriptions
+pat,doc,2015-03-02 10:00,Sarcoidosis,Chest x-ray,,,Prednisone | 40mg daily; Calcium
+pat,,2016-07-19,Asthma,,Pollen,Salbutamol,
+nobody,doc,2017-01-01,Flu,,,,
+pat,doc,not a date,Flu,,,,
+pat,doc,2018-05-05T09:30:00,Migraine,Aura,,,Sumatriptan | as needed
+pat,doc,2020-02-30 10:00,Flu,,,,
+pat,doc,2020-13-45,Flu,,,,
+"""
+
+
+class RecordImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user("admin", "admin")
+        cls.doctor = make_user("doc", "doctor")
+        cls.patient = make_user("pat", "patient")
+
+    def _rows(self, text=IMPORT_CSV):
+        return read_rows(text.splitlines(keepends=True), "csv")
+
+    def test_valid_rows_are_imported_and_bad_ones_reported(self):
+        result = import_records(self._rows(), "history.csv", batch_size=2)
+
+        self.assertEqual((result.rows, result.imported, result.skipped), (7, 3, 4))
+        self.assertEqual([number for number, _ in result.errors], [3, 4, 6, 7])
+        self.assertIn("unknown patient", result.errors[0][1])
+
+        records = MedicalRecord.objects.filter(patient=self.patient).order_by("created_at")
+        self.assertEqual([r.diagnosis for r in records], ["Sarcoidosis", "Asthma", "Migraine"])
+        self.assertIsNone(records[1].doctor_id)
+
+        prescriptions = Prescription.objects.filter(record=records[0]).order_by("medication")
+        self.assertEqual(
+            [(p.medication, p.instructions) for p in prescriptions],
+            [("Calcium", ""), ("Prednisone", "40mg daily")],
+        )
+        # Dated with their record, not the import
+        self.assertEqual({p.created_at for p in prescriptions}, {records[0].created_at})
+
+        # bulk_create skipped the signals; the batch indexed the records itself
+        hits = get_backend().search("prednisone")
+        self.assertEqual([hit.record_id for hit in hits], [records[0].pk])
+
+        checkpoint = RecordImport.objects.get(name="history.csv")
+        self.assertEqual((checkpoint.rows_done, checkpoint.imported, checkpoint.skipped), (7, 3, 4))
+        self.assertIsNotNone(checkpoint.finished_at)
+
+    def test_rerun_resumes_after_the_last_committed_batch(self):
+        def interrupted():
+            for n, row in enumerate(self._rows()):
+                if n == 2:
+                    raise RuntimeError("connection lost")
+                yield row
+
+        with self.assertRaises(RuntimeError):
+            import_records(interrupted(), "history.csv", batch_size=2)
+        self.assertEqual(MedicalRecord.objects.count(), 2)
+
+        result = import_records(self._rows(), "history.csv", batch_size=2)
+
+        self.assertEqual(result.resumed_from, 2)
+        self.assertEqual((result.rows, result.imported), (5, 1))
+        self.assertEqual(MedicalRecord.objects.count(), 3)
+
+        # Finished imports bring nothing new unless restarted
+        self.assertEqual(import_records(self._rows(), "history.csv").rows, 0)
+        import_records(self._rows(), "history.csv", restart=True)
+        self.assertEqual(MedicalRecord.objects.count(), 6)
+
+    def test_queries_per_batch_do_not_grow_with_rows(self):
+        row = "pat,doc,2020-01-01,Check,,,,Rest | daily\n"
+        header = IMPORT_CSV.splitlines(keepends=True)[0]
+
+        def count(rows):
+            with CaptureQueriesContext(connection) as queries:
+                import_records(self._rows(header + row * rows), f"run-{rows}", batch_size=rows)
+            return len(queries)
+
+        self.assertEqual(count(5), count(50))
+
+    def test_admin_upload(self):
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile("history.ndjson", (
+            '{"patient": "pat", "doctor": "doc", "created_at": "2019-02-03", "diagnosis": "Gout",'
+            ' "prescriptions": [{"medication": "Colchicine", "instructions": "0.5mg"}]}\n'
+            "not json\n"
+        ).encode())
+
+        response = self.client.post(
+            reverse("admin_panel:record_import"), {"file": upload, "batch_size": 100}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        result = response.context["result"]
+        self.assertEqual((result.imported, result.skipped), (1, 1))
+        self.assertTrue(Prescription.objects.filter(medication="Colchicine").exists())
+
+    def test_new_file_under_an_old_name_starts_over(self):
+        self.client.force_login(self.admin)
+        url = reverse("admin_panel:record_import")
+        header = IMPORT_CSV.splitlines(keepends=True)[0]
+
+        def upload(*diagnoses):
+            rows = "".join(f"pat,doc,2020-01-0{n + 1},{d},,,,\n" for n, d in enumerate(diagnoses))
+            content = SimpleUploadedFile("records.csv", (header + rows).encode())
+            return self.client.post(url, {"file": content, "batch_size": 100}).context["result"]
+
+        upload("Flu", "Cold")
+        result = upload("Gout", "Asthma", "Migraine")
+
+        self.assertEqual((result.resumed_from, result.imported), (0, 3))
+        self.assertEqual(MedicalRecord.objects.count(), 5)
+
+        # The same file again is still recognised as already done
+        self.assertEqual(upload("Gout", "Asthma", "Migraine").rows, 0)
+        self.assertEqual(MedicalRecord.objects.count(), 5)
+
+    def test_unreadable_uploads_are_form_errors(self):
+        self.client.force_login(self.admin)
+        url = reverse("admin_panel:record_import")
+
+        for name, content in [
+            ("history.json", b'[{"patient": "pat",'),
+            ("history.json", b'{"patient": "pat"}'),
+            ("history.csv", "patient,created_at\npat,2019-02-03\n".encode("utf-16")),
+        ]:
+            response = self.client.post(url, {"file": SimpleUploadedFile(name, content), "batch_size": 100})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("file", response.context["form"].errors)
+            self.assertIsNone(response.context["result"])
+
+        self.assertFalse(MedicalRecord.objects.exists())
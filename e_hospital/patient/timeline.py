@@ -0,0 +1,190 @@
+"""
+A patient's whole history as one stream, newest first.
+
+Appointments, medical records, prescriptions, bills and payments are each
+read in their own keyset order (per-patient indexes) and merged with a
+heap. A page reads at most page size + 1 rows per source, so it costs
+the same for a ten-year history as for a new patient. The cursor holds
+each source's own position; sources already read to the end are skipped.
+"""
+import base64
+import binascii
+import datetime
+import heapq
+import json
+from dataclasses import dataclass
+
+from django.utils import timezone
+
+from e_hospital.pagination import cursor_after, rows_after
+from .models import Appointment, Billing, MedicalRecord, Payment, Prescription
+
+
+TIMELINE_PAGE_SIZE = 20
+
+DONE = "done"
+
+
+@dataclass
+class TimelineEvent:
+    kind: str
+    id: int
+    at: datetime.datetime
+    title: str
+    detail: str
+    status: str = ""
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "id": self.id,
+            "at": self.at,
+            "title": self.title,
+            "detail": self.detail,
+            "status": self.status,
+        }
+
+
+def _name(user):
+    return (user.get_full_name() or user.username) if user else "—"
+
+
+def _appointment_event(appt):
+    at = timezone.make_aware(datetime.datetime.combine(appt.date, appt.time))
+    return TimelineEvent(
+        "appointment", appt.id, at,
+        f"Appointment with Dr. {_name(appt.doctor)}", appt.reason, appt.get_status_display(),
+    )
+
+
+def _record_event(record):
+    return TimelineEvent(
+        "record", record.id, record.created_at,
+        f"Medical record by Dr. {_name(record.doctor)}", record.diagnosis,
+    )
+
+
+def _prescription_event(prescription):
+    return TimelineEvent(
+        "prescription", prescription.id, prescription.created_at,
+        f"Prescription by Dr. {_name(prescription.record.doctor)}", prescription.medication,
+    )
+
+
+def _bill_event(bill):
+    return TimelineEvent(
+        "bill", bill.id, bill.created_at,
+        f"Bill: {bill.description}", f"₹{bill.amount_due} due of ₹{bill.amount}", bill.get_status_display(),
+    )
+
+
+def _payment_event(payment):
+    return TimelineEvent(
+        "payment", payment.id, payment.paid_at,
+        f"Payment of ₹{payment.amount}", payment.get_method_display(), payment.get_status_display(),
+    )
+
+
+# kind: (rows of a patient, keyset ordering, event) — in tie-break order
+SOURCES = {
+    "appointment": (
+        lambda patient_id: Appointment.objects.filter(patient_id=patient_id).select_related("doctor"),
+        ("-date", "-time", "-id"),
+        _appointment_event,
+    ),
+    "record": (
+        lambda patient_id: MedicalRecord.objects.filter(patient_id=patient_id).select_related("doctor"),
+        ("-created_at", "-id"),
+        _record_event,
+    ),
+    "prescription": (
+        lambda patient_id: Prescription.objects.filter(patient_id=patient_id)
+        .select_related("record__doctor"),
+        ("-created_at", "-id"),
+        _prescription_event,
+    ),
+    "bill": (
+        lambda patient_id: Billing.objects.filter(patient_id=patient_id),
+        ("-created_at", "-id"),
+        _bill_event,
+    ),
+    "payment": (
+        lambda patient_id: Payment.objects.filter(patient_id=patient_id),
+        ("-paid_at", "-id"),
+        _payment_event,
+    ),
+}
+
+
+# ======================================================
+# CURSOR
+# ======================================================
+
+def encode_position(position):
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_position(cursor):
+    """
+    {kind: source cursor or DONE}; a missing or unreadable cursor starts
+    every source from the top
+    """
+    if not cursor:
+        return {}
+
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return {}
+
+    if not isinstance(position, dict):
+        return {}
+    return {kind: value for kind, value in position.items() if kind in SOURCES and isinstance(value, str)}
+
+
+# ======================================================
+# PAGE
+# ======================================================
+
+def timeline_page(patient_id, cursor=None, size=TIMELINE_PAGE_SIZE):
+    """
+    (events newest first, cursor of the next page or None)
+    """
+    position = decode_position(cursor)
+
+    streams = []
+    fetched = {}
+    for kind, (rows, ordering, to_event) in SOURCES.items():
+        if position.get(kind) == DONE:
+            continue
+
+        objs = rows_after(rows(patient_id), ordering, position.get(kind), size + 1)
+        fetched[kind] = objs
+        streams.append([(to_event(obj), obj) for obj in objs])
+
+    merged = heapq.merge(*streams, key=lambda pair: pair[0].at, reverse=True)
+
+    events = []
+    last = {}
+    for event, obj in merged:
+        if len(events) == size:
+            break
+        events.append(event)
+        last[event.kind] = obj
+
+    next_position = dict(position)
+    remaining = False
+
+    for kind, objs in fetched.items():
+        ordering = SOURCES[kind][1]
+        consumed = objs.index(last[kind]) + 1 if kind in last else 0
+
+        if consumed < len(objs):
+            remaining = True
+            if kind in last:
+                next_position[kind] = cursor_after(last[kind], ordering)
+        else:
+            next_position[kind] = DONE
+
+    return events, (encode_position(next_position) if remaining else None)
@@ -11,12 +11,21 @@ urlpatterns = [
 
     # ✅ Appointments
     path("appointments/", views.appointment_list, name="appointment_list"),
+    path("appointments/more/<slug:status>/", views.appointment_list_more, name="appointment_list_more"),
     path("appointments/book/", views.book_appointment, name="book_appointment"),
     path("appointments/<int:pk>/", views.appointment_detail, name="appointment_detail"),
     path("appointments/<int:pk>/reschedule/", views.reschedule_appointment, name="reschedule_appointment"),
     path("appointments/<int:pk>/cancel/", views.cancel_appointment, name="cancel_appointment"),
 
+    # ✅ Waitlist
+    path("waitlist/", views.waitlist, name="waitlist"),
+    path("waitlist/<int:pk>/accept/", views.waitlist_accept, name="waitlist_accept"),
+    path("waitlist/<int:pk>/leave/", views.waitlist_leave, name="waitlist_leave"),
+
     # ✅ Medical Records
+    path("timeline/", views.timeline, name="timeline"),
+    path("timeline/feed/", views.timeline_feed, name="timeline_feed"),
+
     path("medical-history/", views.medical_history, name="medical_history"),
     path("medical-history/record/<int:record_id>/", views.record_detail, name="record_detail"),
 
@@ -47,6 +56,9 @@ urlpatterns = [
     
     path("get-available-dates/", views.get_available_dates, name="get_available_dates"),
     path("get-available-slots/", views.get_available_slots, name="get_available_slots"),
+    path("get-month-availability/", views.get_month_availability, name="get_month_availability"),
+    path("appointments/hold/", views.hold_slot_view, name="hold_slot"),
+    path("appointments/earliest/", views.earliest_slots, name="earliest_slots"),
 
 
     path("health-resources/",views.health_resources,name="health_resources"),
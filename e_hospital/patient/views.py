@@ -1,22 +1,34 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.utils import timezone
 from django.http import JsonResponse
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.vary import vary_on_cookie
 from functools import wraps
 import datetime
 import stripe
 from .forms import ProfileForm
 from django.conf import settings
-from doctor.models import Availability
-from .forms import AppointmentForm
+from doctor.slots import (
+    free_slots, free_dates, free_grids, held_slots, schedule_etag,
+    earliest_free_slots,
+)
+from .forms import AppointmentForm, WaitlistForm
+from .booking import book_slot, hold_slot, SlotUnavailable
+from .waitlist import accept_offer, leave_waitlist
+from .dashboard import dashboard_data
+from .appointments import SECTIONS as APPOINTMENT_SECTIONS, first_pages, next_page
+from .timeline import timeline_page
+from e_hospital.pagination import paginate
 from .models import (
     Appointment, MedicalRecord, Prescription,
-    Payment, Billing, Insurance, HealthCategory, HealthResource
+    Payment, Billing, Insurance, HealthCategory, HealthResource, WaitlistEntry
 )
 
 from django.contrib.auth import authenticate, login
+from django.contrib.auth.models import User
 
 
 
@@ -73,17 +85,7 @@ def patient_required(view_func):
 @login_required
 @patient_required
 def dashboard(request):
-    user = request.user
-
-    upcoming = Appointment.objects.filter(patient=user,date__gte=timezone.now().date()).order_by("date", "time")[:5]
-    recent_records = MedicalRecord.objects.filter(patient=user).order_by("-created_at")[:3]
-    recent_payments = Payment.objects.filter(patient=user).order_by("-paid_at")[:5]
-
-    return render(request, "patient/dashboard.html", {
-        "upcoming": upcoming,
-        "recent_records": recent_records,
-        "payments": recent_payments,
-    })
+    return render(request, "patient/dashboard.html", dashboard_data(request.user.id))
 
 
 # =====================================================
@@ -92,13 +94,34 @@ def dashboard(request):
 @login_required
 @patient_required
 def appointment_list(request):
-    user = request.user
-    return render(request, "patient/appointment_list.html", {
-        "pending": Appointment.objects.filter(patient=user, status="pending"),
-        "approved": Appointment.objects.filter(patient=user, status="confirmed"),
-        "cancelled": Appointment.objects.filter(patient=user, status="cancelled"),
-        "completed": Appointment.objects.filter(patient=request.user,status='completed').order_by('-date', '-time')
-    })
+    # One query for the first page of all four sections
+    pages = first_pages(request.user.id)
+
+    sections = [
+        {"status": status, **section, "appointments": pages[status][0], "next": pages[status][1]}
+        for status, section in APPOINTMENT_SECTIONS.items()
+    ]
+
+    return render(request, "patient/appointment_list.html", {"sections": sections})
+
+
+@login_required
+@patient_required
+def appointment_list_more(request, status):
+    """
+    "Load more" for one section: the next rows as HTML plus the cursor after them
+    """
+    if status not in APPOINTMENT_SECTIONS:
+        return JsonResponse({"error": "Unknown section."}, status=404)
+
+    page = next_page(request, request.user.id, status)
+    html = render_to_string("patient/appointment_rows.html", {
+        "appointments": page,
+        "status": status,
+        **APPOINTMENT_SECTIONS[status],
+    }, request=request)
+
+    return JsonResponse({"html": html, "next": page.next_cursor})
 
 
 @login_required
@@ -133,10 +156,12 @@ def book_appointment(request):
 
         appt = form.save(commit=False)
         appt.patient = request.user
-        appt.date = date_obj
-        appt.time = time_obj
-        appt.status = "pending"
-        appt.save()
+
+        try:
+            book_slot(appt, date_obj, time_obj)
+        except SlotUnavailable as e:
+            messages.error(request, f"{e} Please pick another slot.")
+            return redirect("patient:book_appointment")
 
         messages.success(request, "Appointment booked successfully")
         return redirect("patient:appointment_list")
@@ -167,21 +192,25 @@ def reschedule_appointment(request, pk):
         form = AppointmentForm(request.POST, instance=appt)
         if form.is_valid():
             appt = form.save(commit=False)
+            date_obj, time_obj = appt.date, appt.time
+
              # 🔥 FIX 1: DATE
             date_str = request.POST.get("date")
             if date_str:
-                appt.date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+                date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
 
             # 🔥 FIX 2: TIME
             time_str = request.POST.get("time")
             if time_str:
-                appt.time = datetime.datetime.strptime(time_str, "%I:%M %p").time()
+                time_obj = datetime.datetime.strptime(time_str, "%I:%M %p").time()
 
-                
+            # 🔁 Reset approval (book_slot puts it back to pending)
+            try:
+                book_slot(appt, date_obj, time_obj)
+            except SlotUnavailable as e:
+                messages.error(request, f"{e} Please pick another slot.")
+                return redirect("patient:reschedule_appointment", pk)
 
-            # 🔁 Reset approval
-            appt.status = "pending"
-            appt.save()
             messages.success(
                 request,
                 "Appointment rescheduled. Waiting for admin approval."
@@ -212,6 +241,81 @@ def cancel_appointment(request, pk):
     return redirect("patient:appointment_list")
 
 
+# =====================================================
+# WAITLIST
+# =====================================================
+@login_required
+@patient_required
+def waitlist(request):
+    form = WaitlistForm(request.POST or None)
+
+    if request.method == "POST" and form.is_valid():
+        entry = form.save(commit=False)
+        entry.patient = request.user
+        entry.save()
+        messages.success(request, "You are on the waitlist. A freed slot will be held for you here.")
+        return redirect("patient:waitlist")
+
+    entries = (
+        WaitlistEntry.objects.filter(patient=request.user, status__in=["waiting", "offered"])
+        .select_related("doctor", "offered_doctor")
+    )
+
+    return render(request, "patient/waitlist.html", {
+        "form": form,
+        "entries": entries,
+        "now": timezone.now(),
+    })
+
+
+@login_required
+@patient_required
+@require_POST
+def waitlist_accept(request, pk):
+    entry = get_object_or_404(WaitlistEntry, pk=pk, patient=request.user)
+
+    try:
+        accept_offer(entry)
+    except SlotUnavailable as e:
+        messages.error(request, str(e))
+        return redirect("patient:waitlist")
+
+    messages.success(request, "Appointment booked from the waitlist.")
+    return redirect("patient:appointment_list")
+
+
+@login_required
+@patient_required
+@require_POST
+def waitlist_leave(request, pk):
+    entry = get_object_or_404(
+        WaitlistEntry, pk=pk, patient=request.user, status__in=["waiting", "offered"]
+    )
+    leave_waitlist(entry)
+    messages.success(request, "Removed from the waitlist.")
+    return redirect("patient:waitlist")
+
+
+# =====================================================
+# TIMELINE
+# =====================================================
+@login_required
+@patient_required
+def timeline(request):
+    events, next_cursor = timeline_page(request.user.id)
+    return render(request, "patient/timeline.html", {"events": events, "next": next_cursor})
+
+
+@login_required
+@patient_required
+def timeline_feed(request):
+    """
+    A timeline page as JSON; pass "next" back as ?cursor=
+    """
+    events, next_cursor = timeline_page(request.user.id, request.GET.get("cursor"))
+    return JsonResponse({"events": [e.as_dict() for e in events], "next": next_cursor})
+
+
 # =====================================================
 # MEDICAL HISTORY
 # =====================================================
@@ -220,11 +324,9 @@ def cancel_appointment(request, pk):
 def medical_history(request):
     records = MedicalRecord.objects.filter(
         patient=request.user
-    ).order_by("-created_at")
+    ).select_related("doctor")
 
-    paginator = Paginator(records, 10)
-    page = request.GET.get("page")
-    records = paginator.get_page(page)
+    records = paginate(request, records, ("-created_at", "-id"), per_page=10)
 
     return render(request, "patient/medical_history.html", {"records": records})
 
@@ -242,14 +344,16 @@ def record_detail(request, record_id):
 @login_required
 @patient_required
 def prescription_detail(request, pk):
-    pres = get_object_or_404(Prescription, pk=pk, record__patient=request.user)
+    pres = get_object_or_404(Prescription, pk=pk, patient=request.user)
     return render(request, "patient/prescription_detail.html", {"prescription": pres})
 
 
 @login_required
 @patient_required
 def my_prescriptions(request):
-    prescriptions = Prescription.objects.filter(record__patient=request.user)
+    prescriptions = Prescription.objects.filter(
+        patient=request.user
+    ).select_related("record__doctor")
     return render(request, "patient/my_prescriptions.html", {"prescriptions": prescriptions})
 
 
@@ -265,7 +369,7 @@ def get_available_slots(request):
     doctor_id = request.GET.get("doctor")
     date_str = request.GET.get("date")
 
-    if not doctor_id or not date_str:
+    if not doctor_id or not doctor_id.isdigit() or not date_str:
         return JsonResponse({"slots": []})
 
     try:
@@ -273,51 +377,38 @@ def get_available_slots(request):
     except ValueError:
         return JsonResponse({"slots": []})
 
-    day_of_week = date_obj.weekday()
-    availability = Availability.objects.filter(
-        doctor_id=doctor_id,
-        day_of_week=day_of_week
-    ).first()
-
-    if not availability:
-        return JsonResponse({"slots": []})
-
-    slots = []
-    current_time = datetime.datetime.combine(date_obj, availability.start_time)
-    end_time = datetime.datetime.combine(date_obj, availability.end_time)
-    duration = datetime.timedelta(minutes=availability.slot_duration_minutes)
-
-    while current_time + duration <= end_time:
-        slots.append(current_time.time())
-        current_time += duration
-
-    booked_times = Appointment.objects.filter(
-        doctor_id=doctor_id,
-        date=date_obj,
-        status__in=["pending", "confirmed"]
-    ).values_list("time", flat=True)
+    final_slots = [
+        t.strftime("%I:%M %p")
+        for t in free_slots(doctor_id, date_obj, user=request.user)
+    ]
 
-    now = datetime.datetime.now().time()
-    final_slots = []
+    return JsonResponse({"slots": final_slots})
 
-    for t in slots:
 
-        # ⛔ Skip today's past slots
-        if date_obj == datetime.date.today() and t <= now:
-            continue
+@login_required
+@patient_required
+@require_POST
+def hold_slot_view(request):
+    """
+    Reserve the clicked slot while the patient completes the booking form
+    """
+    doctor_id = request.POST.get("doctor")
 
-        # ⛔ Skip lunch break (1 PM – 2 PM)
-        if datetime.time(13, 0) <= t < datetime.time(14, 0):
-            continue
+    try:
+        date_obj = datetime.datetime.strptime(request.POST.get("date", ""), "%Y-%m-%d").date()
+        time_obj = datetime.datetime.strptime(request.POST.get("time", ""), "%I:%M %p").time()
+    except ValueError:
+        return JsonResponse({"held": False, "error": "Invalid date or time."}, status=400)
 
-        # ⛔ Skip booked slots
-        if t in booked_times:
-            continue
+    if not doctor_id or not doctor_id.isdigit():
+        return JsonResponse({"held": False, "error": "Invalid doctor."}, status=400)
 
-        # ✅ Add valid slot
-        final_slots.append(t.strftime("%I:%M %p"))
+    try:
+        expires = hold_slot(request.user, int(doctor_id), date_obj, time_obj)
+    except SlotUnavailable as e:
+        return JsonResponse({"held": False, "error": str(e)}, status=409)
 
-    return JsonResponse({"slots": final_slots})
+    return JsonResponse({"held": True, "expires_at": expires.isoformat()})
 
 
 
@@ -326,7 +417,8 @@ def get_available_slots(request):
 # =====================================================
 @login_required
 def billing_list(request):
-    bills = Billing.objects.filter(patient=request.user).order_by('-created_at')
+    bills = Billing.objects.filter(patient=request.user).select_related("patient")
+    bills = paginate(request, bills, ("-created_at", "-id"))
     return render(request, "patient/billing_list.html", {"bills": bills})
 
 
@@ -472,69 +564,141 @@ def edit_profile(request):
 
 def get_available_dates(request):
     doctor_id = request.GET.get("doctor")
-    if not doctor_id:
+    if not doctor_id or not doctor_id.isdigit():
         return JsonResponse({"dates": []})
 
-    working_days = set(
-        Availability.objects.filter(doctor_id=doctor_id)
-        .values_list("day_of_week", flat=True)
+    available_dates = free_dates(doctor_id, timezone.localdate())
+
+    return JsonResponse({
+        "dates": [d.strftime("%Y-%m-%d") for d in available_dates]
+    })
+
+# =====================================================
+# EARLIEST SLOT SEARCH (AJAX)
+# =====================================================
+EARLIEST_SLOTS_MAX = 20
+
+
+@login_required
+@patient_required
+def earliest_slots(request):
+    """
+    Next free slots with any doctor of a department or specialization
+    """
+    department = request.GET.get("department", "").strip()
+    specialization = request.GET.get("specialization", "").strip()
+
+    try:
+        k = min(int(request.GET.get("k", 5)), EARLIEST_SLOTS_MAX)
+    except ValueError:
+        k = 5
+
+    doctors = User.objects.filter(profile__role="doctor", is_active=True)
+
+    if department:
+        doctors = doctors.filter(doctor_profile__department__iexact=department)
+    elif specialization:
+        doctors = doctors.filter(profile__specialization__iexact=specialization)
+    else:
+        return JsonResponse({"slots": []})
+
+    found = earliest_free_slots(
+        doctors.values_list("id", flat=True), k, user=request.user
     )
 
-    available_dates = []
-    today = timezone.now().date()
+    names = {
+        u.id: u.get_full_name() or u.username
+        for u in User.objects.filter(id__in={d for _, _, d in found})
+    }
 
-    for i in range(14):
-        future_date = today + datetime.timedelta(days=i)
+    return JsonResponse({
+        "slots": [
+            {
+                "doctor": doctor_id,
+                "doctor_name": names.get(doctor_id, ""),
+                "date": date.strftime("%Y-%m-%d"),
+                "time": t.strftime("%I:%M %p"),
+            }
+            for date, t, doctor_id in found
+        ]
+    })
 
-        if future_date.weekday() not in working_days:
-            continue
 
-        day_availabilities = Availability.objects.filter(
-            doctor_id=doctor_id,
-            day_of_week=future_date.weekday()
-        )
+# =====================================================
+# MONTH VIEW AVAILABILITY (AJAX)
+# =====================================================
+MONTH_VIEW_MAX_DOCTORS = 10
+
 
-        day_has_slot = False
-        now_time = timezone.now().time()
+def _month_view_params(request):
+    doctor_ids = [
+        d for d in request.GET.getlist("doctor") if d.isdigit()
+    ][:MONTH_VIEW_MAX_DOCTORS]
+
+    try:
+        month = datetime.datetime.strptime(request.GET.get("month", ""), "%Y-%m").date()
+    except ValueError:
+        month = timezone.localdate().replace(day=1)
 
-        for av in day_availabilities:
-            current = datetime.datetime.combine(future_date, av.start_time)
-            end = datetime.datetime.combine(future_date, av.end_time)
-            duration = datetime.timedelta(minutes=av.slot_duration_minutes)
+    return doctor_ids, month
 
-            while current + duration <= end:
-                slot_time = current.time()
 
-                if future_date == today and slot_time <= now_time:
-                    current += duration
-                    continue
+def _hold_user(request):
+    """
+    The patient whose own holds still show as free
+    """
+    return request.user if request.user.is_authenticated else None
 
-                is_booked = Appointment.objects.filter(
-                    doctor_id=doctor_id,
-                    date=future_date,
-                    time=slot_time,
-                    status__in=["pending", "confirmed"]
-                ).exists()
 
-                if not is_booked:
-                    day_has_slot = True
-                    break
+def _month_view_etag(request):
+    # Keyed on the session cookie rather than request.user, which would
+    # load the session and user and cost a 304 two queries. A new session
+    # (login, logout) gets a new ETag.
+    doctor_ids, month = _month_view_params(request)
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, "")
+    return schedule_etag(doctor_ids, month.strftime("%Y-%m"), session)
 
-                current += duration
 
-            if day_has_slot:
-                break
+@vary_on_cookie
+@condition(etag_func=_month_view_etag)
+def get_month_availability(request):
+    doctor_ids, month = _month_view_params(request)
 
-        if day_has_slot:
-            available_dates.append(future_date.strftime("%Y-%m-%d"))
+    next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+    start = max(month, timezone.localdate())
 
-    return JsonResponse({"dates": available_dates})
+    if start < next_month:
+        held = held_slots(doctor_ids, start, next_month, _hold_user(request))
+        grids = free_grids(doctor_ids, start, next_month)
+    else:
+        held, grids = {}, {}
+
+    doctors = {}
+    for doctor_id in doctor_ids:
+        days = {}
+        grid = grids.get(int(doctor_id), {})
+
+        for day in sorted(grid):
+            times = sorted(grid[day] - held.get((int(doctor_id), day), set()))
+            if not times:
+                continue
+            days[day.strftime("%Y-%m-%d")] = {
+                "free": len(times),
+                "slots": [t.strftime("%I:%M %p") for t in times],
+            }
+
+        doctors[doctor_id] = days
+
+    return JsonResponse({
+        "month": month.strftime("%Y-%m"),
+        "doctors": doctors,
+    })
 
 @login_required
 @patient_required
 def health_resources(request):
     categories = HealthCategory.objects.filter(is_active=True)
-    resources = HealthResource.objects.filter(is_active=True)
+    resources = HealthResource.objects.filter(is_active=True).select_related("category")
 
     return render(
         request,
@@ -0,0 +1,210 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from doctor.models import DoctorProfile, Slot
+from doctor.slots import schedule_changed_on_commit
+from .booking import SlotUnavailable, book_slot, hold_slot
+from .dashboard import bump_dashboard_version
+from .models import Appointment, WaitlistEntry
+
+
+OFFER_MINUTES = 30          # how long an offered slot stays held for the waiter
+EXPIRE_BATCH_SIZE = 100
+
+
+# ======================================================
+# MATCHING
+# ======================================================
+
+def _departments(doctor_ids):
+    return {
+        user_id: (department or "").strip().lower()
+        for user_id, department in DoctorProfile.objects.filter(
+            user_id__in=doctor_ids
+        ).values_list("user_id", "department")
+    }
+
+
+def _candidates(slots, departments, exclude_patient_ids):
+    """
+    Waiting entries that could take any of `slots`, oldest first.
+
+    Only the waiters of the slots' doctors and departments whose window
+    overlaps the slots' dates are read, through the (status, doctor,
+    created_at) and (status, department, created_at) indexes. Patients
+    already holding an offer are left out: a patient holds one slot at a
+    time.
+    """
+    doctor_ids = {doctor_id for doctor_id, _, _ in slots}
+    dates = [date for _, date, _ in slots]
+
+    return list(
+        WaitlistEntry.objects.filter(
+            status="waiting",
+            earliest_date__lte=max(dates),
+            latest_date__gte=min(dates),
+        )
+        .filter(
+            Q(doctor_id__in=doctor_ids)
+            | Q(doctor__isnull=True, department__in={d for d in departments.values() if d})
+        )
+        .exclude(patient_id__in=exclude_patient_ids)
+        .exclude(patient__waitlist_entries__status="offered")
+        .select_related("patient")
+        .order_by("created_at")
+    )
+
+
+def _wants(entry, doctor_id, date, department):
+    if not entry.earliest_date <= date <= entry.latest_date:
+        return False
+
+    if entry.doctor_id is not None:
+        return entry.doctor_id == doctor_id
+
+    return bool(department) and entry.department == department
+
+
+def _offer(entry, doctor_id, date, time):
+    expires = hold_slot(entry.patient, doctor_id, date, time, minutes=OFFER_MINUTES)
+
+    entry.status = "offered"
+    entry.offered_doctor_id = doctor_id
+    entry.offered_date = date
+    entry.offered_time = time
+    entry.offer_expires = expires
+    entry.save(update_fields=[
+        "status", "offered_doctor", "offered_date", "offered_time", "offer_expires",
+    ])
+
+
+def match_freed_slots(slots, exclude_patient_ids=()):
+    """
+    Offer each freed (doctor_id, date, time) slot to the best-ranked waiter.
+
+    Waiters asking for that doctor rank ahead of department-wide waiters,
+    then the longest waiting goes first. All candidates for the batch are
+    read with one query and assigned in memory; the slot is held for the
+    chosen patient for OFFER_MINUTES. Returns the entries given an offer.
+    """
+    today = timezone.localdate()
+    slots = sorted(
+        {s for s in slots if s[0] and s[1] >= today},
+        key=lambda s: (s[1], s[2]),
+    )
+    if not slots:
+        return []
+
+    departments = _departments({doctor_id for doctor_id, _, _ in slots})
+    waiters = sorted(
+        _candidates(slots, departments, exclude_patient_ids),
+        key=lambda e: (e.doctor_id is None, e.created_at),
+    )
+
+    offered = []
+    for doctor_id, date, time in slots:
+        department = departments.get(doctor_id)
+
+        for entry in waiters:
+            if not _wants(entry, doctor_id, date, department):
+                continue
+
+            try:
+                _offer(entry, doctor_id, date, time)
+            except SlotUnavailable:
+                # Rebooked or held meanwhile: nobody can have it
+                break
+
+            offered.append(entry)
+            waiters = [w for w in waiters if w.patient_id != entry.patient_id]
+            break
+
+    return offered
+
+
+# ======================================================
+# WAITER ACTIONS
+# ======================================================
+
+def accept_offer(entry, reason=""):
+    """
+    Book the slot held for `entry` and close the entry
+    """
+    if entry.status != "offered" or entry.offer_expires <= timezone.now():
+        raise SlotUnavailable("This offer has expired.")
+
+    appointment = Appointment(
+        patient_id=entry.patient_id,
+        doctor_id=entry.offered_doctor_id,
+        reason=reason,
+    )
+
+    with transaction.atomic():
+        book_slot(appointment, entry.offered_date, entry.offered_time)
+        entry.status = "booked"
+        entry.save(update_fields=["status"])
+
+    return appointment
+
+
+def leave_waitlist(entry):
+    """
+    Drop `entry`; a slot it was offered goes on to the next waiter
+    """
+    freed = None
+
+    if entry.status == "offered":
+        freed = (entry.offered_doctor_id, entry.offered_date, entry.offered_time)
+        Slot.objects.filter(
+            doctor_id=freed[0], date=freed[1], time=freed[2], held_by_id=entry.patient_id
+        ).update(held_by=None, held_until=None)
+        schedule_changed_on_commit(freed[0])
+
+    entry.status = "cancelled"
+    entry.save(update_fields=["status"])
+
+    if freed and entry.offer_expires > timezone.now():
+        match_freed_slots([freed], exclude_patient_ids=[entry.patient_id])
+
+
+def _dashboards_changed_on_commit(patient_ids):
+    # Bulk updates skip the post_save receivers that bump the dashboards
+    patient_ids = set(patient_ids)
+    transaction.on_commit(lambda: [bump_dashboard_version(pk) for pk in patient_ids])
+
+
+def expire_offers(batch_size=EXPIRE_BATCH_SIZE):
+    """
+    Close lapsed offers and past waiting windows; each lapsed offer's slot
+    is passed on to the next waiter. Returns the number of lapsed offers.
+    """
+    now = timezone.now()
+
+    past = list(
+        WaitlistEntry.objects.filter(
+            status="waiting", latest_date__lt=timezone.localdate()
+        ).values_list("pk", "patient_id")
+    )
+    WaitlistEntry.objects.filter(pk__in=[pk for pk, _ in past]).update(status="expired")
+    _dashboards_changed_on_commit(patient_id for _, patient_id in past)
+
+    lapsed = 0
+    while True:
+        entries = list(
+            WaitlistEntry.objects.filter(status="offered", offer_expires__lte=now)
+            .order_by("offer_expires")[:batch_size]
+        )
+        if not entries:
+            break
+
+        # The slot holds lapse at the same moment, nothing to release
+        WaitlistEntry.objects.filter(pk__in=[e.pk for e in entries]).update(status="expired")
+        _dashboards_changed_on_commit(e.patient_id for e in entries)
+
+        match_freed_slots(
+            [(e.offered_doctor_id, e.offered_date, e.offered_time) for e in entries]
+        )
+        lapsed += len(entries)
+
+    return lapsed